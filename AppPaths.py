@@ -0,0 +1,29 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+
+def config_dir(home: Optional[Path] = None) -> Path:
+    """
+    Returns the directory holding the installer's own state, next to ~/.config/ohmyposh.
+
+    Args:
+        home (Optional[Path]): Home directory to resolve against. Defaults to the current user's.
+    """
+    return (home or Path.home()) / ".config" / "pwsh-config"
+
+
+def cache_dir(home: Optional[Path] = None) -> Path:
+    """
+    Returns the directory for downloaded and generated files that can be rebuilt at any time.
+    """
+    return config_dir(home) / "cache"
+
+
+def user_fonts_dir(home: Optional[Path] = None) -> Path:
+    """
+    Returns the per-user font directory (%LOCALAPPDATA%\\Microsoft\\Windows\\Fonts).
+    """
+    if home is None and os.environ.get("LOCALAPPDATA"):
+        return Path(os.environ["LOCALAPPDATA"]) / "Microsoft" / "Windows" / "Fonts"
+    return (home or Path.home()) / "AppData" / "Local" / "Microsoft" / "Windows" / "Fonts"
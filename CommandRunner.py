@@ -0,0 +1,248 @@
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, TextIO, Tuple, Union
+from ExecutionPolicy import CancelScope, ExecutionPolicy, current_scope, new_process_group
+from Tracing import ChildCpu, tracer
+
+# Lines that only redraw winget's spinner carry no information worth keeping.
+_SPINNER_LINES = {"", "-", "\\", "|", "/"}
+
+
+@dataclass
+class CommandResult:
+    """
+    Outcome of a streamed command.
+
+    tail holds at most the last tail_lines lines of combined stdout and stderr
+    of the final attempt; line_count and output_bytes measure everything it
+    printed. cpu_time is only measured while tracing.
+    """
+    command: Union[str, Sequence[str]]
+    returncode: int
+    tail: List[str]
+    line_count: int
+    duration: float
+    attempts: int = 1
+    timed_out: bool = False
+    output_bytes: int = 0
+    cpu_time: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+    @property
+    def output(self) -> str:
+        return "\n".join(self.tail)
+
+    @property
+    def truncated(self) -> bool:
+        return self.line_count > len(self.tail)
+
+
+class ProgressDisplay:
+    """
+    A single live status line shared by concurrently running commands.
+
+    The line is only drawn when the output stream is a terminal, so captured
+    logs (e.g. headless provisioning) receive just the messages passed to write().
+    """
+    def __init__(self, stream: Optional[TextIO] = None, refresh_interval: float = 0.1):
+        self._stream = stream
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._active: Dict[int, Tuple[str, str]] = {}
+        self._next_token = 0
+        self._last_draw = 0.0
+        self._drawn = False
+
+    @property
+    def stream(self) -> TextIO:
+        # Resolved on every use so contextlib.redirect_stdout is honoured
+        return self._stream or sys.stdout
+
+    @property
+    def live(self) -> bool:
+        isatty = getattr(self.stream, "isatty", None)
+        return bool(isatty and isatty())
+
+    def start(self, label: str) -> int:
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self._active[token] = (label, "starting...")
+            self._draw(force=True)
+            return token
+
+    def update(self, token: int, line: str) -> None:
+        with self._lock:
+            if token in self._active:
+                self._active[token] = (self._active[token][0], line)
+                self._draw()
+
+    def finish(self, token: int) -> None:
+        with self._lock:
+            self._active.pop(token, None)
+            self._draw(force=True)
+
+    def write(self, message: str) -> None:
+        """
+        Print a message above the status line without corrupting it.
+        """
+        with self._lock:
+            self._clear()
+            print(message, file=self.stream, flush=True)
+            self._draw(force=True)
+
+    def _clear(self) -> None:
+        if self._drawn:
+            self.stream.write("\r\033[K")
+            self._drawn = False
+
+    def _draw(self, force: bool = False) -> None:
+        if not self.live:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_draw < self.refresh_interval:
+            return
+        self._last_draw = now
+        self._clear()
+        if self._active:
+            width = shutil.get_terminal_size().columns - 1
+            status = " | ".join(f"{label}: {line}" for label, line in self._active.values())
+            if len(self._active) > 1:
+                status = f"[{len(self._active)} running] {status}"
+            self.stream.write(status[:width])
+            self._drawn = True
+        self.stream.flush()
+
+
+# Shared by every runner so concurrent commands draw one status line between them.
+progress = ProgressDisplay()
+
+
+class CommandRunner:
+    """
+    Runs commands while streaming their output line by line.
+
+    Memory is bounded: only the last tail_lines lines are kept for error
+    reporting. Each line is passed to the live progress display and to an
+    optional on_line callback as soon as it is read. policy sets the timeout
+    of each attempt and how transient failures are retried; commands run in
+    the current CancelScope, whose cancellation kills their process tree.
+    """
+    def __init__(self, tail_lines: int = 40, display: Optional[ProgressDisplay] = None,
+                 policy: Optional[ExecutionPolicy] = None):
+        self.tail_lines = max(1, tail_lines)
+        self.display = display or progress
+        self.policy = policy or ExecutionPolicy()
+
+    def run(self, command: Union[str, Sequence[str]], label: Optional[str] = None,
+            on_line: Optional[Callable[[str], None]] = None,
+            policy: Optional[ExecutionPolicy] = None) -> CommandResult:
+        """
+        Run a command to completion, retrying transient failures.
+
+        Args:
+            command (Union[str, Sequence[str]]): A shell command string or an argv list.
+            label (Optional[str]): Name shown on the progress line; defaults to the command.
+            on_line (Optional[Callable[[str], None]]): Called with every non-blank output line.
+            policy (Optional[ExecutionPolicy]): Overrides the runner's policy for this command.
+
+        Returns:
+            CommandResult: Exit status and the tail of the combined output.
+
+        Raises:
+            CommandCancelled: If the enclosing scope is cancelled or its deadline passes.
+        """
+        policy = policy or self.policy
+        if label is None:
+            label = command if isinstance(command, str) else " ".join(command)
+        scope = current_scope()
+        with tracer.span(label, "command") as span:
+            result = self._run_attempts(command, label, on_line, policy, scope)
+            span.set(exit_code=result.returncode, retries=result.attempts - 1, timed_out=result.timed_out,
+                     output_lines=result.line_count, output_bytes=result.output_bytes, child_cpu=result.cpu_time)
+        return result
+
+    def _run_attempts(self, command: Union[str, Sequence[str]], label: str,
+                      on_line: Optional[Callable[[str], None]], policy: ExecutionPolicy,
+                      scope: CancelScope) -> CommandResult:
+        attempt = 0
+        cpu_time = None
+        while True:
+            attempt += 1
+            scope.check()
+            with CancelScope(policy.timeout, parent=scope) as attempt_scope:
+                result, transient = self._run_once(command, label, on_line, policy, attempt_scope)
+            if result.cpu_time is not None:
+                cpu_time = (cpu_time or 0.0) + result.cpu_time
+            result.attempts, result.cpu_time = attempt, cpu_time
+            scope.check()
+
+            retry = transient or (result.timed_out and policy.retry_timeouts)
+            if result.ok or not retry or attempt > policy.retries:
+                return result
+            delay = policy.delay(attempt)
+            reason = "timed out" if result.timed_out else result.tail[-1] if result.tail else "transient failure"
+            self.display.write(f"Retrying {label} in {delay:.0f}s "
+                               f"(attempt {attempt + 1} of {policy.retries + 1}): {reason}")
+            if not scope.sleep(delay):
+                scope.check()
+
+    def _run_once(self, command: Union[str, Sequence[str]], label: str,
+                  on_line: Optional[Callable[[str], None]], policy: ExecutionPolicy,
+                  scope: CancelScope) -> Tuple[CommandResult, bool]:
+        started = time.perf_counter()
+        tail: deque = deque(maxlen=self.tail_lines)
+        line_count = 0
+        output_bytes = 0
+        transient = False
+
+        token = self.display.start(label)
+        timer = scope.watchdog()
+        try:
+            process = subprocess.Popen(
+                command, shell=isinstance(command, str),
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, encoding="utf-8", errors="replace", bufsize=1,
+                **new_process_group(),
+            )
+            scope.register(process)
+            cpu = ChildCpu(process) if tracer.enabled else None
+            with process:
+                try:
+                    # Universal newlines also split on the bare \r used for progress redraws
+                    for raw in process.stdout:
+                        line = raw.rstrip()
+                        if line.strip() in _SPINNER_LINES:
+                            continue
+                        line_count += 1
+                        output_bytes += len(raw)
+                        tail.append(line)
+                        transient = transient or policy.is_transient_line(line)
+                        self.display.update(token, line.strip())
+                        if on_line is not None:
+                            on_line(line)
+                except BaseException:
+                    # Kill the tree so leaving the with block does not wait on it
+                    scope.cancel("interrupted")
+                    raise
+                returncode, cpu_time = cpu.wait() if cpu else (process.wait(), None)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self.display.finish(token)
+
+        duration = time.perf_counter() - started
+        timed_out = scope.cancelled and scope.reason == "timed out"
+        if timed_out:
+            tail.append(f"Timed out after {duration:.0f}s")
+        result = CommandResult(command, returncode, list(tail), line_count, duration,
+                               timed_out=timed_out, output_bytes=output_bytes, cpu_time=cpu_time)
+        return result, transient and returncode != 0
@@ -0,0 +1,229 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Output fragments of network and source failures that are worth retrying
+TRANSIENT_MARKERS = (
+    "0x80072ee2",  # WinINet: the operation timed out
+    "0x80072efd",  # WinINet: cannot connect to the server
+    "0x80072ee7",  # WinINet: the server name could not be resolved
+    "0x8a150008",  # winget: download failed
+    "failed when searching source",
+    "temporary failure in name resolution",
+    "connection reset",
+    "connection aborted",
+    "read timed out",
+    "readtimeouterror",
+    "newconnectionerror",
+)
+
+
+class CommandCancelled(Exception):
+    """
+    Raised when work stops because its scope was cancelled, by Ctrl+C or an expired deadline.
+    """
+
+
+@dataclass
+class ExecutionPolicy:
+    """
+    How long a command or step may run and how it is retried.
+
+    timeout bounds a single attempt in seconds. Failures classified as
+    transient are retried up to retries times, waiting backoff seconds before
+    the first retry and doubling the wait each time, up to max_backoff.
+    """
+    timeout: Optional[float] = None
+    retries: int = 0
+    backoff: float = 2.0
+    max_backoff: float = 60.0
+    retry_timeouts: bool = False
+    transient_markers: Tuple[str, ...] = TRANSIENT_MARKERS
+
+    def delay(self, attempt: int) -> float:
+        """
+        Seconds to wait after the given (1-based) failed attempt.
+        """
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+    def is_transient_line(self, line: str) -> bool:
+        lowered = line.lower()
+        return any(marker in lowered for marker in self.transient_markers)
+
+    def is_transient_error(self, error: BaseException) -> bool:
+        if isinstance(error, urllib.error.HTTPError):
+            return error.code == 429 or error.code >= 500
+        return isinstance(error, (ConnectionError, TimeoutError, socket.timeout, urllib.error.URLError))
+
+
+def new_process_group() -> dict:
+    """
+    Popen keyword arguments that start a child in its own process group, so
+    Ctrl+C reaches only this program and kill_process_tree can reach every descendant.
+    """
+    if sys.platform == "win32":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process: subprocess.Popen) -> None:
+    """
+    Kill a process started with new_process_group() and everything it spawned.
+    """
+    if process.poll() is not None:
+        return
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                           capture_output=True, timeout=30)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        pass
+    if process.poll() is None:
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+
+class CancelScope:
+    """
+    A cancellable unit of work with an optional deadline.
+
+    Scopes nest: a child's deadline never outlives its parent's, and cancelling
+    a scope cancels its children. Processes registered with a scope are killed,
+    with their descendants, when it is cancelled. Entering a scope with `with`
+    makes it current_scope() for the calling thread.
+    """
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["CancelScope"] = None):
+        self.parent = parent
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._children: List["CancelScope"] = []
+        self._processes: List[subprocess.Popen] = []
+        if parent is not None:
+            parent._adopt(self)
+
+    def __enter__(self) -> "CancelScope":
+        _current.stack = getattr(_current, "stack", []) + [self]
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _current.stack = _current.stack[:-1]
+        if self.parent is not None:
+            self.parent._release(self)
+
+    def _adopt(self, child: "CancelScope") -> None:
+        with self._lock:
+            self._children.append(child)
+            cancelled = self.cancelled
+        if cancelled:
+            child.cancel(self.reason)
+
+    def _release(self, child: "CancelScope") -> None:
+        with self._lock:
+            if child in self._children:
+                self._children.remove(child)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """
+        Seconds left before the nearest deadline of this scope or its parents, or None.
+        """
+        now = time.monotonic()
+        left = [scope.deadline - now for scope in self._lineage() if scope.deadline is not None]
+        return min(left) if left else None
+
+    @property
+    def expired(self) -> bool:
+        left = self.remaining()
+        return left is not None and left <= 0
+
+    def _lineage(self):
+        scope = self
+        while scope is not None:
+            yield scope
+            scope = scope.parent
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """
+        Cancel the scope and its children and kill their registered processes.
+        """
+        with self._lock:
+            if self.cancelled:
+                return
+            self.reason = reason
+            self._event.set()
+            processes, children = list(self._processes), list(self._children)
+        for process in processes:
+            kill_process_tree(process)
+        for child in children:
+            child.cancel(reason)
+
+    def check(self) -> None:
+        """
+        Raises:
+            CommandCancelled: If the scope was cancelled or its deadline passed.
+        """
+        if not self.cancelled and self.expired:
+            self.cancel("deadline exceeded")
+        if self.cancelled:
+            raise CommandCancelled(self.reason)
+
+    def sleep(self, seconds: float) -> bool:
+        """
+        Wait up to seconds, waking early on cancellation. Returns False if cancelled.
+        """
+        left = self.remaining()
+        if left is not None:
+            seconds = min(seconds, max(left, 0))
+        self._event.wait(seconds)
+        return not self.cancelled
+
+    def register(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            self._processes.append(process)
+            cancelled = self.cancelled
+        if cancelled:
+            kill_process_tree(process)
+
+    def unregister(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+
+    def watchdog(self, reason: str = "timed out") -> Optional[threading.Timer]:
+        """
+        Start a timer that cancels the scope when its deadline passes.
+        The caller cancels the returned timer once the work is done.
+        """
+        left = self.remaining()
+        if left is None:
+            return None
+        timer = threading.Timer(max(left, 0), self.cancel, args=(reason,))
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+_current = threading.local()
+# Never cancelled itself; work started outside any scope hangs off it.
+ROOT_SCOPE = CancelScope()
+
+
+def current_scope() -> CancelScope:
+    stack = getattr(_current, "stack", None)
+    return stack[-1] if stack else ROOT_SCOPE
@@ -0,0 +1,661 @@
+import argparse
+import fnmatch
+import os
+import re
+import shutil
+import sqlite3
+import stat
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from AppPaths import cache_dir, config_dir
+
+TASK_NAME = "pwsh-config file index"
+UPDATE_INTERVAL_MINUTES = 30
+# The index runs from a copy under the config directory, so it keeps working without the repository
+FILE_INDEX_FILES = ("FileIndex.py", "AppPaths.py", "TaskScheduler.py")
+# Directories that are large, generated and never what ff is looking for
+EXCLUDED_DIRS = {".git", "node_modules", "__pycache__", "$RECYCLE.BIN", "System Volume Information"}
+# Files larger than this, or with a NUL byte near the start, are left out of the content index
+MAX_CONTENT_BYTES = 1 << 20
+_SCHEMA_VERSION = 1
+# Trigrams are ranked by how many names contain them, counting at most this many
+_GRAM_COUNT_LIMIT = 2000
+# Exit status of the CLI when the index cannot answer a query; the profile then scans the disk itself
+NOT_INDEXED = 3
+
+# Windows paths compare case-insensitively, so "ff" works from C:\users as well as C:\Users
+_PATH_COLLATION = "NOCASE" if os.name == "nt" else "BINARY"
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY COLLATE {_PATH_COLLATION}, content INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE COLLATE {_PATH_COLLATION}, parent INTEGER,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY, dir INTEGER NOT NULL, name TEXT NOT NULL, is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, UNIQUE (dir, name)
+);
+CREATE TABLE IF NOT EXISTS grams (gram TEXT NOT NULL, entry INTEGER NOT NULL, PRIMARY KEY (gram, entry)) WITHOUT ROWID;
+"""
+
+
+class FileIndexError(ValueError):
+    """
+    Raised for an index that cannot be used as asked, e.g. a content index
+    on a SQLite build without the FTS5 trigram tokenizer.
+    """
+
+
+def index_path(home: Optional[Path] = None) -> Path:
+    return cache_dir(home) / "file-index.db"
+
+
+def trigrams(name: str) -> List[str]:
+    """
+    Returns the distinct lowercase three-character substrings of name.
+    """
+    name = name.lower()
+    return sorted({name[i:i + 3] for i in range(len(name) - 2)})
+
+
+def required_literals(pattern: str) -> List[str]:
+    """
+    Returns substrings every match of a regular expression must contain.
+
+    Only plain runs of characters outside groups, classes and optional
+    quantifiers are used, which is enough to narrow a search through the
+    content index. A pattern with top-level alternation has none.
+
+    Args:
+        pattern (str): A regular expression.
+
+    Returns:
+        List[str]: The literals, longest first.
+    """
+    literals, run, i = [], "", 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if not escaped.isalnum():
+                run += escaped
+            else:
+                # \d, \w, \b, ... stand for a class or an assertion
+                literals.append(run)
+                run = ""
+            continue
+        if char in "([":
+            # Skip the whole group or class, which may be optional or an alternation
+            close = ")" if char == "(" else "]"
+            depth = 1
+            i += 1
+            while i < len(pattern) and depth:
+                if pattern[i] == "\\":
+                    i += 1
+                elif pattern[i] == close:
+                    depth -= 1
+                elif pattern[i] == char and char == "(":
+                    depth += 1
+                i += 1
+            literals.append(run)
+            run = ""
+            continue
+        if char == "|":
+            return []
+        if char in "?*{":
+            # The previous character is optional
+            literals.append(run[:-1])
+            run = ""
+            if char == "{":
+                i = pattern.find("}", i) if "}" in pattern[i:] else len(pattern)
+        elif char in ".^$+":
+            literals.append(run)
+            run = ""
+        else:
+            run += char
+        i += 1
+    literals.append(run)
+    return sorted((literal for literal in literals if len(literal) >= 3), key=len, reverse=True)
+
+
+def _is_hidden(entry: os.DirEntry, info: os.stat_result) -> bool:
+    """
+    Hidden and system files are skipped, like Get-ChildItem without -Force.
+    """
+    attributes = getattr(info, "st_file_attributes", None)
+    if attributes is None:
+        return entry.name.startswith(".")
+    return bool(attributes & (stat.FILE_ATTRIBUTE_HIDDEN | stat.FILE_ATTRIBUTE_SYSTEM))
+
+
+def _is_link(entry: os.DirEntry, info: os.stat_result) -> bool:
+    # Junctions are reparse points that is_symlink() does not report
+    attributes = getattr(info, "st_file_attributes", 0)
+    return entry.is_symlink() or bool(attributes & stat.FILE_ATTRIBUTE_REPARSE_POINT)
+
+
+def _read_text(path: str) -> Optional[str]:
+    """
+    Returns the text of a file for the content index, or None for binary or oversized files.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read(MAX_CONTENT_BYTES + 1)
+    except OSError:
+        return None
+    if len(data) > MAX_CONTENT_BYTES or b"\0" in data[:8192]:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+class UpdateStats:
+    """
+    What one update of the index did.
+    """
+    # A plain class: importing dataclasses would add to the start-up time of every ff
+    def __init__(self):
+        self.dirs_checked = self.dirs_scanned = 0
+        self.added = self.removed = self.changed = 0
+
+    def summary(self) -> str:
+        return (f"{self.dirs_checked} directories checked, {self.dirs_scanned} rescanned; "
+                f"{self.added} added, {self.removed} removed, {self.changed} changed")
+
+
+class FileIndex:
+    """
+    Persistent index of the file and directory names under a set of roots,
+    with an optional index of file contents.
+
+    Names are looked up through a table of their trigrams, so a substring
+    query reads a few index pages instead of walking the tree. Updates are
+    incremental: a directory is only listed again when its mtime changed,
+    which is the case whenever an entry was added, removed or renamed in it.
+    Roots with a content index also check the size and mtime of each file,
+    since editing a file does not touch its directory.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # A scheduled update may be writing while ff reads or another update waits
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            # WAL lets ff and grep read while an update writes; the mode is stored in the file
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(_SCHEMA)
+            self.db.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+        elif version != _SCHEMA_VERSION:
+            raise FileIndexError(f"{self.path} was written by another version; delete it to rebuild the index")
+        self.has_content_table = self._content_table_exists()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _content_table_exists(self) -> bool:
+        return self.db.execute("SELECT 1 FROM sqlite_master WHERE name = 'content'").fetchone() is not None
+
+    def _ensure_content_table(self) -> None:
+        if self.has_content_table:
+            return
+        try:
+            self.db.execute("CREATE VIRTUAL TABLE content USING fts5(body, tokenize='trigram')")
+        except sqlite3.OperationalError as e:
+            raise FileIndexError(
+                f"SQLite {sqlite3.sqlite_version} cannot build a content index (needs FTS5 with trigrams): {e}"
+            ) from e
+        self.has_content_table = True
+
+    def roots(self) -> Dict[str, bool]:
+        """
+        Returns the indexed roots and whether each has a content index.
+        """
+        return {path: bool(content) for path, content in self.db.execute("SELECT path, content FROM roots")}
+
+    def add_root(self, root: Path, content: bool = False) -> None:
+        """
+        Index root (on the next update), optionally with file contents.
+
+        Raises:
+            FileIndexError: If content is requested but SQLite has no FTS5 trigram tokenizer.
+        """
+        if content:
+            self._ensure_content_table()
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO roots (path, content) VALUES (?, ?)",
+                            (os.path.abspath(root), int(content)))
+
+    def remove_root(self, root: Path) -> None:
+        root = os.path.abspath(root)
+        with self.db:
+            self.db.execute("DELETE FROM roots WHERE path = ?", (root,))
+            row = self.db.execute("SELECT id FROM dirs WHERE path = ?", (root,)).fetchone()
+            if row:
+                self._remove_tree(row[0], root)
+
+    def root_of(self, path: Path) -> Optional[Tuple[str, bool]]:
+        """
+        Returns the indexed root containing path and whether it has a content index.
+        """
+        path = os.path.normcase(os.path.abspath(path))
+        for root, content in self.roots().items():
+            normalized = os.path.normcase(root)
+            if path == normalized or path.startswith(normalized.rstrip(os.sep) + os.sep):
+                return root, content
+        return None
+
+    def is_indexed(self, directory: Path) -> bool:
+        """
+        Whether directory has been indexed, i.e. is below a root, not excluded,
+        and was listed by an update since it was added.
+        """
+        return self.db.execute("SELECT 1 FROM dirs WHERE path = ?",
+                               (os.path.abspath(directory),)).fetchone() is not None
+
+    # Updating
+
+    def _subtree_ids(self, dir_id: int, path: str) -> List[int]:
+        prefix = path.rstrip(os.sep) + os.sep
+        # Range scan over the path index instead of LIKE, which would need escaping
+        below = self.db.execute("SELECT id FROM dirs WHERE path >= ? AND path < ?",
+                                (prefix, prefix[:-1] + chr(ord(os.sep) + 1))).fetchall()
+        return [dir_id, *(row[0] for row in below)]
+
+    def _remove_entries(self, rows: List[Tuple[int, str]]) -> None:
+        for entry_id, name in rows:
+            self.db.executemany("DELETE FROM grams WHERE gram = ? AND entry = ?",
+                                [(gram, entry_id) for gram in trigrams(name)])
+            if self.has_content_table:
+                self.db.execute("DELETE FROM content WHERE rowid = ?", (entry_id,))
+        self.db.executemany("DELETE FROM entries WHERE id = ?", [(entry_id,) for entry_id, _ in rows])
+
+    def _remove_tree(self, dir_id: int, path: str) -> int:
+        """
+        Forget a directory and everything below it. Returns the number of entries removed.
+        """
+        removed = 0
+        for subtree_id in self._subtree_ids(dir_id, path):
+            rows = self.db.execute("SELECT id, name FROM entries WHERE dir = ?", (subtree_id,)).fetchall()
+            self._remove_entries(rows)
+            removed += len(rows)
+            self.db.execute("DELETE FROM dirs WHERE id = ?", (subtree_id,))
+        return removed
+
+    def _index_content(self, entry_id: int, path: str) -> None:
+        self.db.execute("DELETE FROM content WHERE rowid = ?", (entry_id,))
+        text = _read_text(path)
+        if text is not None:
+            self.db.execute("INSERT INTO content (rowid, body) VALUES (?, ?)", (entry_id, text))
+
+    def _scan(self, dir_id: int, path: str, content: bool, stats: UpdateStats) -> List[str]:
+        """
+        List a directory and apply the difference to its stored entries.
+
+        Returns:
+            List[str]: The subdirectories to visit.
+        """
+        stats.dirs_scanned += 1
+        current: Dict[str, Tuple[bool, int, int]] = {}
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        info = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if _is_hidden(entry, info):
+                        continue
+                    is_dir = entry.is_dir(follow_symlinks=False) and not _is_link(entry, info)
+                    current[entry.name] = (is_dir, 0 if is_dir else info.st_size, info.st_mtime_ns)
+        except OSError:
+            pass
+
+        stored = {name: (entry_id, bool(is_dir), size, mtime)
+                  for entry_id, name, is_dir, size, mtime in self.db.execute(
+                      "SELECT id, name, is_dir, size, mtime_ns FROM entries WHERE dir = ?", (dir_id,))}
+        gone = [(entry_id, name) for name, (entry_id, *_) in stored.items() if name not in current]
+        for entry_id, name in gone:
+            if stored[name][1]:
+                child = os.path.join(path, name)
+                row = self.db.execute("SELECT id FROM dirs WHERE path = ?", (child,)).fetchone()
+                if row:
+                    stats.removed += self._remove_tree(row[0], child)
+        self._remove_entries(gone)
+        stats.removed += len(gone)
+
+        for name, (is_dir, size, mtime) in current.items():
+            known = stored.get(name)
+            if known is None:
+                entry_id = self.db.execute(
+                    "INSERT INTO entries (dir, name, is_dir, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                    (dir_id, name, int(is_dir), size, mtime)).lastrowid
+                self.db.executemany("INSERT INTO grams (gram, entry) VALUES (?, ?)",
+                                    [(gram, entry_id) for gram in trigrams(name)])
+                stats.added += 1
+            elif known[1:] != (is_dir, size, mtime):
+                entry_id = known[0]
+                if known[1] and not is_dir:
+                    child = os.path.join(path, name)
+                    row = self.db.execute("SELECT id FROM dirs WHERE path = ?", (child,)).fetchone()
+                    if row:
+                        stats.removed += self._remove_tree(row[0], child)
+                self.db.execute("UPDATE entries SET is_dir = ?, size = ?, mtime_ns = ? WHERE id = ?",
+                                (int(is_dir), size, mtime, entry_id))
+                stats.changed += 1
+            else:
+                continue
+            if content and not is_dir:
+                self._index_content(entry_id, os.path.join(path, name))
+        return [os.path.join(path, name) for name, (is_dir, _, _) in current.items()
+                if is_dir and name not in EXCLUDED_DIRS]
+
+    def _check_files(self, dir_id: int, path: str, stats: UpdateStats) -> None:
+        """
+        Re-read the files of an unchanged directory whose size or mtime changed.
+        """
+        rows = self.db.execute("SELECT id, name, size, mtime_ns FROM entries WHERE dir = ? AND is_dir = 0",
+                               (dir_id,)).fetchall()
+        for entry_id, name, size, mtime in rows:
+            try:
+                info = os.stat(os.path.join(path, name), follow_symlinks=False)
+            except OSError:
+                continue
+            if (info.st_size, info.st_mtime_ns) != (size, mtime):
+                self.db.execute("UPDATE entries SET size = ?, mtime_ns = ? WHERE id = ?",
+                                (info.st_size, info.st_mtime_ns, entry_id))
+                self._index_content(entry_id, os.path.join(path, name))
+                stats.changed += 1
+
+    def _update_tree(self, top: str, content: bool, stats: UpdateStats, recursive: bool = True) -> None:
+        parent_row = self.db.execute("SELECT id FROM dirs WHERE path = ?", (os.path.dirname(top),)).fetchone()
+        pending = [(top, parent_row[0] if parent_row else None)]
+        while pending:
+            path, parent = pending.pop()
+            stats.dirs_checked += 1
+            row = self.db.execute("SELECT id, mtime_ns FROM dirs WHERE path = ?", (path,)).fetchone()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                if row:
+                    stats.removed += self._remove_tree(row[0], path)
+                continue
+
+            if row is None:
+                dir_id = self.db.execute("INSERT INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                                         (path, parent, mtime)).lastrowid
+                children = self._scan(dir_id, path, content, stats)
+            elif row[1] != mtime:
+                dir_id = row[0]
+                children = self._scan(dir_id, path, content, stats)
+                self.db.execute("UPDATE dirs SET mtime_ns = ? WHERE id = ?", (mtime, dir_id))
+            else:
+                dir_id = row[0]
+                if content:
+                    self._check_files(dir_id, path, stats)
+                children = [child for (child,) in self.db.execute("SELECT path FROM dirs WHERE parent = ?",
+                                                                  (dir_id,))]
+            if recursive:
+                pending.extend((child, dir_id) for child in children)
+
+    def update(self, roots: Optional[List[str]] = None) -> UpdateStats:
+        """
+        Bring the index up to date with the disk.
+
+        Args:
+            roots (Optional[List[str]]): Roots to update. Defaults to all of them.
+
+        Returns:
+            UpdateStats: How much work the update did.
+        """
+        stats = UpdateStats()
+        indexed = self.roots()
+        for root in roots or list(indexed):
+            with self.db:
+                self._update_tree(root, indexed.get(root, False), stats)
+        return stats
+
+    def refresh_dir(self, path: Path) -> None:
+        """
+        Update a single directory (not its subdirectories), e.g. right before searching it.
+        """
+        found = self.root_of(path)
+        if found is not None:
+            with self.db:
+                self._update_tree(os.path.abspath(path), found[1], UpdateStats(), recursive=False)
+
+    # Queries
+
+    def _scope(self, under: Optional[Path]) -> Tuple[str, list]:
+        if under is None:
+            return "", []
+        under = os.path.abspath(under)
+        prefix = under.rstrip(os.sep) + os.sep
+        return (" AND (d.path = ? OR (d.path >= ? AND d.path < ?))",
+                [under, prefix, prefix[:-1] + chr(ord(os.sep) + 1)])
+
+    def _gram_count(self, gram: str) -> int:
+        """
+        Returns how many names contain gram, counting no further than _GRAM_COUNT_LIMIT.
+        """
+        return self.db.execute("SELECT COUNT(*) FROM (SELECT 1 FROM grams WHERE gram = ? LIMIT ?)",
+                               (gram, _GRAM_COUNT_LIMIT)).fetchone()[0]
+
+    def find(self, pattern: str, under: Optional[Path] = None, limit: Optional[int] = None) -> Iterator[str]:
+        """
+        Yield the paths whose name contains pattern, case-insensitively.
+
+        pattern may use the wildcards * and ?, matching like Get-ChildItem -Filter "*pattern*".
+        Paths that were deleted since the last update are left out.
+
+        Args:
+            pattern (str): Part of the file or directory name.
+            under (Optional[Path]): Only return paths below this directory.
+            limit (Optional[int]): Stop after this many paths.
+        """
+        needle = pattern.lower()
+        grams = sorted({gram for literal in re.split(r"[*?]+", needle) for gram in trigrams(literal)})
+        scope, params = self._scope(under)
+        if grams:
+            # Read the postings of the rarest trigram, check the next rarest per candidate,
+            # and leave the rest to fnmatch: common trigrams ("pha", ".py") match most names
+            counts = sorted((self._gram_count(gram), gram) for gram in grams)
+            if counts[0][0] == 0:
+                return
+            query = ("SELECT d.path, e.name FROM grams g JOIN entries e ON e.id = g.entry "
+                     "JOIN dirs d ON d.id = e.dir WHERE g.gram = ?")
+            if len(counts) > 1:
+                query += " AND EXISTS (SELECT 1 FROM grams WHERE gram = ? AND entry = e.id)"
+            rows = self.db.execute(f"{query}{scope} ORDER BY d.path, e.name",
+                                   [*(gram for _, gram in counts[:2]), *params])
+        else:
+            # Names shorter than three characters have no trigrams; scan the names instead
+            rows = self.db.execute(f"SELECT d.path, e.name FROM entries e JOIN dirs d ON d.id = e.dir "
+                                   f"WHERE 1{scope} ORDER BY d.path, e.name", params)
+        # Brackets are literal in -Filter, but a character class to fnmatch
+        wildcard = "*" + needle.replace("[", "[[]") + "*"
+        found = 0
+        for directory, name in rows:
+            if not fnmatch.fnmatchcase(name.lower(), wildcard):
+                continue
+            path = os.path.join(directory, name)
+            if not os.path.lexists(path):
+                continue
+            yield path
+            found += 1
+            if limit is not None and found >= limit:
+                return
+
+    def grep(self, pattern: str, directory: Path, recursive: bool = False,
+             ignore_case: bool = True) -> Iterator[str]:
+        """
+        Yield "path:line:text" for every line matching a regular expression, like Select-String.
+
+        Only files whose indexed content contains the pattern's literal parts
+        are read, and those are read from the index unless they changed on disk.
+
+        Args:
+            pattern (str): A regular expression.
+            directory (Path): Search the files in this directory.
+            recursive (bool): Also search its subdirectories.
+            ignore_case (bool): Match case-insensitively, as Select-String does by default.
+
+        Raises:
+            FileIndexError: If directory is not in a root with a content index.
+            re.error: If pattern is not a valid regular expression.
+        """
+        found = self.root_of(directory)
+        if found is None or not found[1] or not self.has_content_table:
+            raise FileIndexError(f"{directory} has no content index")
+        regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        directory = os.path.abspath(directory)
+        if recursive:
+            scope, params = self._scope(Path(directory))
+        else:
+            scope, params = " AND d.path = ?", [directory]
+
+        literals = required_literals(pattern)
+        if literals:
+            # FTS5 trigram phrases match substrings case-insensitively
+            phrase = '"' + literals[0].replace('"', '""') + '"'
+            query = (f"SELECT d.path, e.name, e.size, e.mtime_ns, c.body FROM content c "
+                     f"JOIN entries e ON e.id = c.rowid JOIN dirs d ON d.id = e.dir "
+                     f"WHERE content MATCH ?{scope} ORDER BY d.path, e.name")
+            rows = self.db.execute(query, [phrase, *params])
+        else:
+            query = (f"SELECT d.path, e.name, e.size, e.mtime_ns, c.body FROM content c "
+                     f"JOIN entries e ON e.id = c.rowid JOIN dirs d ON d.id = e.dir "
+                     f"WHERE 1{scope} ORDER BY d.path, e.name")
+            rows = self.db.execute(query, params)
+
+        for parent, name, size, mtime, body in rows:
+            path = os.path.join(parent, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            if (info.st_size, info.st_mtime_ns) != (size, mtime):
+                body = _read_text(path)
+                if body is None:
+                    continue
+            for number, line in enumerate(body.splitlines(), 1):
+                if regex.search(line):
+                    yield f"{path}:{number}:{line}"
+
+
+def install(home: Optional[Path] = None) -> Path:
+    """
+    Copy the indexer into the config directory.
+
+    Returns:
+        Path: The installed FileIndex.py.
+    """
+    target = config_dir(home) / "file-index"
+    target.mkdir(parents=True, exist_ok=True)
+    source = Path(__file__).resolve().parent
+    for name in FILE_INDEX_FILES:
+        shutil.copy2(source / name, target / name)
+    return target / "FileIndex.py"
+
+
+def schedule(script: Path, interval_minutes: int = UPDATE_INTERVAL_MINUTES) -> Tuple[bool, str]:
+    """
+    Register a Task Scheduler task that runs "FileIndex.py update" every interval_minutes.
+
+    Returns:
+        Tuple[bool, str]: Whether the task was created, and schtasks' message.
+    """
+    from TaskScheduler import schedule_script
+    return schedule_script(TASK_NAME, script, ["update"], interval_minutes)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Index file names (and optionally contents) for ff and grep.")
+    parser.add_argument("--db", type=Path, default=None, help="index file (default: ~/.config/pwsh-config/cache)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    add_parser = subparsers.add_parser("add", help="index a directory tree")
+    add_parser.add_argument("root", type=Path)
+    add_parser.add_argument("--content", action="store_true", help="also index file contents for grep")
+    remove_parser = subparsers.add_parser("remove", help="stop indexing a directory tree")
+    remove_parser.add_argument("root", type=Path)
+    subparsers.add_parser("roots", help="list the indexed directory trees")
+    subparsers.add_parser("update", help="bring the index up to date")
+    find_parser = subparsers.add_parser("find", help="print paths whose name contains a pattern")
+    find_parser.add_argument("pattern")
+    find_parser.add_argument("--under", type=Path, default=Path.cwd(), help="directory to search (default: .)")
+    find_parser.add_argument("--limit", type=int)
+    grep_parser = subparsers.add_parser("grep", help="print lines matching a regular expression")
+    grep_parser.add_argument("pattern")
+    grep_parser.add_argument("--in", dest="directory", type=Path, default=Path.cwd(),
+                             help="directory whose files are searched (default: .)")
+    grep_parser.add_argument("-r", "--recursive", action="store_true", help="also search subdirectories")
+    grep_parser.add_argument("--case-sensitive", action="store_true")
+    schedule_parser = subparsers.add_parser("schedule", help="install the indexer and update on a schedule")
+    schedule_parser.add_argument("--interval-minutes", type=int, default=UPDATE_INTERVAL_MINUTES)
+    subparsers.add_parser("unschedule", help="remove the scheduled update")
+    args = parser.parse_args(argv)
+
+    if args.command == "schedule":
+        ok, message = schedule(install(), args.interval_minutes)
+        print(message)
+        return 0 if ok else 1
+    if args.command == "unschedule":
+        from TaskScheduler import unschedule
+        ok, message = unschedule(TASK_NAME)
+        print(message)
+        return 0 if ok else 1
+
+    db = args.db or index_path()
+    if args.command in ("find", "grep") and not db.exists():
+        return NOT_INDEXED
+    try:
+        index = FileIndex(db)
+    except (FileIndexError, sqlite3.Error) as e:
+        print(e, file=sys.stderr)
+        return NOT_INDEXED if args.command in ("find", "grep") else 1
+
+    try:
+        if args.command == "add":
+            index.add_root(args.root, args.content)
+            print(index.update([os.path.abspath(args.root)]).summary())
+        elif args.command == "remove":
+            index.remove_root(args.root)
+        elif args.command == "roots":
+            for root, content in index.roots().items():
+                print(f"{root}{' (with contents)' if content else ''}")
+        elif args.command == "update":
+            print(index.update().summary())
+        elif args.command == "find":
+            if not index.is_indexed(args.under):
+                return NOT_INDEXED
+            # Files are most often looked for right after they were created where ff runs
+            index.refresh_dir(args.under)
+            for path in index.find(args.pattern, args.under, args.limit):
+                print(path)
+        else:
+            found = index.root_of(args.directory)
+            if found is None or not found[1] or not index.is_indexed(args.directory):
+                return NOT_INDEXED
+            index.refresh_dir(args.directory)
+            for line in index.grep(args.pattern, args.directory, args.recursive, not args.case_sensitive):
+                print(line)
+    except FileIndexError as e:
+        print(e, file=sys.stderr)
+        return NOT_INDEXED if args.command in ("find", "grep") else 1
+    except re.error as e:
+        print(f"Invalid regular expression: {e}", file=sys.stderr)
+        return NOT_INDEXED
+    except sqlite3.Error as e:
+        print(f"{db}: {e}", file=sys.stderr)
+        return NOT_INDEXED if args.command in ("find", "grep") else 1
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
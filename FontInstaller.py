@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from ExecutionPolicy import CancelScope, CommandCancelled, ExecutionPolicy, current_scope
+from Tracing import Span, tracer
+
+NERD_FONTS_URL = "https://github.com/ryanoasis/nerd-fonts/releases/download/v3.1.1"
+FONT_EXTENSIONS = (".ttf", ".otf")
+_CHUNK_SIZE = 1 << 16
+
+
+@dataclass
+class FontResult:
+    """
+    Outcome of installing one font archive.
+    """
+    name: str
+    installed: int = 0
+    unchanged: int = 0
+    from_cache: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class DownloadCache:
+    """
+    Content-addressed download cache.
+
+    Archives are stored as blobs/<sha256>.zip; index.json maps each URL to its
+    digest and the ETag/Last-Modified validators of the response, so later
+    fetches are conditional requests that usually return 304 Not Modified.
+    """
+    def __init__(self, root: Path, timeout: float = 60):
+        self.root = Path(root)
+        self.timeout = timeout
+        self.index_path = self.root / "index.json"
+        self._lock = threading.Lock()
+        self._index: Dict[str, dict] = {}
+        if self.index_path.exists():
+            try:
+                self._index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                self._index = {}
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / "blobs" / f"{sha256}.zip"
+
+    def cached(self, url: str) -> Optional[Path]:
+        """
+        Returns the cached blob for a URL, or None if there is no intact copy.
+        """
+        with self._lock:
+            entry = self._index.get(url)
+        if entry and self.blob_path(entry["sha256"]).exists():
+            return self.blob_path(entry["sha256"])
+        return None
+
+    def _save_index(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._index, indent=2), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def fetch(self, url: str) -> Tuple[Path, bool]:
+        """
+        Return a local copy of url, downloading only if the server has a newer one.
+
+        If the server cannot be reached, a previously cached copy is used.
+
+        Args:
+            url (str): The archive to fetch.
+
+        Returns:
+            Tuple[Path, bool]: The blob path and whether it was served from the cache.
+        """
+        with self._lock:
+            entry = dict(self._index.get(url, {}))
+        cached = self.cached(url)
+
+        request = urllib.request.Request(url)
+        if cached is not None:
+            if entry.get("etag"):
+                request.add_header("If-None-Match", entry["etag"])
+            if entry.get("last_modified"):
+                request.add_header("If-Modified-Since", entry["last_modified"])
+
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached is not None:
+                return cached, True
+            raise
+        except urllib.error.URLError:
+            if cached is not None:
+                return cached, True
+            raise
+
+        with response:
+            (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+            digest = hashlib.sha256()
+            fd, tmp_name = tempfile.mkstemp(dir=self.root / "blobs", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as tmp:
+                    while True:
+                        chunk = response.read(_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+                        tmp.write(chunk)
+                blob = self.blob_path(digest.hexdigest())
+                os.replace(tmp_name, blob)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+
+            with self._lock:
+                self._index[url] = {
+                    "sha256": digest.hexdigest(),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "size": blob.stat().st_size,
+                }
+                self._save_index()
+        return blob, False
+
+
+def _file_crc32(path: Path) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _register_font(path: Path) -> None:
+    """
+    Register a per-user font under HKCU so Windows picks it up without a reboot.
+    """
+    if sys.platform != "win32":
+        return
+    import winreg
+    key_path = r"SOFTWARE\Microsoft\Windows NT\CurrentVersion\Fonts"
+    with winreg.CreateKey(winreg.HKEY_CURRENT_USER, key_path) as key:
+        winreg.SetValueEx(key, path.name, 0, winreg.REG_SZ, str(path))
+
+
+def extract_fonts(archive: Path, destination: Path) -> Tuple[int, int]:
+    """
+    Copy the .ttf/.otf members of a zip archive straight into destination.
+
+    Other members are never decompressed, and fonts whose size and CRC already
+    match the archive member are left untouched.
+
+    Returns:
+        Tuple[int, int]: Number of fonts written and number already up to date.
+    """
+    destination.mkdir(parents=True, exist_ok=True)
+    installed = unchanged = 0
+    with zipfile.ZipFile(archive) as zf:
+        for member in zf.infolist():
+            name = Path(member.filename).name
+            if member.is_dir() or not name.lower().endswith(FONT_EXTENSIONS):
+                continue
+            target = destination / name
+            if target.exists() and target.stat().st_size == member.file_size \
+                    and _file_crc32(target) == member.CRC:
+                unchanged += 1
+                continue
+
+            fd, tmp_name = tempfile.mkstemp(dir=destination, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as out, zf.open(member) as src:
+                    for chunk in iter(lambda: src.read(_CHUNK_SIZE), b""):
+                        out.write(chunk)
+                os.replace(tmp_name, target)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+            _register_font(target)
+            installed += 1
+    return installed, unchanged
+
+
+class NerdFontInstaller:
+    """
+    Downloads Nerd Font archives concurrently through a DownloadCache and
+    installs their font files for the current user. Downloads that fail with a
+    transient network error are retried as policy allows. With source_dir,
+    the archives (<font>.zip) are read from that directory, e.g. a mirror,
+    and nothing is downloaded.
+    """
+    def __init__(self, fonts: List[str], cache_dir: Path, destination: Path,
+                 base_url: str = NERD_FONTS_URL, max_workers: int = 4,
+                 policy: Optional[ExecutionPolicy] = None, source_dir: Optional[Path] = None):
+        self.fonts = fonts
+        self.cache = DownloadCache(cache_dir)
+        self.destination = Path(destination)
+        self.base_url = base_url.rstrip("/")
+        self.source_dir = Path(source_dir) if source_dir else None
+        self.max_workers = max(1, max_workers)
+        self.policy = policy or ExecutionPolicy()
+
+    def font_url(self, font: str) -> str:
+        return f"{self.base_url}/{font}.zip"
+
+    def _fetch(self, font: str, scope: CancelScope) -> Tuple[Path, bool]:
+        if self.source_dir is not None:
+            archive = self.source_dir / f"{font}.zip"
+            if not archive.is_file():
+                raise FileNotFoundError(f"{archive} not found")
+            return archive, True
+        attempt = 0
+        while True:
+            attempt += 1
+            scope.check()
+            try:
+                return self.cache.fetch(self.font_url(font))
+            except (OSError, urllib.error.URLError) as e:
+                if attempt > self.policy.retries or not self.policy.is_transient_error(e):
+                    raise
+                if not scope.sleep(self.policy.delay(attempt)):
+                    raise
+
+    def _install_one(self, font: str, scope: CancelScope, parent: Optional[Span] = None) -> FontResult:
+        result = FontResult(font)
+        with tracer.span(font, "download", parent=parent) as span:
+            try:
+                archive, result.from_cache = self._fetch(font, scope)
+                result.installed, result.unchanged = extract_fonts(archive, self.destination)
+            except (OSError, zipfile.BadZipFile, urllib.error.URLError, CommandCancelled) as e:
+                result.error = str(e)
+            span.set(from_cache=result.from_cache, installed=result.installed, error=result.error)
+        return result
+
+    def run(self) -> List[FontResult]:
+        """
+        Install every configured font.
+
+        Returns:
+            List[FontResult]: One result per font, in configuration order.
+        """
+        scope, parent = current_scope(), tracer.current()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(lambda font: self._install_one(font, scope, parent), self.fonts))
@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+@dataclass
+class InitTool:
+    """
+    A tool whose "init" output the profile would otherwise evaluate on every start.
+
+    init_args and version_args exclude the executable itself. fallback is the
+    profile command that evaluates init live when no cached script exists.
+    config is an optional file whose changes must also invalidate the cache.
+    """
+    name: str
+    executable: str
+    init_args: List[str]
+    version_args: List[str]
+    fallback: str
+    config: Optional[Path] = None
+
+    @property
+    def script_name(self) -> str:
+        return f"{self.name}.ps1"
+
+
+def default_tools(oh_my_posh_config: Path) -> List[InitTool]:
+    """
+    Returns the init scripts the profile loads: zoxide, and oh-my-posh with the given config.
+    """
+    return [
+        InitTool("zoxide", "zoxide", ["init", "--cmd", "cd", "powershell"], ["--version"],
+                 "Invoke-Expression (& { (zoxide init --cmd cd powershell | Out-String) })"),
+        InitTool("oh-my-posh", "oh-my-posh",
+                 ["init", "pwsh", "--config", str(oh_my_posh_config), "--print"], ["--version"],
+                 f"oh-my-posh init pwsh --config '{oh_my_posh_config}' | Invoke-Expression",
+                 config=oh_my_posh_config),
+    ]
+
+
+def profile_loader(script: Path, tool: InitTool) -> str:
+    """
+    Returns a profile line that dot-sources a cached init script, or runs the
+    live init command when the cache has not been generated.
+    """
+    return f"if (Test-Path '{script}') {{ . '{script}' }} else {{ {tool.fallback} }}"
+
+
+class InitScriptCache:
+    """
+    Runs each tool's init once at install time and stores the generated script.
+
+    fingerprints.json records the binary path, its mtime and size, the tool
+    version, the init arguments and the config mtime; a script is regenerated
+    only when one of these changes.
+    """
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.fingerprint_path = self.root / "fingerprints.json"
+
+    def script_path(self, tool: InitTool) -> Path:
+        return self.root / tool.script_name
+
+    def _load_fingerprints(self) -> Dict[str, dict]:
+        try:
+            return json.loads(self.fingerprint_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_fingerprints(self, fingerprints: Dict[str, dict]) -> None:
+        tmp = self.fingerprint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(fingerprints, indent=2), encoding="utf-8")
+        os.replace(tmp, self.fingerprint_path)
+
+    @staticmethod
+    def _run(argv: List[str]) -> str:
+        result = subprocess.run(argv, capture_output=True, text=True, encoding="utf-8", check=True, timeout=60)
+        return result.stdout
+
+    def fingerprint(self, tool: InitTool, binary: str, previous: Optional[dict] = None) -> dict:
+        """
+        Build the fingerprint for a tool. The version is only queried again when
+        the binary itself changed since the previous fingerprint.
+        """
+        stat = os.stat(binary)
+        fingerprint = {
+            "binary": binary,
+            "binary_mtime": stat.st_mtime_ns,
+            "binary_size": stat.st_size,
+            "init_args": tool.init_args,
+            "config_mtime": tool.config.stat().st_mtime_ns if tool.config and tool.config.exists() else None,
+        }
+        if previous and all(previous.get(key) == fingerprint[key]
+                            for key in ("binary", "binary_mtime", "binary_size")):
+            fingerprint["version"] = previous.get("version")
+        else:
+            fingerprint["version"] = self._run([binary, *tool.version_args]).strip()
+        return fingerprint
+
+    def update(self, tools: List[InitTool]) -> Dict[str, str]:
+        """
+        Regenerate stale init scripts.
+
+        Args:
+            tools (List[InitTool]): Tools to cache.
+
+        Returns:
+            Dict[str, str]: Per tool, one of "generated", "unchanged" or "missing"
+                            (the executable is not on PATH).
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        fingerprints = self._load_fingerprints()
+        status = {}
+        for tool in tools:
+            binary = shutil.which(tool.executable)
+            if binary is None:
+                status[tool.name] = "missing"
+                continue
+
+            previous = fingerprints.get(tool.name)
+            current = self.fingerprint(tool, binary, previous)
+            script = self.script_path(tool)
+            if current == previous and script.exists():
+                status[tool.name] = "unchanged"
+                continue
+
+            content = self._run([binary, *tool.init_args])
+            tmp = script.with_suffix(".tmp")
+            tmp.write_text(content, encoding="utf-8")
+            os.replace(tmp, script)
+            fingerprints[tool.name] = current
+            status[tool.name] = "generated"
+
+        self._save_fingerprints(fingerprints)
+        return status
@@ -0,0 +1,384 @@
+import json
+import os
+import re
+import shlex
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from CommandRunner import CommandRunner
+from ExecutionPolicy import ExecutionPolicy
+from StepScheduler import Step, StepScheduler
+from Inventory import PackageInventory, winget_package_id
+
+# Output fragments winget prints when a package needs no work.
+ALREADY_INSTALLED_MARKERS = ("No available upgrade found", "already installed")
+# A stuck installer is killed after 15 minutes; network failures are retried twice.
+INSTALL_POLICY = ExecutionPolicy(timeout=15 * 60, retries=2)
+# One import installs every package in turn, so it gets the budget of several installs.
+IMPORT_POLICY = ExecutionPolicy(timeout=60 * 60)
+
+# How "winget import" locates each source a package can come from.
+IMPORT_SOURCES = {
+    "winget": {"Name": "winget", "Identifier": "Microsoft.Winget.Source_8wekyb3d8bbwe",
+               "Argument": "https://cdn.winget.microsoft.com/cache", "Type": "Microsoft.PreIndexed.Package"},
+    "msstore": {"Name": "msstore", "Identifier": "StoreEdgeFD",
+                "Argument": "https://storeedgefd.dsx.mp.microsoft.com/v9.0", "Type": "Microsoft.Rest"},
+}
+# Options of "winget install" that an import document expresses or that change nothing there
+_IMPORT_FLAGS = {"-e", "--exact", "-h", "--silent", "--accept-package-agreements",
+                 "--accept-source-agreements", "--disable-interactivity"}
+_FOUND_RE = re.compile(r"^Found .*\[(?P<id>[^\]\s]+)\]")
+_ALREADY_RE = re.compile(r"Package is already installed: (?P<id>\S+)", re.I)
+_NOT_FOUND_RE = re.compile(r"Package not found: (?P<id>\S+)", re.I)
+_FAILED_MARKERS = ("Installer failed", "Installation failed", "Installation abandoned")
+
+
+@dataclass
+class PackageSpec:
+    """
+    A single package to install: its manifest name, shell command and the
+    names of packages that must be installed before it.
+
+    package_id is the winget ID looked up in the inventory; it defaults to the
+    one in command, and is needed when command does not name it (e.g. an
+    install from a local manifest).
+    """
+    name: str
+    command: str
+    depends_on: List[str] = field(default_factory=list)
+    package_id: Optional[str] = None
+
+
+@dataclass
+class InstallResult:
+    """
+    Outcome of installing one package.
+
+    status is one of "installed", "already_installed", "failed" or "skipped"
+    (a dependency failed, so the command was never run).
+    """
+    name: str
+    command: str
+    status: str
+    returncode: Optional[int] = None
+    output: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("installed", "already_installed")
+
+
+class ParallelInstaller:
+    """
+    Runs package install commands concurrently on a bounded worker pool,
+    honouring depends_on ordering between packages.
+
+    When an inventory is given, winget packages it already lists are reported
+    as already installed without spawning their install command. Command
+    output is streamed through runner; only its tail is kept, and printed for
+    failed installs.
+    """
+    def __init__(self, max_workers: int = 4, inventory: Optional[PackageInventory] = None,
+                 runner: Optional[CommandRunner] = None):
+        self.max_workers = max(1, max_workers)
+        self.inventory = inventory
+        self.runner = runner or CommandRunner(policy=INSTALL_POLICY)
+
+    def _install_one(self, spec: PackageSpec) -> InstallResult:
+        display = self.runner.display
+        package_id = spec.package_id or winget_package_id(spec.command)
+        if self.inventory is not None and package_id and self.inventory.is_installed(package_id):
+            display.write(f"Already installed: {spec.name} ({package_id})")
+            return InstallResult(spec.name, spec.command, "already_installed")
+
+        already_installed = False
+
+        def watch(line: str) -> None:
+            nonlocal already_installed
+            if not already_installed and any(marker in line for marker in ALREADY_INSTALLED_MARKERS):
+                already_installed = True
+
+        result = self.runner.run(spec.command, label=spec.name, on_line=watch)
+        if result.returncode == 0:
+            status = "installed"
+        elif already_installed and not result.timed_out:
+            status = "already_installed"
+        else:
+            status = "failed"
+
+        message = f"Executed: {spec.command} ({status.replace('_', ' ')}, {result.duration:.1f}s)"
+        if status == "failed":
+            message += "\n" + result.output
+        display.write(message)
+        return InstallResult(spec.name, spec.command, status, result.returncode, result.output)
+
+    def run(self, specs: List[PackageSpec]) -> Dict[str, InstallResult]:
+        """
+        Install all packages, starting each one as soon as its dependencies succeeded.
+
+        Args:
+            specs (List[PackageSpec]): Packages to install.
+
+        Returns:
+            Dict[str, InstallResult]: Results keyed by package name, in manifest order.
+
+        Raises:
+            ValueError: If a dependency is unknown or the dependencies form a cycle.
+        """
+        results: Dict[str, InstallResult] = {}
+
+        def make_step(spec: PackageSpec) -> Step:
+            def install() -> bool:
+                results[spec.name] = self._install_one(spec)
+                return results[spec.name].ok
+            return Step(spec.name, spec.name, install, list(spec.depends_on))
+
+        step_results = StepScheduler(self.max_workers, verbose=False).run(
+            [make_step(spec) for spec in specs]
+        )
+        for spec in specs:
+            if spec.name not in results:
+                step_result = step_results[spec.name]
+                if step_result.status == "cancelled":
+                    results[spec.name] = InstallResult(spec.name, spec.command, "skipped")
+                else:
+                    results[spec.name] = InstallResult(
+                        spec.name, spec.command, "failed", output=str(step_result.error)
+                    )
+        return {spec.name: results[spec.name] for spec in specs}
+
+
+def import_entry(command: str) -> Optional[Tuple[str, str, Optional[str]]]:
+    """
+    Parse a manifest command that "winget import" can install.
+
+    Only "winget install --id <Publisher.Name>" with an exact ID, optionally a
+    --source of winget or msstore and a --version, qualifies; other options
+    (e.g. --override or --scope) and bare queries such as "fzf" cannot be
+    expressed in an import document.
+
+    Returns:
+        Optional[Tuple[str, str, Optional[str]]]: (source, package ID, version), or None.
+    """
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None
+    if len(tokens) < 3 or tokens[0].lower() not in ("winget", "winget.exe") or tokens[1] != "install":
+        return None
+
+    package_id, source, version = None, "winget", None
+    args = iter(tokens[2:])
+    for token in args:
+        option, _, inline = token.partition("=")
+        if option in ("--id", "-q", "--query", "-s", "--source", "-v", "--version"):
+            value = inline or next(args, None)
+            if value is None:
+                return None
+            if option in ("-s", "--source"):
+                source = value
+            elif option in ("-v", "--version"):
+                version = value
+            else:
+                package_id = value
+        elif token in _IMPORT_FLAGS:
+            continue
+        elif not token.startswith("-") and package_id is None:
+            package_id = token
+        else:
+            return None
+    # IDs are Publisher.Name; anything else is a search query winget has to resolve
+    if not package_id or "." not in package_id or source not in IMPORT_SOURCES:
+        return None
+    return source, package_id, version
+
+
+def build_import_document(entries: List[Tuple[str, str, Optional[str]]]) -> dict:
+    """
+    Compile (source, package ID, version) entries into a "winget import" document,
+    keeping their order within each source.
+    """
+    sources: Dict[str, List[dict]] = {}
+    for source, package_id, version in entries:
+        package = {"PackageIdentifier": package_id}
+        if version:
+            package["Version"] = version
+        sources.setdefault(source, []).append(package)
+    return {
+        "$schema": "https://aka.ms/winget-packages.schema.2.0.json",
+        "CreationDate": time.strftime("%Y-%m-%dT%H:%M:%S.000-00:00", time.gmtime()),
+        "Sources": [{"Packages": packages, "SourceDetails": IMPORT_SOURCES[source]}
+                    for source, packages in sources.items()],
+        "WinGetVersion": "1.6.0",
+    }
+
+
+class ImportOutputParser:
+    """
+    Follows "winget import" output line by line and records each package's outcome.
+
+    winget announces every package with "Found <name> [<id>] Version ..." and
+    reports it as installed, already installed or failed before moving on to
+    the next one; packages it never mentions stay unaccounted for.
+    """
+    def __init__(self, package_ids: List[str]):
+        self._ids = {package_id.lower(): package_id for package_id in package_ids}
+        self.statuses: Dict[str, str] = {}
+        self._current: Optional[str] = None
+
+    def _resolve(self, package_id: str) -> Optional[str]:
+        return self._ids.get(package_id.strip(".,").lower())
+
+    def feed(self, line: str) -> None:
+        line = line.strip()
+        for pattern, status in ((_ALREADY_RE, "already_installed"), (_NOT_FOUND_RE, "failed")):
+            match = pattern.search(line)
+            if match and self._resolve(match.group("id")):
+                self.statuses[self._resolve(match.group("id"))] = status
+                return
+        match = _FOUND_RE.match(line)
+        if match:
+            self._current = self._resolve(match.group("id"))
+        elif self._current is None:
+            return
+        elif line.startswith("Successfully installed"):
+            self.statuses[self._current] = "installed"
+        elif any(marker in line for marker in ALREADY_INSTALLED_MARKERS):
+            self.statuses[self._current] = "already_installed"
+        elif any(marker in line for marker in _FAILED_MARKERS):
+            self.statuses[self._current] = "failed"
+
+
+class BatchInstaller:
+    """
+    Installs winget packages with a single "winget import" instead of one
+    "winget install" per package, so sources are refreshed and agreements
+    accepted once.
+
+    Packages that depend on other imported packages go into a later import,
+    one per level of dependencies. Packages the import output does not account
+    for, e.g. because winget printed it in another language, are looked up in
+    the refreshed inventory. Packages whose command cannot be expressed
+    in an import document, that depend on such a package or on one the import
+    did not report as installed, are then installed one by one through
+    ParallelInstaller, which honours depends_on and produces their error output.
+    """
+    def __init__(self, max_workers: int = 4, inventory: Optional[PackageInventory] = None,
+                 runner: Optional[CommandRunner] = None):
+        self.inventory = inventory
+        self.runner = runner or CommandRunner(policy=INSTALL_POLICY)
+        self.fallback = ParallelInstaller(max_workers, inventory, self.runner)
+
+    @staticmethod
+    def _ordered(specs: List[PackageSpec]) -> List[PackageSpec]:
+        """
+        Returns specs with every package after its dependencies.
+
+        Raises:
+            ValueError: If a dependency is unknown or the dependencies form a cycle.
+        """
+        by_name = {spec.name: spec for spec in specs}
+        ordered: List[PackageSpec] = []
+        state: Dict[str, str] = {}
+
+        def visit(spec: PackageSpec, path: Tuple[str, ...]) -> None:
+            if state.get(spec.name) == "done":
+                return
+            if state.get(spec.name) == "visiting":
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + (spec.name,))}")
+            state[spec.name] = "visiting"
+            for dep in spec.depends_on:
+                if dep not in by_name:
+                    raise ValueError(f"{spec.name} depends on unknown package '{dep}'")
+                visit(by_name[dep], path + (spec.name,))
+            state[spec.name] = "done"
+            ordered.append(spec)
+
+        for spec in specs:
+            visit(spec, ())
+        return ordered
+
+    def _import(self, specs: List[PackageSpec], entries: Dict[str, Tuple[str, str, Optional[str]]]) -> Dict[str, str]:
+        """
+        Run one "winget import" for specs and return the status reported for each.
+        """
+        document = build_import_document([entries[spec.name] for spec in specs])
+        parser = ImportOutputParser([entries[spec.name][1] for spec in specs])
+        fd, path = tempfile.mkstemp(prefix="winget-import-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(document, f, indent=2)
+            result = self.runner.run(
+                ["winget", "import", "--import-file", path, "--ignore-unavailable",
+                 "--accept-package-agreements", "--accept-source-agreements", "--disable-interactivity"],
+                label=f"winget import ({len(specs)} packages)", on_line=parser.feed, policy=IMPORT_POLICY,
+            )
+        finally:
+            os.unlink(path)
+        self.runner.display.write(f"Executed: winget import of {len(specs)} packages "
+                                  f"(exit status {result.returncode}, {result.duration:.1f}s)")
+        statuses = {spec.name: parser.statuses.get(entries[spec.name][1]) for spec in specs}
+        unaccounted = [spec for spec in specs if statuses[spec.name] is None]
+        if unaccounted and self.inventory is not None:
+            # The parser only knows winget's English messages; ask winget what is installed now
+            self.inventory.refresh()
+            for spec in unaccounted:
+                if self.inventory.is_installed(spec.package_id or entries[spec.name][1]):
+                    statuses[spec.name] = "installed"
+        return {name: status or "failed" for name, status in statuses.items()}
+
+    def run(self, specs: List[PackageSpec]) -> Dict[str, InstallResult]:
+        """
+        Install all packages: importable ones in one batch, the rest individually.
+
+        Args:
+            specs (List[PackageSpec]): Packages to install.
+
+        Returns:
+            Dict[str, InstallResult]: Results keyed by package name, in manifest order.
+
+        Raises:
+            ValueError: If a dependency is unknown or the dependencies form a cycle.
+        """
+        display = self.runner.display
+        by_name = {spec.name: spec for spec in specs}
+        results: Dict[str, InstallResult] = {}
+        entries: Dict[str, Tuple[str, str, Optional[str]]] = {}
+        batch: List[PackageSpec] = []
+        for spec in self._ordered(specs):
+            entry = import_entry(spec.command)
+            # The import runs first, so a package can only join it if its dependencies did
+            if entry is None or any(dep not in entries for dep in spec.depends_on):
+                continue
+            entries[spec.name] = entry
+            if self.inventory is not None and self.inventory.is_installed(spec.package_id or entry[1]):
+                display.write(f"Already installed: {spec.name} ({entry[1]})")
+                results[spec.name] = InstallResult(spec.name, spec.command, "already_installed")
+            else:
+                batch.append(spec)
+
+        # winget installs everything in an import, so a package is imported only after
+        # its dependencies were; dependents of a failed import go to the fallback instead
+        levels: Dict[str, int] = {}
+        for spec in batch:
+            levels[spec.name] = max((levels[dep] + 1 for dep in spec.depends_on if dep in levels), default=0)
+        for level in range(max(levels.values(), default=-1) + 1):
+            wave = [spec for spec in batch if levels[spec.name] == level
+                    and all(dep in results for dep in spec.depends_on)]
+            if not wave:
+                break
+            for name, status in self._import(wave, entries).items():
+                if status != "failed":
+                    display.write(f"Imported: {name} ({status.replace('_', ' ')})")
+                    results[name] = InstallResult(name, by_name[name].command, status, 0)
+
+        remaining = [spec for spec in specs if spec.name not in results]
+        if remaining:
+            if batch:
+                display.write(f"Installing {len(remaining)} packages individually")
+            pending = {spec.name for spec in remaining}
+            fallback = [PackageSpec(spec.name, spec.command, [dep for dep in spec.depends_on if dep in pending],
+                                    spec.package_id) for spec in remaining]
+            results.update(self.fallback.run(fallback))
+        return {spec.name: results[spec.name] for spec in specs}
@@ -0,0 +1,221 @@
+import re
+import shlex
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+from CommandRunner import CommandRunner
+from ExecutionPolicy import ExecutionPolicy
+
+# winget options that take a value; the value must not be mistaken for the package query.
+_VALUE_OPTIONS = {
+    "-s", "--source", "-v", "--version", "-l", "--location", "-o", "--log",
+    "--scope", "-a", "--architecture", "--locale", "--override", "--custom",
+    "--header", "--installer-type", "-m", "--manifest", "-n", "--name",
+    "--moniker", "--tag", "--cmd", "--command",
+}
+
+
+@dataclass
+class InstalledPackage:
+    """
+    One row of winget's installed-package listing.
+    """
+    name: str
+    package_id: str
+    version: str = ""
+    source: str = ""
+
+
+def winget_package_id(command: str) -> Optional[str]:
+    """
+    Extract the package query from a "winget install ..." command.
+
+    Args:
+        command (str): A shell command from the manifest.
+
+    Returns:
+        Optional[str]: The value of --id, or the first positional query, or None
+                       if the command is not a plain winget install.
+    """
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None
+    if len(tokens) < 3 or tokens[0].lower() not in ("winget", "winget.exe") or tokens[1] != "install":
+        return None
+
+    query = None
+    args = iter(tokens[2:])
+    for token in args:
+        if token in ("--id", "-q", "--query"):
+            return next(args, None)
+        if token.startswith("--id="):
+            return token.split("=", 1)[1]
+        if token in _VALUE_OPTIONS:
+            next(args, None)
+        elif not token.startswith("-") and query is None:
+            query = token
+    return query
+
+
+def _display_width(text: str) -> int:
+    return sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 0 if unicodedata.combining(ch) else 1
+               for ch in text)
+
+
+def _split_row(line: str, starts: List[int]) -> List[str]:
+    """
+    Cut a table row into cells at the given display columns.
+
+    winget pads each cell to a display width, in which East Asian wide
+    characters take two columns, so a row with such a name cannot be cut at
+    the header's string offsets.
+    """
+    if line.isascii():
+        return [line[start:end].strip() for start, end in zip(starts, [*starts[1:], None])]
+    cells = [""] * len(starts)
+    column, position = 0, 0
+    for ch in line:
+        while column + 1 < len(starts) and position >= starts[column + 1]:
+            column += 1
+        if position >= starts[0]:
+            cells[column] += ch
+        position += _display_width(ch)
+    return [cell.strip() for cell in cells]
+
+
+def parse_winget_list(lines: Iterable[str]) -> List[InstalledPackage]:
+    """
+    Parse the table printed by "winget list".
+
+    Columns are located from the header row (Name, Id, Version, Available, Source),
+    so localized padding and missing trailing columns are handled, and rows
+    are cut at display columns, so wide characters in a name do not shift the
+    cells after it. Progress spinner output before the header is ignored.
+    Names and IDs longer than their column end in "…".
+
+    Args:
+        lines (Iterable[str]): Output lines of "winget list".
+
+    Returns:
+        List[InstalledPackage]: One entry per table row.
+    """
+    packages = []
+    columns = None
+    for raw in lines:
+        line = raw.rstrip("\r\n").split("\r")[-1]
+        if columns is None:
+            if re.search(r"\bName\b", line) and re.search(r"\bId\b", line) and re.search(r"\bVersion\b", line):
+                offset = line.index("Name")
+                columns = [(m.group(0), _display_width(line[:m.start()]))
+                           for m in re.finditer(r"\S+", line) if m.start() >= offset]
+            continue
+        if not line.strip() or set(line.strip()) <= {"-"}:
+            continue
+
+        fields = dict(zip((title for title, _ in columns), _split_row(line, [start for _, start in columns])))
+        if fields.get("Id"):
+            packages.append(InstalledPackage(
+                fields.get("Name", ""), fields["Id"], fields.get("Version", ""), fields.get("Source", "")
+            ))
+    return packages
+
+
+def parse_winget_export(data: dict) -> List[InstalledPackage]:
+    """
+    Parse the JSON document written by "winget export".
+
+    Args:
+        data (dict): The loaded export document.
+
+    Returns:
+        List[InstalledPackage]: One entry per exported package.
+    """
+    packages = []
+    for source in data.get("Sources", []):
+        source_name = source.get("SourceDetails", {}).get("Name", "")
+        for package in source.get("Packages", []):
+            package_id = package.get("PackageIdentifier")
+            if package_id:
+                packages.append(InstalledPackage(package_id, package_id, package.get("Version", ""), source_name))
+    return packages
+
+
+class PackageInventory:
+    """
+    In-memory index of installed winget packages, queried once per run.
+
+    The listing is fetched lazily on the first lookup, through a CommandRunner
+    like the installs: it is retried after transient failures and cancelled
+    with the current CancelScope. If winget cannot be run or does not answer
+    within timeout seconds, the index is empty and every lookup reports "not
+    installed", so callers fall back to running the install command.
+    """
+    def __init__(self, packages: Optional[List[InstalledPackage]] = None, timeout: float = 120,
+                 runner: Optional[CommandRunner] = None):
+        self.timeout = timeout
+        # winget list may refresh its sources first, so it fails transiently like an install
+        self.runner = runner or CommandRunner(policy=ExecutionPolicy(timeout=timeout, retries=2))
+        self._lock = threading.Lock()
+        self._by_id: Optional[Dict[str, InstalledPackage]] = None
+        self._by_name: Dict[str, InstalledPackage] = {}
+        if packages is not None:
+            self._index(packages)
+
+    def _index(self, packages: List[InstalledPackage]) -> None:
+        self._by_id = {package.package_id.lower(): package for package in packages}
+        self._by_name = {package.name.lower(): package for package in packages if package.name}
+
+    def _load(self) -> None:
+        """
+        Raises:
+            CommandCancelled: If the current scope is cancelled while winget runs.
+        """
+        lines: List[str] = []
+        try:
+            result = self.runner.run(["winget", "list", "--accept-source-agreements", "--disable-interactivity"],
+                                     label="winget list", on_line=lines.append)
+        except OSError:
+            result = None
+        # Lines of a failed attempt come first; the table is the one after the last header
+        headers = [i for i, line in enumerate(lines)
+                   if re.search(r"\bName\b", line) and re.search(r"\bId\b", line)]
+        if result is not None and result.ok and headers:
+            self._index(parse_winget_list(lines[headers[-1]:]))
+        else:
+            self._index([])
+
+    def refresh(self) -> None:
+        """
+        Drop the cached listing so the next lookup queries winget again.
+        """
+        with self._lock:
+            self._by_id = None
+
+    def packages(self) -> List[InstalledPackage]:
+        with self._lock:
+            if self._by_id is None:
+                self._load()
+            return list(self._by_id.values())
+
+    def find(self, query: str) -> Optional[InstalledPackage]:
+        """
+        Look up a package by winget ID or display name (case-insensitive).
+        IDs truncated by winget with an ellipsis are matched by prefix.
+        """
+        with self._lock:
+            if self._by_id is None:
+                self._load()
+            key = query.lower()
+            if key in self._by_id:
+                return self._by_id[key]
+            if key in self._by_name:
+                return self._by_name[key]
+            for package_id, package in self._by_id.items():
+                if package_id.endswith("…") and key.startswith(package_id[:-1]):
+                    return package
+            return None
+
+    def is_installed(self, query: str) -> bool:
+        return self.find(query) is not None
@@ -1,31 +1,311 @@
+import hashlib
 import json
-from typing import List
+import os
+import pickle
+import re
+import shlex
+import socket
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from AppPaths import cache_dir
+from Inventory import winget_package_id
+
+PACKAGE_GROUPS = ('Necessary_packages', 'Py_packages')
+_ENTRY_KEYS = {'command', 'depends_on', 'requirement'}
+# Bump when PackageRecord or the compiled layout changes, to ignore old caches.
+_CACHE_FORMAT = 2
+# pip install options followed by a value that is not a requirement, e.g. "-r requirements.txt"
+_PIP_VALUE_OPTIONS = {
+    '-r', '--requirement', '-c', '--constraint', '-e', '--editable', '-i', '--index-url',
+    '--extra-index-url', '-f', '--find-links', '-t', '--target', '--prefix', '--root', '--src',
+    '--platform', '--python-version', '--implementation', '--abi', '--upgrade-strategy',
+    '--no-binary', '--only-binary', '--progress-bar', '--trusted-host', '--proxy', '--retries',
+    '--timeout', '--cert', '--client-cert', '--cache-dir', '--log', '--exists-action',
+    '--global-option', '-C', '--config-settings', '--report', '--root-user-action', '--python',
+}
+
+
+class ManifestError(ValueError):
+    """
+    Raised when a manifest file cannot be read or does not match the schema.
+    """
+
+
+@dataclass(slots=True, frozen=True)
+class PackageRecord:
+    """
+    A compiled manifest entry.
+
+    package_id is the winget ID for Necessary_packages entries installed with
+    winget; requirements are the pip requirements of Py_packages entries.
+    """
+    name: str
+    group: str
+    command: str
+    depends_on: Tuple[str, ...] = ()
+    package_id: Optional[str] = None
+    requirements: Tuple[str, ...] = ()
+
+
+@dataclass(slots=True)
+class CompiledManifest:
+    """
+    The merged manifest data, its package records and the lookup indexes.
+    """
+    data: dict
+    records: Tuple[PackageRecord, ...]
+    by_name: Dict[str, Tuple[PackageRecord, ...]]
+    by_id: Dict[str, PackageRecord]
+    by_group: Dict[str, Tuple[PackageRecord, ...]]
+    sources: Tuple[str, ...]
+
+
+def validate_manifest(data, source: str) -> None:
+    """
+    Check a single manifest file against the schema.
+
+    Raises:
+        ManifestError: Describing the first problem found.
+    """
+    if not isinstance(data, dict):
+        raise ManifestError(f"{source}: top level must be an object")
+    include = data.get('include', [])
+    if not (isinstance(include, list) and all(isinstance(path, str) for path in include)):
+        raise ManifestError(f"{source}: 'include' must be a list of file paths")
+    if 'overlays' in data:
+        overlays = data['overlays']
+        if not isinstance(overlays, dict) or not all(isinstance(v, (str, dict)) for v in overlays.values()):
+            raise ManifestError(f"{source}: 'overlays' must map machine names to a file path or an object")
+        for machine, overlay in overlays.items():
+            if isinstance(overlay, dict):
+                validate_manifest(overlay, f"{source} overlay '{machine}'")
+    if 'Nerd_fonts' in data:
+        fonts = data['Nerd_fonts']
+        if not (isinstance(fonts, list) and all(isinstance(font, str) for font in fonts)):
+            raise ManifestError(f"{source}: 'Nerd_fonts' must be a list of font names")
+
+    for group in PACKAGE_GROUPS:
+        if group not in data:
+            continue
+        if not isinstance(data[group], dict):
+            raise ManifestError(f"{source}: '{group}' must be an object")
+        for name, entry in data[group].items():
+            where = f"{source}: {group}.{name}"
+            if entry is None or isinstance(entry, str):
+                continue
+            if not isinstance(entry, dict):
+                raise ManifestError(f"{where} must be a command string, an object or null")
+            unknown = set(entry) - _ENTRY_KEYS
+            if unknown:
+                raise ManifestError(f"{where} has unknown keys: {', '.join(sorted(unknown))}")
+            if 'command' not in entry and 'requirement' not in entry:
+                raise ManifestError(f"{where} needs a 'command' or 'requirement'")
+            depends_on = entry.get('depends_on', [])
+            if not (isinstance(depends_on, list) and all(isinstance(d, str) for d in depends_on)):
+                raise ManifestError(f"{where}.depends_on must be a list of package names")
+
+
+def _merge(base: dict, overlay: dict) -> dict:
+    """
+    Merge one manifest into another. Package groups merge per entry, where a
+    null entry removes the package; other keys are replaced.
+    """
+    merged = dict(base)
+    for key, value in overlay.items():
+        if key in ('include', 'overlays'):
+            continue
+        if key in PACKAGE_GROUPS:
+            group = dict(merged.get(key, {}))
+            for name, entry in value.items():
+                if entry is None:
+                    group.pop(name, None)
+                else:
+                    group[name] = entry
+            merged[key] = group
+        else:
+            merged[key] = value
+    return merged
+
 
 class JsonManager:
-    def __init__(self):
+    def __init__(self, manifest_path: str = './packages.json', machine: Optional[str] = None,
+                 use_cache: bool = True):
+        """
+        Args:
+            manifest_path (str): The root manifest; other files are pulled in through "include".
+            machine (Optional[str]): Machine name selecting an entry of "overlays".
+                Defaults to this computer's name.
+            use_cache (bool): Load and store the compiled manifest in the cache directory.
+        """
+        self.manifest_path = Path(manifest_path)
+        self.machine = machine or os.environ.get('COMPUTERNAME') or socket.gethostname()
+        self.use_cache = use_cache
         self.applications_data: dict
+        self.manifest: CompiledManifest
         self.load_applications_data()
 
     def load_applications_data(self) -> None:
         """
-        Loads the applications data from JSON file, handling different encodings.
+        Loads the applications data from the manifest files, handling different encodings.
+        Uses the compiled cache when no source file changed.
         Falls back to empty dict if file is not found or cannot be decoded.
         """
+        try:
+            self.manifest = self._load_compiled()
+        except FileNotFoundError as e:
+            print(f"{e.filename} not found. Please ensure the file exists.")
+            self.manifest = self._compile({}, [])
+        except ManifestError as e:
+            print(f"Error in package manifest: {e}")
+            self.manifest = self._compile({}, [])
+        self.applications_data = self.manifest.data
+
+    # -- loading -----------------------------------------------------------------
+
+    @staticmethod
+    def _read_json(path: Path) -> dict:
+        raw = path.read_bytes()
         try:
             # Try UTF-8 encoding first
-            with open('./packages.json', 'r', encoding='utf-8') as f:
-                self.applications_data = json.load(f)
+            text = raw.decode('utf-8-sig')
         except UnicodeDecodeError:
             # If UTF-8 fails, try with 'cp1252' encoding
             try:
-                with open('./applications.json', 'r', encoding='cp1252') as f:
-                    self.applications_data = json.load(f)
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON: {e}")
-                self.applications_data = {}
-        except FileNotFoundError:
-            print("applications.json not found. Please ensure the file exists.")
-            self.applications_data = {}
+                text = raw.decode('cp1252')
+            except UnicodeDecodeError as e:
+                raise ManifestError(f"{path}: not valid UTF-8 or cp1252 text: {e}") from e
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ManifestError(f"{path}: error decoding JSON: {e}") from e
+        validate_manifest(data, str(path))
+        return data
+
+    def _load_tree(self, path: Path, sources: List[Path], stack: Tuple[Path, ...] = ()) -> dict:
+        """
+        Read a manifest with its includes (merged first) and the overlay for this machine (merged last).
+        """
+        path = path.resolve()
+        if path in stack:
+            raise ManifestError(f"Include cycle: {' -> '.join(str(p) for p in stack + (path,))}")
+        data = self._read_json(path)
+        sources.append(path)
+
+        merged: dict = {}
+        for include in data.get('include', []):
+            merged = _merge(merged, self._load_tree(path.parent / include, sources, stack + (path,)))
+        merged = _merge(merged, data)
+
+        overlay = data.get('overlays', {}).get(self.machine)
+        if isinstance(overlay, str):
+            merged = _merge(merged, self._load_tree(path.parent / overlay, sources, stack + (path,)))
+        elif isinstance(overlay, dict):
+            merged = _merge(merged, overlay)
+        return merged
+
+    @staticmethod
+    def _compile(data: dict, sources: List[Path]) -> CompiledManifest:
+        records = []
+        for group in PACKAGE_GROUPS:
+            for name, entry in data.get(group, {}).items():
+                command = JsonManager._entry_command(entry)
+                requirements: List[str] = []
+                if group == 'Py_packages':
+                    if isinstance(entry, dict) and 'requirement' in entry:
+                        requirements = [entry['requirement']]
+                    else:
+                        requirements = JsonManager._requirements_from_command(command) or [name]
+                records.append(PackageRecord(
+                    name=name,
+                    group=group,
+                    command=command,
+                    depends_on=tuple(JsonManager._entry_depends_on(entry)),
+                    package_id=winget_package_id(command) if group == 'Necessary_packages' else None,
+                    requirements=tuple(requirements),
+                ))
+
+        by_name: Dict[str, List[PackageRecord]] = {}
+        by_group: Dict[str, List[PackageRecord]] = {group: [] for group in PACKAGE_GROUPS}
+        by_id: Dict[str, PackageRecord] = {}
+        for record in records:
+            by_name.setdefault(record.name, []).append(record)
+            by_group[record.group].append(record)
+            if record.package_id:
+                by_id[record.package_id.lower()] = record
+
+        return CompiledManifest(
+            data=data,
+            records=tuple(records),
+            by_name={name: tuple(found) for name, found in by_name.items()},
+            by_id=by_id,
+            by_group={group: tuple(found) for group, found in by_group.items()},
+            sources=tuple(str(path) for path in sources),
+        )
+
+    # -- compiled cache ----------------------------------------------------------
+
+    def _cache_path(self) -> Path:
+        # Pickles are not portable across Python versions, so each version keeps its own cache
+        key = f"{self.manifest_path.resolve()}|{self.machine}|{_CACHE_FORMAT}|{sys.version_info[:2]}"
+        return cache_dir() / "manifest" / f"{hashlib.sha256(key.encode()).hexdigest()[:16]}.pickle"
+
+    @staticmethod
+    def _stat_key(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+    def _load_compiled(self) -> CompiledManifest:
+        """
+        Returns the compiled manifest, from the cache when every source file
+        still has the recorded mtime and size (or, failing that, the same hash).
+        """
+        cache_path = self._cache_path()
+        if self.use_cache and cache_path.exists():
+            try:
+                with open(cache_path, 'rb') as f:
+                    cached = pickle.load(f)
+                if cached['format'] == _CACHE_FORMAT:
+                    stats = {path: self._stat_key(path) for path in cached['stats']}
+                    if stats == cached['stats']:
+                        return cached['manifest']
+                    if all(self._file_hash(path) == digest for path, digest in cached['hashes'].items()):
+                        cached['stats'] = stats
+                        self._store_compiled(cached)
+                        return cached['manifest']
+            except Exception:
+                # Any cache that cannot be unpickled, e.g. one written by another Python or
+                # version of this module, is rebuilt; unpickling raises almost any exception
+                pass
+
+        sources: List[Path] = []
+        manifest = self._compile(self._load_tree(self.manifest_path, sources), sources)
+        if self.use_cache:
+            self._store_compiled({
+                'format': _CACHE_FORMAT,
+                'stats': {path: self._stat_key(path) for path in manifest.sources},
+                'hashes': {path: self._file_hash(path) for path in manifest.sources},
+                'manifest': manifest,
+            })
+        return manifest
+
+    def _store_compiled(self, cached: dict) -> None:
+        cache_path = self._cache_path()
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_path.with_suffix('.tmp')
+            with open(tmp, 'wb') as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+
+    # -- queries -----------------------------------------------------------------
 
     def print_applications_data(self) -> None:
         """
@@ -33,62 +313,142 @@ class JsonManager:
         """
         print(json.dumps(self.applications_data, indent=4))
 
+    def packages(self, group: str) -> Tuple[PackageRecord, ...]:
+        """
+        Returns the compiled records of a package group, in manifest order.
+        """
+        return self.manifest.by_group.get(group, ())
+
+    def find_package(self, name: str, group: Optional[str] = None) -> Optional[PackageRecord]:
+        """
+        Look up a package record by manifest name, optionally within one group.
+        """
+        for record in self.manifest.by_name.get(name, ()):
+            if group is None or record.group == group:
+                return record
+        return None
+
+    def find_by_id(self, package_id: str) -> Optional[PackageRecord]:
+        """
+        Look up a Necessary_packages record by winget package ID (case-insensitive).
+        """
+        return self.manifest.by_id.get(package_id.lower())
+
     def get_necessary_package_commands(self) -> List[str]:
         """
         Returns a list of winget installation commands for necessary packages.
-        
+
         Returns:
             List[str]: A list of winget commands to install necessary packages.
                       Each command is ready to be executed in PowerShell/Command Prompt.
         """
-        if not self.applications_data or 'Necessary_packages' not in self.applications_data:
-            return []
-        
-        return [
-            command for command in self.applications_data['Necessary_packages'].values()
-        ]
+        return [record.command for record in self.packages('Necessary_packages')]
 
     def get_python_package_commands(self) -> List[str]:
         """
         Returns a list of pip installation commands for Python packages.
-        
+
         Returns:
             List[str]: A list of pip install commands for required Python packages.
                       Each command is ready to be executed in terminal.
         """
-        if not self.applications_data or 'Py_packages' not in self.applications_data:
-            return []
-        
-        return [
-            command for command in self.applications_data['Py_packages'].values()
-        ]
+        return [record.command for record in self.packages('Py_packages')]
+
+    def get_python_package_requirements(self) -> List[str]:
+        """
+        Returns the pip requirement specifiers for Python packages.
+
+        An entry is either a pip command such as "pip install requests>=2.31" or an
+        object with a "requirement" key. The requirement is taken from the arguments
+        after "install"; options such as "--upgrade", and the values of options
+        such as "--index-url URL" or "-r requirements.txt", are ignored.
+
+        Returns:
+            List[str]: Requirement strings, e.g. ["requests>=2.31", "typing"].
+        """
+        requirements = []
+        for record in self.packages('Py_packages'):
+            requirements.extend(record.requirements)
+        return requirements
+
+    def get_python_package_names(self) -> List[str]:
+        """
+        Returns the distribution names of Python packages, without version specifiers.
+
+        Returns:
+            List[str]: Package names, e.g. ["requests", "typing"].
+        """
+        names = []
+        for requirement in self.get_python_package_requirements():
+            match = re.match(r'[A-Za-z0-9][A-Za-z0-9._-]*', requirement)
+            if match:
+                names.append(match.group(0))
+        return names
+
+    def get_nerd_fonts(self) -> List[str]:
+        """
+        Returns the Nerd Font release archives to install, e.g. ["Hack", "HeavyData"].
+        """
+        return list(self.applications_data.get('Nerd_fonts', []))
 
     def get_formatted_necessary_packages(self) -> List[tuple]:
         """
         Returns a list of tuples containing package names and their installation commands.
-        
+
         Returns:
             List[tuple]: A list of (package_name, install_command) tuples for necessary packages.
         """
-        if not self.applications_data or 'Necessary_packages' not in self.applications_data:
-            return []
-        
+        return [(record.name, record.command) for record in self.packages('Necessary_packages')]
+
+    def get_necessary_packages(self) -> List[Tuple[str, str, List[str]]]:
+        """
+        Returns the necessary packages together with their install ordering.
+
+        An entry in packages.json is either a plain command string or an object
+        of the form {"command": "...", "depends_on": ["other-package", ...]}.
+
+        Returns:
+            List[tuple]: A list of (package_name, install_command, depends_on) tuples.
+        """
         return [
-            (package, command) 
-            for package, command in self.applications_data['Necessary_packages'].items()
+            (record.name, record.command, list(record.depends_on))
+            for record in self.packages('Necessary_packages')
         ]
 
+    @staticmethod
+    def _entry_command(entry) -> str:
+        if isinstance(entry, dict):
+            return entry.get('command', '')
+        return entry
+
+    @staticmethod
+    def _entry_depends_on(entry) -> List[str]:
+        if isinstance(entry, dict):
+            return list(entry.get('depends_on', []))
+        return []
+
+    @staticmethod
+    def _requirements_from_command(command: str) -> List[str]:
+        try:
+            tokens = shlex.split(command)
+        except ValueError:
+            return []
+        if 'install' not in tokens:
+            return []
+        requirements = []
+        args = iter(tokens[tokens.index('install') + 1:])
+        for token in args:
+            if token in _PIP_VALUE_OPTIONS:
+                next(args, None)
+            elif not token.startswith('-'):
+                requirements.append(token)
+        return requirements
+
     def get_formatted_python_packages(self) -> List[tuple]:
         """
         Returns a list of tuples containing Python package names and their pip commands.
-        
+
         Returns:
             List[tuple]: A list of (package_name, pip_command) tuples for Python packages.
         """
-        if not self.applications_data or 'Py_packages' not in self.applications_data:
-            return []
-        
-        return [
-            (package, command) 
-            for package, command in self.applications_data['Py_packages'].items()
-        ]
+        return [(record.name, record.command) for record in self.packages('Py_packages')]
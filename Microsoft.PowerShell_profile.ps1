@@ -3,11 +3,12 @@
 
 $debug = $false
 
-# Define the path to the file that stores the last execution time
-$timeFilePath = "$env:USERPROFILE\Documents\PowerShell\LastExecutionTime.txt"
+# Update checks run in the background (pwsh-config's Updater.py), which writes their results here
+$updaterPath = "$env:USERPROFILE\.config\pwsh-config\updater\Updater.py"
+$updateStatusPath = "$env:USERPROFILE\.config\pwsh-config\update-status.json"
 
-# Define the update interval in days, set to -1 to always check
-$updateInterval = 7
+# Start a background check at startup when the last one is older than this many hours
+$updateStaleHours = 48
 
 if ($debug) {
     Write-Host "#######################################" -ForegroundColor Red
@@ -43,9 +44,6 @@ if ([bool]([System.Security.Principal.WindowsIdentity]::GetCurrent()).IsSystem)
     [System.Environment]::SetEnvironmentVariable('POWERSHELL_TELEMETRY_OPTOUT', 'true', [System.EnvironmentVariableTarget]::Machine)
 }
 
-# Initial GitHub.com connectivity check with 1 second timeout
-$global:canConnectToGitHub = Test-Connection github.com -Count 1 -Quiet -TimeoutSeconds 1
-
 # Import Modules and External Profiles
 # Ensure Terminal-Icons module is installed before importing
 if (-not (Get-Module -ListAvailable -Name Terminal-Icons)) {
@@ -57,15 +55,51 @@ if (Test-Path($ChocolateyProfile)) {
     Import-Module "$ChocolateyProfile"
 }
 
+# Run the updater; with -Background it returns at once and the results are shown from the next shell on.
+# Returns whether it ran; a command other than check must also succeed, and its messages are shown
+function Invoke-Updater {
+    param([string]$Command = 'check', [switch]$Background)
+    if (-not (Test-Path $updaterPath)) {
+        return $false
+    }
+    $names = if ($Background) { 'pythonw', 'python' } else { 'python' }
+    $python = Get-Command $names -CommandType Application -ErrorAction SilentlyContinue | Select-Object -First 1
+    if (-not $python) {
+        return $false
+    }
+    if ($Background) {
+        Start-Process -FilePath $python.Source -ArgumentList "`"$updaterPath`" $Command" -WindowStyle Hidden
+        return $true
+    }
+    if ($Command -eq 'check') {
+        & $python.Source $updaterPath check | Out-Null
+        return $true
+    }
+    & $python.Source $updaterPath $Command 2>&1 | ForEach-Object { Write-Host $_ }
+    return $LASTEXITCODE -eq 0
+}
+
 # Check for Profile Updates
 function Update-Profile {
     try {
+        # The updater keeps the latest profile and its ETag, so an unchanged profile is not downloaded again.
+        # It installs that copy only if its hash matches the check's, and keeps pwsh-config's managed blocks
+        if ((Invoke-Updater) -and (Invoke-Updater -Command install-profile)) {
+            return
+        }
         $url = "https://raw.githubusercontent.com/PUXSY/pwsh-config/refs/heads/main/Microsoft.PowerShell_profile.ps1"
-        $oldhash = Get-FileHash $PROFILE
-        Invoke-RestMethod $url -OutFile "$env:temp/Microsoft.PowerShell_profile.ps1"
-        $newhash = Get-FileHash "$env:temp/Microsoft.PowerShell_profile.ps1"
-        if ($newhash.Hash -ne $oldhash.Hash) {
-            Copy-Item -Path "$env:temp/Microsoft.PowerShell_profile.ps1" -Destination $PROFILE -Force
+        $latest = "$env:temp/Microsoft.PowerShell_profile.ps1"
+        Invoke-RestMethod $url -OutFile $latest
+        # Compare and replace only the part outside pwsh-config's managed blocks (the cached init
+        # scripts); the blocks are carried over, so updating does not undo the installer's setup
+        $blockPattern = '(?ms)^# >>> pwsh-config: (\S+) >>>\r?$.*?^# <<< pwsh-config: \1 <<<\r?$'
+        $current = if (Test-Path $PROFILE) { Get-Content -Path $PROFILE -Raw } else { '' }
+        $blocks = @([regex]::Matches("$current", $blockPattern) | ForEach-Object Value)
+        $unmanaged = ([regex]::Replace("$current", $blockPattern, '') -replace "\r\n", "`n").TrimEnd()
+        $upstream = (Get-Content -Path $latest -Raw).TrimStart([char]0xFEFF)
+        if (($upstream -replace "\r\n", "`n").TrimEnd() -ne $unmanaged.TrimStart([char]0xFEFF)) {
+            $content = (@($upstream.TrimEnd()) + $blocks) -join ([Environment]::NewLine * 2)
+            Set-Content -Path $PROFILE -Value $content -Encoding utf8
             Write-Host "Profile has been updated. Please restart your shell to reflect changes" -ForegroundColor Magenta
         } else {
             Write-Host "Profile is up to date." -ForegroundColor Green
@@ -82,9 +116,19 @@ function Update-PowerShell {
         Write-Host "Checking for PowerShell updates..." -ForegroundColor Cyan
         $updateNeeded = $false
         $currentVersion = $PSVersionTable.PSVersion.ToString()
-        $gitHubApiUrl = "https://api.github.com/repos/PowerShell/PowerShell/releases/latest"
-        $latestReleaseInfo = Invoke-RestMethod -Uri $gitHubApiUrl
-        $latestVersion = $latestReleaseInfo.tag_name.Trim('v')
+        $latestVersion = $null
+        # The updater asks GitHub with a conditional request, which is answered from its cache when nothing changed
+        if ((Invoke-Updater) -and (Test-Path $updateStatusPath)) {
+            $status = Get-Content -Path $updateStatusPath -Raw | ConvertFrom-Json
+            if (-not $status.errors.powershell) {
+                $latestVersion = $status.powershell.latest
+            }
+        }
+        if (-not $latestVersion) {
+            $gitHubApiUrl = "https://api.github.com/repos/PowerShell/PowerShell/releases/latest"
+            $latestReleaseInfo = Invoke-RestMethod -Uri $gitHubApiUrl
+            $latestVersion = $latestReleaseInfo.tag_name.Trim('v')
+        }
         if ($currentVersion -lt $latestVersion) {
             $updateNeeded = $true
         }
@@ -101,20 +145,26 @@ function Update-PowerShell {
     }
 }
 
-# skip in debug mode
-# Check if not in debug mode AND (updateInterval is -1 OR file doesn't exist OR time difference is greater than the update interval)
-if (-not $debug -and `
-    ($updateInterval -eq -1 -or `
-     -not (Test-Path $timeFilePath) -or `
-     ((Get-Date).Date - [datetime]::ParseExact((Get-Content -Path $timeFilePath), 'yyyy-MM-dd', $null).Date).TotalDays -gt $updateInterval)) {
-
-    Update-PowerShell
-    $currentTime = Get-Date -Format 'yyyy-MM-dd'
-    $currentTime | Out-File -FilePath $timeFilePath
-} elseif (-not $debug) {
-    Write-Warning "PowerShell update skipped. Last update check was within the last $updateInterval day(s)."
+# Report what the last background check found; startup itself never waits on the network
+if ($debug) {
+    Write-Warning "Skipping update check in debug mode"
+} elseif (Test-Path $updateStatusPath) {
+    $updateStatus = Get-Content -Path $updateStatusPath -Raw | ConvertFrom-Json
+    try {
+        if ($updateStatus.powershell.latest -and $PSVersionTable.PSVersion -lt [semver]$updateStatus.powershell.latest) {
+            Write-Host "PowerShell $($updateStatus.powershell.latest) is available. Run Update-PowerShell to install it." -ForegroundColor Yellow
+        }
+    } catch {
+        # Not a version number; nothing to report
+    }
+    if ($updateStatus.profile.update_available) {
+        Write-Host "A profile update is available. Run Update-Profile to install it." -ForegroundColor Yellow
+    }
+    if (((Get-Date) - (Get-Item $updateStatusPath).LastWriteTime).TotalHours -gt $updateStaleHours) {
+        $null = Invoke-Updater -Background
+    }
 } else {
-    Write-Warning "Skipping PowerShell update in debug mode"
+    $null = Invoke-Updater -Background
 }
 
 function Clear-Cache {
@@ -173,7 +223,30 @@ function Edit-Profile {
 Set-Alias -Name ep -Value Edit-Profile
 
 function touch($file) { "" | Out-File $file -Encoding ASCII }
+# Query the file index kept by pwsh-config's FileIndex.py; returns $null when it cannot answer,
+# e.g. it is not installed or the directory is not indexed, so the caller searches the disk instead
+function Invoke-FileIndex {
+    $fileIndex = "$env:USERPROFILE\.config\pwsh-config\file-index\FileIndex.py"
+    if (-not (Test-Path $fileIndex)) {
+        return $null
+    }
+    $python = Get-Command python -CommandType Application -ErrorAction SilentlyContinue | Select-Object -First 1
+    if (-not $python) {
+        return $null
+    }
+    $output = & $python.Source $fileIndex @args
+    if ($LASTEXITCODE -ne 0) {
+        return $null
+    }
+    # Keep an empty result distinct from $null
+    return ,@($output)
+}
+
 function ff($name) {
+    $indexed = Invoke-FileIndex find $name --under (Get-Location).ProviderPath
+    if ($null -ne $indexed) {
+        return $indexed
+    }
     Get-ChildItem -recurse -filter "*${name}*" -ErrorAction SilentlyContinue | ForEach-Object {
         Write-Output "$($_.FullName)"
     }
@@ -296,6 +369,13 @@ function hb {
 }
 function grep($regex, $dir) {
     if ( $dir ) {
+        $path = Resolve-Path $dir -ErrorAction SilentlyContinue
+        if (@($path).Count -eq 1) {
+            $indexed = Invoke-FileIndex grep $regex --in $path.ProviderPath
+            if ($null -ne $indexed) {
+                return $indexed
+            }
+        }
         Get-ChildItem $dir | select-string $regex
         return
     }
@@ -515,24 +595,8 @@ function Get-Theme {
     }
 }
 
-## Final Line to set prompt
-Get-Theme
-if (Get-Command zoxide -ErrorAction SilentlyContinue) {
-    Invoke-Expression (& { (zoxide init --cmd cd powershell | Out-String) })
-} else {
-    Write-Host "zoxide command not found. Attempting to install via winget..."
-    try {
-        winget install -e --id ajeetdsouza.zoxide
-        Write-Host "zoxide installed successfully. Initializing..."
-        Invoke-Expression (& { (zoxide init powershell | Out-String) })
-    } catch {
-        Write-Error "Failed to install zoxide. Error: $_"
-    }
-}
-
-Set-Alias -Name z -Value __zoxide_z -Option AllScope -Scope Global -Force
-Set-Alias -Name zi -Value __zoxide_zi -Option AllScope -Scope Global -Force
-oh-my-posh init pwsh --config './.config/ohmyposh/the-unnamed.omp.json' | Invoke-Expression
+# zoxide, oh-my-posh and the z/zi aliases are set up by the installer's managed init block at the end of
+# this file; it loads their cached init scripts, so each tool initialises once
 
 # Help Function
 function Show-Help {
@@ -548,7 +612,7 @@ $($PSStyle.Foreground.Green)Edit-Profile$($PSStyle.Reset) - Opens the current us
 
 $($PSStyle.Foreground.Green)touch$($PSStyle.Reset) <file> - Creates a new empty file.
 
-$($PSStyle.Foreground.Green)ff$($PSStyle.Reset) <name> - Finds files recursively with the specified name.
+$($PSStyle.Foreground.Green)ff$($PSStyle.Reset) <name> - Finds files recursively with the specified name, using the file index when one covers the current directory.
 
 $($PSStyle.Foreground.Green)Get-PubIP$($PSStyle.Reset) - Retrieves the public IP address of the machine.
 
@@ -564,7 +628,7 @@ $($PSStyle.Foreground.Green)unzip$($PSStyle.Reset) <file> - Extracts a zip file
 
 $($PSStyle.Foreground.Green)hb$($PSStyle.Reset) <file> - Uploads the specified file's content to a hastebin-like service and returns the URL.
 
-$($PSStyle.Foreground.Green)grep$($PSStyle.Reset) <regex> [dir] - Searches for a regex pattern in files within the specified directory or from the pipeline input.
+$($PSStyle.Foreground.Green)grep$($PSStyle.Reset) <regex> [dir] - Searches for a regex pattern in files within the specified directory (through the file index when it has their contents) or from the pipeline input.
 
 $($PSStyle.Foreground.Green)df$($PSStyle.Reset) - Displays information about volumes.
 
@@ -0,0 +1,369 @@
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+from AppPaths import cache_dir
+from CommandRunner import CommandRunner
+from ExecutionPolicy import CancelScope, CommandCancelled, current_scope
+from FontInstaller import NERD_FONTS_URL, DownloadCache
+from InstallEngine import INSTALL_POLICY
+from JsonManager import JsonManager, PackageRecord
+from PipInstaller import PIP_POLICY, is_satisfied
+from Tracing import Span, tracer
+
+LOCK_NAME = "mirror.lock.json"
+# Bump when the lockfile layout changes; older lockfiles are rejected.
+_LOCK_FORMAT = 2
+_CHUNK_SIZE = 1 << 20
+# Passed to every winget call so neither download nor install waits for a prompt
+WINGET_AGREEMENTS = ["--accept-source-agreements", "--accept-package-agreements", "--disable-interactivity"]
+_INSTALLER_URL_RE = re.compile(r"^(?P<indent>[ \t]*-?[ \t]*)InstallerUrl:.*$", re.M)
+_INSTALLER_SHA_RE = re.compile(r"^[ \t]*-?[ \t]*InstallerSha256:.*\n?", re.M)
+
+
+class MirrorError(ValueError):
+    """
+    Raised when a mirror has no usable lockfile.
+    """
+
+
+@dataclass
+class BundleItem:
+    """
+    Outcome of mirroring one manifest entry.
+
+    kind is "winget", "pip" or "font"; status is "bundled", "unchanged",
+    "skipped" (the entry cannot be mirrored, e.g. a script) or "failed".
+    """
+    name: str
+    kind: str
+    status: str
+    detail: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status != "failed"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _command_line(argv: List[str]) -> str:
+    """
+    Join an argv into a command string for the shell CommandRunner starts string commands with.
+    """
+    return subprocess.list2cmdline(argv) if sys.platform == "win32" else shlex.join(argv)
+
+
+def _count(files: Dict[str, str]) -> str:
+    return f"{len(files)} file" + ("" if len(files) == 1 else "s")
+
+
+def localize_manifest(text: str, installer: Path, sha256: str) -> Optional[str]:
+    """
+    Point the single installer of a downloaded winget manifest at a local file.
+
+    "winget download" keeps the upstream InstallerUrl in the manifest it
+    writes, so installing from that manifest would download the installer
+    again; the rewritten one installs the mirrored file instead.
+
+    Returns:
+        Optional[str]: The manifest text, or None if it does not have exactly one installer.
+    """
+    if len(_INSTALLER_URL_RE.findall(text)) != 1:
+        return None
+    text = _INSTALLER_SHA_RE.sub("", text)
+    match = _INSTALLER_URL_RE.search(text)
+    # The hash line continues the installer's mapping, so it is indented like the URL's key
+    key_indent = " " * len(match.group("indent"))
+    replacement = (f"{match.group('indent')}InstallerUrl: {installer.resolve().as_uri()}\n"
+                   f"{key_indent}InstallerSha256: {sha256.upper()}")
+    return text[:match.start()] + replacement + text[match.end():]
+
+
+def winget_download_command(command: str, directory: Path) -> Optional[List[str]]:
+    """
+    Turn a "winget install ..." manifest command into the matching "winget download".
+
+    Returns:
+        Optional[List[str]]: The argv, or None if command is not a plain winget install.
+    """
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None
+    if len(tokens) < 3 or tokens[0].lower() not in ("winget", "winget.exe") or tokens[1] != "install":
+        return None
+    return [tokens[0], "download", *tokens[2:], "--download-directory", str(directory), *WINGET_AGREEMENTS]
+
+
+class Mirror:
+    """
+    A directory holding everything the setup downloads, so machines can be
+    provisioned from local disk or a LAN share.
+
+    Layout:
+        packages.json       the merged manifest the mirror was built from
+        winget/<name>/      installer and manifest from "winget download"
+        pip/                wheels and sdists from "pip download"
+        fonts/<font>.zip    Nerd Font release archives
+        mirror.lock.json    SHA-256 of every file above, per manifest entry
+    """
+    def __init__(self, root: Path, staging: Optional[Path] = None):
+        """
+        Args:
+            root (Path): The mirror directory.
+            staging (Optional[Path]): Where manifests rewritten for local installs
+                are written. Defaults to a directory per mirror in the cache.
+        """
+        self.root = Path(root).resolve()
+        self.staging = Path(staging) if staging else cache_dir() / "mirror" / hashlib.sha256(
+            str(self.root).encode("utf-8")).hexdigest()[:16]
+        self.lock_path = self.root / LOCK_NAME
+        self.manifest_path = self.root / "packages.json"
+        self.pip_dir = self.root / "pip"
+        self.fonts_dir = self.root / "fonts"
+        self._lock: Optional[dict] = None
+
+    def winget_dir(self, name: str) -> Path:
+        return self.root / "winget" / name
+
+    # -- lockfile ------------------------------------------------------------------
+
+    def load_lock(self) -> dict:
+        """
+        Returns the lockfile contents.
+
+        Raises:
+            MirrorError: If the lockfile is missing, unreadable or of another format.
+        """
+        if self._lock is None:
+            try:
+                lock = json.loads(self.lock_path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                raise MirrorError(f"{self.root} is not a mirror: {LOCK_NAME} not found "
+                                  f"(create it with 'main.py bundle {self.root}')") from None
+            except (OSError, json.JSONDecodeError) as e:
+                raise MirrorError(f"Cannot read {self.lock_path}: {e}") from e
+            if not isinstance(lock, dict) or lock.get("format") != _LOCK_FORMAT:
+                raise MirrorError(f"{self.lock_path} was written by an incompatible version; bundle again")
+            self._lock = lock
+        return self._lock
+
+    def _hash_files(self, paths: List[Path]) -> Dict[str, str]:
+        return {path.relative_to(self.root).as_posix(): _sha256(path) for path in sorted(paths)}
+
+    def _files_match(self, files: Dict[str, str]) -> bool:
+        return bool(files) and all(
+            (self.root / name).is_file() and _sha256(self.root / name) == digest for name, digest in files.items()
+        )
+
+    def verify(self, sections: Optional[List[str]] = None) -> List[str]:
+        """
+        Check mirrored files against the lockfile.
+
+        Args:
+            sections (Optional[List[str]]): Any of "winget", "pip" and "fonts"; defaults to all.
+
+        Returns:
+            List[str]: One message per missing or modified file; empty if the mirror is intact.
+        """
+        lock = self.load_lock()
+        files: Dict[str, str] = {}
+        for section in sections or ("winget", "pip", "fonts"):
+            if section == "pip":
+                files.update(lock.get("pip", {}).get("files", {}))
+            else:
+                for entry in lock.get(section, {}).values():
+                    files.update(entry.get("files", {}))
+        problems = []
+        for name, digest in files.items():
+            path = self.root / name
+            if not path.is_file():
+                problems.append(f"{name} is missing")
+            elif _sha256(path) != digest:
+                problems.append(f"{name} does not match its hash in {LOCK_NAME}")
+        return problems
+
+    def winget_command(self, name: str) -> Optional[str]:
+        """
+        Returns the command installing a package from the mirror, or None if the
+        package is not in the mirror.
+
+        The command installs from a copy of the mirrored manifest whose
+        InstallerUrl is the mirrored installer, written to the staging
+        directory, since the mirror itself may be a read-only share.
+
+        Raises:
+            MirrorError: If the mirrored manifest cannot be pointed at the installer.
+        """
+        entry = self.load_lock().get("winget", {}).get(name)
+        if entry is None:
+            return None
+        source = self.root / entry["manifest"]
+        installer = self.root / entry["installer"]
+        try:
+            text = localize_manifest(source.read_text(encoding="utf-8-sig"), installer,
+                                     entry["files"][entry["installer"]])
+        except OSError as e:
+            raise MirrorError(f"Cannot read {source}: {e}") from e
+        if text is None:
+            raise MirrorError(f"{source} does not describe exactly one installer")
+        manifest = self.staging / name / source.name
+        manifest.parent.mkdir(parents=True, exist_ok=True)
+        manifest.write_text(text, encoding="utf-8")
+        return _command_line(["winget", "install", "--manifest", str(manifest), *WINGET_AGREEMENTS])
+
+    # -- bundling ------------------------------------------------------------------
+
+    def bundle(self, json_manager: JsonManager, runner: Optional[CommandRunner] = None,
+               max_workers: int = 4, font_cache: Optional[Path] = None,
+               font_base_url: str = NERD_FONTS_URL) -> List[BundleItem]:
+        """
+        Download every winget package, Python requirement and Nerd Font of a
+        manifest into the mirror and write the lockfile.
+
+        Entries whose mirrored files still match the lockfile are not fetched
+        again. Downloads run concurrently on at most max_workers threads.
+
+        Args:
+            json_manager (JsonManager): The manifest to mirror.
+            runner (Optional[CommandRunner]): Runs winget and pip.
+            max_workers (int): Downloads run at the same time.
+            font_cache (Optional[Path]): DownloadCache directory for font archives,
+                so rebuilding a mirror only revalidates them.
+            font_base_url (str): Where the Nerd Font releases are downloaded from.
+
+        Returns:
+            List[BundleItem]: One item per manifest entry, font and the pip requirements.
+        """
+        try:
+            previous = self.load_lock()
+        except MirrorError:
+            previous = {}
+        self._lock = None
+        self.root.mkdir(parents=True, exist_ok=True)
+        runner = runner or CommandRunner(policy=INSTALL_POLICY)
+        lock = {"format": _LOCK_FORMAT, "created_at": time.time(), "winget": {}, "pip": {}, "fonts": {}}
+        scope, parent = current_scope(), tracer.current()
+
+        records = json_manager.packages("Necessary_packages")
+        fonts = json_manager.get_nerd_fonts()
+        cache = DownloadCache(font_cache or self.root / ".download-cache")
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            winget_jobs = [pool.submit(self._bundle_winget, record, previous.get("winget", {}).get(record.name),
+                                       runner, scope, parent) for record in records]
+            font_jobs = [pool.submit(self._bundle_font, font, f"{font_base_url.rstrip('/')}/{font}.zip",
+                                     cache, scope, parent) for font in fonts]
+            pip_item, pip_entry = self._bundle_pip(json_manager.get_python_package_requirements(),
+                                                   previous.get("pip"), runner)
+            items = []
+            for record, job in zip(records, winget_jobs):
+                item, entry = job.result()
+                items.append(item)
+                if entry is not None:
+                    lock["winget"][record.name] = entry
+            for font, job in zip(fonts, font_jobs):
+                item, entry = job.result()
+                items.append(item)
+                if entry is not None:
+                    lock["fonts"][font] = entry
+        items.append(pip_item)
+        if pip_entry is not None:
+            lock["pip"] = pip_entry
+
+        # Machines install from this copy; it has includes and this machine's overlay merged in
+        self.manifest_path.write_text(json.dumps(json_manager.applications_data, indent=4), encoding="utf-8")
+        lock["manifest_sha256"] = _sha256(self.manifest_path)
+        tmp = self.lock_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(lock, indent=2), encoding="utf-8")
+        os.replace(tmp, self.lock_path)
+        self._lock = lock
+        return items
+
+    def _bundle_winget(self, record: PackageRecord, previous: Optional[dict], runner: CommandRunner,
+                       scope: CancelScope, parent: Optional[Span]):
+        directory = self.winget_dir(record.name)
+        command = winget_download_command(record.command, directory)
+        if command is None:
+            return BundleItem(record.name, "winget", "skipped", "not a winget install command"), None
+        if previous and previous.get("command") == record.command and self._files_match(previous.get("files", {})):
+            return BundleItem(record.name, "winget", "unchanged"), previous
+
+        with CancelScope(parent=scope), tracer.span(record.name, "download", parent=parent):
+            try:
+                if directory.exists():
+                    shutil.rmtree(directory)
+                directory.mkdir(parents=True)
+                result = runner.run(command, label=f"download {record.name}")
+            except (OSError, CommandCancelled) as e:
+                return BundleItem(record.name, "winget", "failed", str(e)), None
+        if not result.ok:
+            return BundleItem(record.name, "winget", "failed",
+                              f"exit status {result.returncode}\n{result.output}"), None
+        manifests = sorted(directory.glob("*.yaml")) or sorted(directory.glob("*.yml"))
+        if not manifests:
+            return BundleItem(record.name, "winget", "failed", "winget download wrote no manifest"), None
+        installers = [path for path in directory.iterdir() if path.is_file() and path not in manifests]
+        if len(installers) != 1 or localize_manifest(manifests[0].read_text(encoding="utf-8-sig"),
+                                                     installers[0], "") is None:
+            return BundleItem(record.name, "winget", "failed",
+                              "winget download did not write exactly one installer and its manifest"), None
+        files = self._hash_files([path for path in directory.rglob("*") if path.is_file()])
+        entry = {"command": record.command, "id": record.package_id,
+                 "manifest": manifests[0].relative_to(self.root).as_posix(),
+                 "installer": installers[0].relative_to(self.root).as_posix(), "files": files}
+        return BundleItem(record.name, "winget", "bundled", _count(files)), entry
+
+    def _bundle_font(self, font: str, url: str, cache: DownloadCache, scope: CancelScope,
+                     parent: Optional[Span]):
+        target = self.fonts_dir / f"{font}.zip"
+        with CancelScope(parent=scope), tracer.span(font, "download", parent=parent):
+            try:
+                blob, _ = cache.fetch(url)
+                digest = _sha256(blob)
+                status = "unchanged"
+                if not target.exists() or _sha256(target) != digest:
+                    self.fonts_dir.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(blob, target)
+                    status = "bundled"
+            except OSError as e:
+                return BundleItem(font, "font", "failed", str(e)), None
+        entry = {"url": url, "files": {target.relative_to(self.root).as_posix(): digest}}
+        return BundleItem(font, "font", status), entry
+
+    def _bundle_pip(self, requirements: List[str], previous: Optional[dict], runner: CommandRunner):
+        # Standard library modules are never installed, so there is nothing to download for them
+        requirements = [req for req in requirements if not is_satisfied(req, {})]
+        if not requirements:
+            return BundleItem("python packages", "pip", "skipped", "no requirements to download"), None
+        if previous and previous.get("requirements") == requirements \
+                and self._files_match(previous.get("files", {})):
+            return BundleItem("python packages", "pip", "unchanged"), previous
+
+        command = [sys.executable, "-m", "pip", "download", "--dest", str(self.pip_dir), *requirements]
+        try:
+            self.pip_dir.mkdir(parents=True, exist_ok=True)
+            result = runner.run(command, label="pip download", policy=PIP_POLICY)
+        except (OSError, CommandCancelled) as e:
+            return BundleItem("python packages", "pip", "failed", str(e)), None
+        if not result.ok:
+            return BundleItem("python packages", "pip", "failed",
+                              f"exit status {result.returncode}\n{result.output}"), None
+        files = self._hash_files([path for path in self.pip_dir.iterdir() if path.is_file()])
+        entry = {"requirements": requirements, "files": files}
+        return BundleItem("python packages", "pip", "bundled", _count(files)), entry
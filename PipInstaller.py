@@ -0,0 +1,94 @@
+import re
+import sys
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, List, Optional
+from CommandRunner import CommandResult, CommandRunner
+from ExecutionPolicy import ExecutionPolicy
+
+try:
+    from packaging.requirements import InvalidRequirement, Requirement
+except ImportError:  # packaging is optional; without it only names are compared
+    Requirement = None
+    InvalidRequirement = ValueError
+
+PIP_POLICY = ExecutionPolicy(timeout=10 * 60, retries=2)
+
+
+def canonical_name(name: str) -> str:
+    """
+    Normalize a distribution name the way pip does (PEP 503).
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def installed_distributions() -> Dict[str, str]:
+    """
+    Returns the distributions installed in the running interpreter.
+
+    Returns:
+        Dict[str, str]: Installed versions keyed by canonical distribution name.
+    """
+    installed = {}
+    for dist in metadata.distributions():
+        name = dist.metadata['Name']
+        if name:
+            installed[canonical_name(name)] = dist.version
+    return installed
+
+
+def is_satisfied(requirement: str, installed: Dict[str, str]) -> bool:
+    """
+    Check whether a requirement is met by the installed distributions.
+
+    Standard library modules (e.g. "typing", "pathlib") count as satisfied:
+    installing their old PyPI backports into Python 3 is never wanted.
+
+    Args:
+        requirement (str): A pip requirement such as "requests>=2.31".
+        installed (Dict[str, str]): Output of installed_distributions().
+
+    Returns:
+        bool: True if nothing needs to be installed for this requirement.
+    """
+    match = re.match(r'[A-Za-z0-9][A-Za-z0-9._-]*', requirement)
+    if not match:
+        return False
+    name = canonical_name(match.group(0))
+
+    if name not in installed:
+        return name in getattr(sys, 'stdlib_module_names', ())
+    if Requirement is None:
+        return True
+    try:
+        parsed = Requirement(requirement)
+    except InvalidRequirement:
+        return True
+    return parsed.specifier.contains(installed[name], prereleases=True)
+
+
+def missing_requirements(requirements: List[str]) -> List[str]:
+    """
+    Returns the requirements that are not yet satisfied, preserving order.
+    """
+    installed = installed_distributions()
+    return [req for req in requirements if not is_satisfied(req, installed)]
+
+
+def install_requirements(requirements: List[str], runner: Optional[CommandRunner] = None,
+                         find_links: Optional[Path] = None) -> CommandResult:
+    """
+    Install requirements with a single pip invocation of the running interpreter.
+
+    Args:
+        requirements (List[str]): Requirements to install; must not be empty.
+        runner (Optional[CommandRunner]): Runner to stream pip's output through.
+        find_links (Optional[Path]): Install only from the wheels in this directory, without PyPI.
+
+    Returns:
+        CommandResult: pip's exit status and the tail of its output.
+    """
+    command = [sys.executable, "-m", "pip", "install", *requirements]
+    if find_links is not None:
+        command[4:4] = ["--no-index", "--find-links", str(find_links)]
+    return (runner or CommandRunner(policy=PIP_POLICY)).run(command, label="pip install")
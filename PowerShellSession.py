@@ -0,0 +1,200 @@
+import base64
+import collections
+import shutil
+import subprocess
+import threading
+from itertools import count
+from typing import List, Optional
+from ExecutionPolicy import CancelScope, current_scope, kill_process_tree, new_process_group
+from Tracing import tracer
+
+# Host loop run inside the long-lived pwsh process.
+#
+# Request (one line on stdin):   <id> TAB base64(utf-8 script)
+# Response (one line on stdout): <id> TAB <exit status> TAB base64(stdout) TAB base64(stderr)
+#
+# Scripts run in a fresh scriptblock scope; they must report failure with
+# throw or Write-Error rather than exit, which would end the session.
+BOOTSTRAP_SCRIPT = r'''
+$ErrorActionPreference = 'Continue'
+$ProgressPreference = 'SilentlyContinue'
+$utf8 = [System.Text.UTF8Encoding]::new($false)
+[Console]::OutputEncoding = $utf8
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($null -eq $line) { break }
+    $id, $payload = $line.Split("`t", 2)
+    $script = $utf8.GetString([Convert]::FromBase64String($payload))
+    $out = [System.Text.StringBuilder]::new()
+    $err = [System.Text.StringBuilder]::new()
+    $status = 0
+    $global:LASTEXITCODE = 0
+    try {
+        & ([scriptblock]::Create($script)) *>&1 | ForEach-Object {
+            if ($_ -is [System.Management.Automation.ErrorRecord]) {
+                [void]$err.AppendLine($_.ToString())
+                $status = 1
+            } else {
+                [void]$out.AppendLine(($_ | Out-String).TrimEnd("`r", "`n"))
+            }
+        }
+        if ($global:LASTEXITCODE) { $status = $global:LASTEXITCODE }
+    } catch {
+        [void]$err.AppendLine($_.ToString())
+        $status = 1
+    }
+    $encodedOut = [Convert]::ToBase64String($utf8.GetBytes($out.ToString()))
+    $encodedErr = [Convert]::ToBase64String($utf8.GetBytes($err.ToString()))
+    [Console]::Out.WriteLine("$id`t$status`t$encodedOut`t$encodedErr")
+    [Console]::Out.Flush()
+}
+'''
+
+
+def default_command() -> List[str]:
+    """
+    Returns the argv that starts pwsh running the session host loop.
+    """
+    encoded = base64.b64encode(BOOTSTRAP_SCRIPT.encode("utf-16-le")).decode("ascii")
+    return [shutil.which("pwsh") or "pwsh", "-NoLogo", "-NoProfile", "-NonInteractive", "-EncodedCommand", encoded]
+
+
+class PowerShellSession:
+    """
+    A long-lived pwsh process that runs scripts sent over stdin.
+
+    Each run() returns a subprocess.CompletedProcess, so callers can treat it
+    like subprocess.run(['pwsh', '-Command', script]). If the process dies, the
+    request in flight fails and the next run() starts a fresh process; the
+    same happens when a script times out or the current CancelScope is
+    cancelled. Safe to share between threads; requests are serialized.
+    """
+    def __init__(self, command: Optional[List[str]] = None):
+        """
+        Args:
+            command (Optional[List[str]]): argv of the interpreter speaking the framed
+                protocol. Defaults to pwsh running BOOTSTRAP_SCRIPT.
+        """
+        self.command = command
+        self.restarts = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr_tail = collections.deque(maxlen=50)
+        self._ids = count(1)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "PowerShellSession":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _start(self) -> None:
+        if self._process is not None:
+            self.restarts += 1
+        self._stderr_tail.clear()
+        self._process = subprocess.Popen(
+            self.command or default_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+            **new_process_group(),
+        )
+        threading.Thread(target=self._drain_stderr, args=(self._process,), daemon=True).start()
+
+    def _drain_stderr(self, process: subprocess.Popen) -> None:
+        for line in process.stderr:
+            self._stderr_tail.append(line.rstrip("\n"))
+
+    def _read_response(self, request_id: str) -> Optional[List[str]]:
+        while True:
+            line = self._process.stdout.readline()
+            if not line:
+                return None
+            parts = line.rstrip("\r\n").split("\t")
+            # Anything else is stray console output written around the host loop
+            if len(parts) == 4 and parts[0] == request_id:
+                return parts
+
+    def run(self, script: str, check: bool = False, timeout: Optional[float] = None,
+            label: str = "pwsh") -> subprocess.CompletedProcess:
+        """
+        Run a script in the session.
+
+        Args:
+            script (str): PowerShell source to execute.
+            check (bool): Raise CalledProcessError on a non-zero exit status.
+            timeout (Optional[float]): Seconds after which the session is killed and the script fails.
+            label (str): Name of the script in traces.
+
+        Returns:
+            subprocess.CompletedProcess: Exit status with the script's stdout and stderr.
+
+        Raises:
+            CommandCancelled: If the current scope is cancelled or its deadline passes.
+        """
+        parent = current_scope()
+        parent.check()
+        with tracer.span(label, "pwsh") as span, \
+                self._lock, CancelScope(timeout, parent=parent) as scope:
+            if not self.alive:
+                self._start()
+            scope.register(self._process)
+            timer = scope.watchdog()
+            request_id = str(next(self._ids))
+            payload = base64.b64encode(script.encode("utf-8")).decode("ascii")
+            try:
+                self._process.stdin.write(f"{request_id}\t{payload}\n")
+                self._process.stdin.flush()
+                response = self._read_response(request_id)
+            except OSError:
+                response = None
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+            if response is None:
+                kill_process_tree(self._process)
+                self._process.wait()
+                if scope.cancelled:
+                    stderr = f"PowerShell script {scope.reason}"
+                else:
+                    stderr = "\n".join(self._stderr_tail) or "PowerShell session exited unexpectedly"
+                result = subprocess.CompletedProcess(script, self._process.returncode or -1, "", stderr)
+            else:
+                result = subprocess.CompletedProcess(
+                    script,
+                    int(response[1]),
+                    base64.b64decode(response[2]).decode("utf-8", "replace"),
+                    base64.b64decode(response[3]).decode("utf-8", "replace"),
+                )
+            span.set(exit_code=result.returncode, restarted=response is None,
+                     output_bytes=len(result.stdout) + len(result.stderr))
+
+        parent.check()
+        if check:
+            result.check_returncode()
+        return result
+
+    def close(self) -> None:
+        """
+        End the session, closing stdin so the host loop exits cleanly.
+        """
+        with self._lock:
+            if self._process is None:
+                return
+            if self._process.poll() is None:
+                try:
+                    self._process.stdin.close()
+                    self._process.wait(timeout=5)
+                except (OSError, subprocess.TimeoutExpired):
+                    kill_process_tree(self._process)
+                    self._process.wait()
+            self._process = None
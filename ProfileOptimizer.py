@@ -0,0 +1,476 @@
+import argparse
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+from AppPaths import config_dir
+from ProfileWriter import ProfileWriter, atomic_write, strip_blocks, unmanaged_hash
+
+MODULE_NAME = "PwshConfigProfile"
+# First line of an optimized profile, so the installer never optimizes its own output again
+OPTIMIZED_HEADER = f"# Optimized by the pwsh-config profile optimizer; functions not used at startup are in {MODULE_NAME}"
+
+# Statements that block startup, with a rough cost estimate in milliseconds.
+# Blocks matching any of these are deferred to the first idle moment of the shell.
+DEFERRABLE_PATTERNS: List[Tuple[str, int, str]] = [
+    (r"\bTest-Connection\b", 1000, "network connectivity check"),
+    (r"\bInvoke-RestMethod\b|\bInvoke-WebRequest\b|\birm\b", 800, "network request"),
+    (r"--config\s+['\"]?https?://", 800, "remote theme download"),
+    (r"^\s*Update-PowerShell\b", 800, "GitHub release check"),
+    (r"\bInstall-Module\b", 300, "module install check"),
+    (r"\bGet-Module\s+-ListAvailable\b", 200, "module discovery"),
+    (r"\bImport-Module\b", 150, "module import"),
+    (r"\bTest-CommandExists\b|\bGet-Command\b", 60, "command lookup chain"),
+]
+
+_FUNCTION_RE = re.compile(r"^\s*function\s+([\w-]+)", re.IGNORECASE)
+_CONTINUATION_RE = re.compile(r"^\s*(elseif|else|catch|finally)\b", re.IGNORECASE)
+# Parsing one function definition is cheap, but a profile defines dozens of them.
+_FUNCTION_COST_MS = 2
+# Calling a profile function defers the call only for network work; cheaper work
+# in a function, such as a command lookup, is not worth printing its output late
+_CALLED_WORK_MIN_COST_MS = 800
+
+
+@dataclass
+class ProfileBlock:
+    """
+    A top-level statement of a profile script.
+
+    kind is "function", "statement" or "comment" (comments and blank lines).
+    placement is where the optimizer puts it: "eager" (stays in the profile),
+    "module" (moved to the autoloaded module) or "deferred" (run on idle).
+    """
+    kind: str
+    text: str
+    start_line: int
+    name: Optional[str] = None
+    placement: str = "eager"
+    reason: str = ""
+    cost_ms: int = 0
+
+
+@dataclass
+class OptimizationResult:
+    """
+    The rewritten profile, the module holding moved functions and the report.
+    """
+    profile: str
+    module: str
+    manifest: str
+    blocks: List[ProfileBlock] = field(default_factory=list)
+
+    @property
+    def estimated_savings_ms(self) -> int:
+        return sum(block.cost_ms for block in self.blocks if block.placement != "eager")
+
+    def report(self) -> dict:
+        return {
+            "estimated_savings_ms": self.estimated_savings_ms,
+            "module_functions": [b.name for b in self.blocks if b.placement == "module"],
+            "deferred": [
+                {"line": b.start_line, "reason": b.reason, "cost_ms": b.cost_ms,
+                 "text": b.text.strip().splitlines()[0]}
+                for b in self.blocks if b.placement == "deferred"
+            ],
+        }
+
+
+def _scan_line(line: str, state: dict) -> None:
+    """
+    Update brace depth and string/comment state for one line of PowerShell.
+    """
+    if state["herestring"]:
+        if line.startswith(state["herestring"]):
+            state["herestring"] = None
+        return
+
+    i = 0
+    while i < len(line):
+        ch = line[i]
+        if state["block_comment"]:
+            if line.startswith("#>", i):
+                state["block_comment"] = False
+                i += 1
+        elif state["quote"]:
+            if ch == "`" and state["quote"] == '"':
+                i += 1
+            elif ch == state["quote"]:
+                if line.startswith(ch * 2, i):
+                    i += 1
+                else:
+                    state["quote"] = None
+        elif line.startswith("<#", i):
+            state["block_comment"] = True
+            i += 1
+        elif ch == "#":
+            break
+        elif line.startswith('@"', i) or line.startswith("@'", i):
+            if line[i + 2:].strip() == "":
+                state["herestring"] = line[i + 1] + "@"
+                return
+            state["quote"] = line[i + 1]
+            i += 1
+        elif ch in "\"'":
+            state["quote"] = ch
+        elif ch == "`":
+            i += 1
+        elif ch in "{(":
+            state["depth"] += 1
+        elif ch in "})":
+            state["depth"] -= 1
+        i += 1
+    # Unterminated single-line strings do not span lines in practice
+    if state["quote"] and not state["herestring"]:
+        state["quote"] = None
+
+
+def parse_profile(text: str) -> List[ProfileBlock]:
+    """
+    Split a profile into top-level statements.
+
+    A statement ends at a line where all braces and parentheses are closed,
+    no here-string is open and the line does not continue with a backtick or
+    pipe. A following elseif/else/catch/finally joins the previous statement.
+
+    Args:
+        text (str): The profile source.
+
+    Returns:
+        List[ProfileBlock]: Blocks in source order; joining their text gives back the input.
+    """
+    lines = text.splitlines(keepends=True)
+    blocks: List[ProfileBlock] = []
+    state = {"depth": 0, "quote": None, "herestring": None, "block_comment": False}
+    current: List[str] = []
+    start = 0
+
+    def open_statement() -> bool:
+        return bool(current) and (state["depth"] > 0 or state["herestring"] or state["block_comment"])
+
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if not current:
+            if (not stripped or stripped.startswith("#")) and not stripped.startswith("<#"):
+                if blocks and blocks[-1].kind == "comment":
+                    blocks[-1].text += line
+                else:
+                    blocks.append(ProfileBlock("comment", line, number))
+                continue
+            if _CONTINUATION_RE.match(line) and blocks and blocks[-1].kind == "statement":
+                previous = blocks.pop()
+                current, start = [previous.text], previous.start_line
+
+        if not current:
+            start = number
+        current.append(line)
+        _scan_line(line.rstrip("\r\n"), state)
+
+        if open_statement() or stripped.endswith("`") or stripped.endswith("|"):
+            continue
+
+        source = "".join(current)
+        match = _FUNCTION_RE.match(source)
+        if match:
+            blocks.append(ProfileBlock("function", source, start, name=match.group(1)))
+        else:
+            blocks.append(ProfileBlock("statement", source, start))
+        current = []
+
+    if current:
+        blocks.append(ProfileBlock("statement", "".join(current), start))
+    return blocks
+
+
+_STRING_OR_COMMENT_RE = re.compile(
+    r'@"\r?\n.*?\r?\n"@|@\'\r?\n.*?\r?\n\'@|"(?:`.|[^"`])*"|\'(?:\'\'|[^\'])*\'|<#.*?#>|#[^\r\n]*',
+    re.DOTALL,
+)
+
+
+def _references(text: str, name: str) -> bool:
+    """
+    Check whether code calls name, ignoring strings and comments.
+    """
+    code = _STRING_OR_COMMENT_RE.sub(" ", text)
+    return re.search(rf"(?<![\w-]){re.escape(name)}(?![\w-])", code, re.IGNORECASE) is not None
+
+
+def _assigned_variables(text: str) -> List[str]:
+    return re.findall(r"^\$(?:global:)?(\w+)\s*=", text, re.IGNORECASE | re.MULTILINE)
+
+
+def classify(blocks: List[ProfileBlock]) -> None:
+    """
+    Decide the placement of every block in place.
+
+    Statements matching DEFERRABLE_PATTERNS, or calling a profile function
+    whose body does, are deferred, unless they define commands in the session
+    (Invoke-Expression or dot-sourcing), which only takes effect at top level.
+    Statements using a variable set by a deferred block are deferred with it. Functions stay eager when eager code calls
+    them and move to the module otherwise; the module is autoloaded on first
+    use, including from deferred code.
+    """
+    statements = [b for b in blocks if b.kind == "statement"]
+    functions = [b for b in blocks if b.kind == "function"]
+
+    def blocking_work(text: str) -> Optional[Tuple[int, str]]:
+        for pattern, cost, reason in DEFERRABLE_PATTERNS:
+            if re.search(pattern, text, re.IGNORECASE | re.MULTILINE):
+                return cost, reason
+        return None
+
+    # Functions doing network work themselves or through other profile functions
+    blocking = {b.name: work for b in functions
+                for work in [blocking_work(b.text)] if work and work[0] >= _CALLED_WORK_MIN_COST_MS}
+    changed = True
+    while changed:
+        changed = False
+        for block in functions:
+            if block.name in blocking:
+                continue
+            callee = next((name for name in blocking if _references(block.text, name)), None)
+            if callee is not None:
+                blocking[block.name] = (blocking[callee][0], f"calls {callee}")
+                changed = True
+
+    for block in statements:
+        if re.search(r"\bInvoke-Expression\b|^\s*\.\s", block.text, re.IGNORECASE | re.MULTILINE):
+            continue
+        work = blocking_work(block.text)
+        if work is None:
+            callee = next((name for name in blocking if _references(block.text, name)), None)
+            if callee is not None:
+                cost, reason = blocking[callee]
+                work = cost, f"calls {callee}: {reason}"
+        if work is not None:
+            block.placement, block.cost_ms, block.reason = "deferred", work[0], work[1]
+
+    changed = True
+    while changed:
+        changed = False
+        deferred_vars = {name.lower() for b in statements if b.placement == "deferred"
+                         for name in _assigned_variables(b.text)}
+        for block in statements:
+            if block.placement != "eager":
+                continue
+            used = [name for name in deferred_vars
+                    if re.search(rf"\$(global:)?{name}\b", block.text, re.IGNORECASE)]
+            if used:
+                block.placement, block.reason = "deferred", f"uses ${used[0]} set by deferred code"
+                changed = True
+
+    eager_text = "".join(b.text for b in statements if b.placement == "eager")
+    eager_functions = set()
+    changed = True
+    while changed:
+        changed = False
+        for block in blocks:
+            if block.kind != "function" or block.name in eager_functions:
+                continue
+            if block.name.lower() == "prompt" or _references(eager_text, block.name):
+                eager_functions.add(block.name)
+                block.reason = "called during startup"
+                eager_text += block.text
+                changed = True
+
+    for block in blocks:
+        if block.kind == "function" and block.name not in eager_functions:
+            block.placement, block.cost_ms, block.reason = "module", _FUNCTION_COST_MS, "autoloaded on first call"
+
+
+def _globalize(text: str) -> str:
+    """
+    Make top-level assignments, aliases and module imports of a deferred block
+    land in the global scope; idle event actions otherwise run in their own scope.
+    """
+    def append_flag(line: str, flag: str) -> str:
+        body = line.rstrip("\r\n")
+        return body + " " + flag + line[len(body):]
+
+    lines = []
+    for line in text.splitlines(keepends=True):
+        line = re.sub(r"^\$(?!global:|script:|env:)(\w+)(\s*=)", r"$global:\1\2", line)
+        if re.match(r"^Set-Alias\b", line, re.IGNORECASE) and not re.search(r"-Scope\b", line, re.IGNORECASE):
+            line = append_flag(line, "-Scope Global")
+        if re.match(r"^\s*Import-Module\b", line, re.IGNORECASE) and not re.search(r"-Global\b", line, re.IGNORECASE):
+            line = append_flag(line, "-Global")
+        lines.append(line)
+    return "".join(lines)
+
+
+def optimize(text: str) -> OptimizationResult:
+    """
+    Rewrite a profile into a lazy-loading form.
+
+    Args:
+        text (str): The profile source.
+
+    Returns:
+        OptimizationResult: The optimized profile, module source, module manifest and per-block placement.
+    """
+    blocks = parse_profile(text)
+    classify(blocks)
+
+    profile_parts: List[str] = []
+    deferred_parts: List[str] = []
+    module_parts: List[str] = []
+    for block in blocks:
+        if block.placement == "module":
+            module_parts.append(block.text.rstrip() + "\n")
+        elif block.placement == "deferred":
+            deferred_parts.append(_globalize(block.text).rstrip() + "\n")
+        else:
+            profile_parts.append(block.text)
+
+    profile = OPTIMIZED_HEADER + "\n" + "".join(profile_parts).rstrip() + "\n"
+    if deferred_parts:
+        body = "\n".join(deferred_parts)
+        # Here-string terminators must stay in column 0
+        if '@"' in body or "@'" in body:
+            indented = body
+        else:
+            indented = "".join("    " + line if line.strip() else line for line in body.splitlines(keepends=True))
+        profile += (
+            "\n# Deferred by the pwsh-config profile optimizer: runs once the shell is idle\n"
+            "$null = Register-EngineEvent -SourceIdentifier PowerShell.OnIdle -MaxTriggerCount 1 -Action {\n"
+            f"{indented}}}\n"
+        )
+
+    names = [b.name for b in blocks if b.placement == "module"]
+    module = "# Generated by the pwsh-config profile optimizer from the profile's utility functions\n\n"
+    module += "\n".join(module_parts)
+    module += "\nExport-ModuleMember -Function " + ", ".join(f"'{name}'" for name in names) + "\n"
+    manifest = (
+        "@{\n"
+        f"    RootModule = '{MODULE_NAME}.psm1'\n"
+        "    ModuleVersion = '1.0.0'\n"
+        "    GUID = 'b7c1e0c2-3f7e-4d2a-9a57-5f1e1f0c6a11'\n"
+        # Listing functions explicitly lets PowerShell autoload without importing the module
+        "    FunctionsToExport = @(" + ", ".join(f"'{name}'" for name in names) + ")\n"
+        "    CmdletsToExport = @()\n"
+        "    VariablesToExport = @()\n"
+        "    AliasesToExport = @()\n"
+        "}\n"
+    )
+    return OptimizationResult(profile, module, manifest, blocks)
+
+
+def write_optimized(source: Path, profile_dest: Path, modules_dir: Path) -> OptimizationResult:
+    """
+    Optimize a profile file and write the profile, module and report.
+
+    Args:
+        source (Path): Profile to optimize.
+        profile_dest (Path): Where to write the optimized profile; the report is
+            written next to it as <name>.report.json.
+        modules_dir (Path): A PSModulePath directory to install the module into.
+
+    Returns:
+        OptimizationResult: What was written.
+    """
+    result = optimize(source.read_text(encoding="utf-8"))
+    _write_module(result, modules_dir)
+    profile_dest.parent.mkdir(parents=True, exist_ok=True)
+    profile_dest.write_text(result.profile, encoding="utf-8")
+    profile_dest.with_name(profile_dest.stem + ".report.json").write_text(
+        json.dumps(result.report(), indent=2), encoding="utf-8"
+    )
+    return result
+
+
+def _write_module(result: OptimizationResult, modules_dir: Path) -> None:
+    module_dir = modules_dir / MODULE_NAME
+    module_dir.mkdir(parents=True, exist_ok=True)
+    (module_dir / f"{MODULE_NAME}.psm1").write_text(result.module, encoding="utf-8")
+    (module_dir / f"{MODULE_NAME}.psd1").write_text(result.manifest, encoding="utf-8")
+
+
+def state_path(home: Optional[Path] = None) -> Path:
+    """
+    Returns the file recording which profile the installed optimized profile was made from.
+    """
+    return config_dir(home) / "profile-optimizer.json"
+
+
+def modules_dir(home: Optional[Path] = None) -> Path:
+    """
+    Returns the current user's PowerShell 7 module directory, which is on PSModulePath.
+    """
+    return (home or Path.home()) / "Documents" / "PowerShell" / "Modules"
+
+
+def source_hash(data: bytes, home: Optional[Path] = None) -> str:
+    """
+    The unmanaged_hash of the profile an installed profile was optimized from,
+    or of the profile itself if it is not an optimizer's output.
+    """
+    digest = unmanaged_hash(data)
+    try:
+        state = json.loads(state_path(home).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return digest
+    return state.get("source", digest) if state.get("optimized") == digest else digest
+
+
+def optimize_installed(profile: ProfileWriter, home: Optional[Path] = None) -> Optional[OptimizationResult]:
+    """
+    Optimize an installed profile in place and install its module.
+
+    Only the text outside the managed blocks is optimized; the blocks are kept
+    after it. The hashes of the source and the result are recorded so update
+    checks still compare the profile against the one it was made from.
+
+    Args:
+        profile (ProfileWriter): The installed profile.
+        home (Optional[Path]): Home directory it belongs to. Defaults to the current user's.
+
+    Returns:
+        Optional[OptimizationResult]: What was written, or None if the profile is
+            empty apart from managed blocks or already optimized.
+
+    Raises:
+        OSError: If the profile, the module or the state cannot be written.
+    """
+    data = profile.path.read_bytes() if profile.path.exists() else b""
+    source = strip_blocks(data.decode("utf-8", errors="surrogateescape"))
+    if source.startswith(OPTIMIZED_HEADER):
+        return None
+    result = None
+    optimized = unmanaged_hash(data)
+    # An empty profile is still recorded, so a profile installed by Update-Profile later is optimized too
+    if source.strip():
+        result = optimize(source)
+        _write_module(result, modules_dir(home))
+        newline = "\r\n" if b"\r\n" in data else "\n"
+        text = result.profile.replace("\n", newline)
+        profile.replace_unmanaged(text)
+        optimized = unmanaged_hash(text.encode("utf-8", errors="surrogateescape"))
+    state = {"source": unmanaged_hash(data), "optimized": optimized}
+    state_path(home).parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(state_path(home), json.dumps(state, indent=2).encode("utf-8"))
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rewrite a PowerShell profile into a lazy-loading form.")
+    parser.add_argument("profile", nargs="?", default="Microsoft.PowerShell_profile.ps1",
+                        help="profile to optimize (default: the repository's profile)")
+    parser.add_argument("-o", "--output", default="build/Microsoft.PowerShell_profile.ps1",
+                        help="path of the optimized profile")
+    parser.add_argument("-m", "--modules-dir", default="build/Modules",
+                        help="directory to write the autoloaded module into")
+    args = parser.parse_args(argv)
+
+    result = write_optimized(Path(args.profile), Path(args.output), Path(args.modules_dir))
+    report = result.report()
+    print(f"Moved {len(report['module_functions'])} functions to module {MODULE_NAME}.")
+    for entry in report["deferred"]:
+        print(f"Deferred line {entry['line']} ({entry['reason']}, ~{entry['cost_ms']} ms): {entry['text']}")
+    print(f"Estimated startup time saved: ~{result.estimated_savings_ms} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
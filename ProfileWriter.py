@@ -0,0 +1,297 @@
+import codecs
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+BLOCK_START = "# >>> pwsh-config: {name} >>>"
+BLOCK_END = "# <<< pwsh-config: {name} <<<"
+BLOCK_NOTE = "# Managed by pwsh-config; changes between these markers are overwritten."
+_MARKER_RE = re.compile(r"^# (>>>|<<<) pwsh-config: (\S+) (>>>|<<<)$")
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.replace("\r\n", "\n").strip("\n").encode("utf-8")).hexdigest()
+
+
+def _replaces_hash(replaces: Iterable[str]) -> str:
+    return content_hash("\n".join(sorted({line.strip() for line in replaces if line.strip()})))
+
+
+def _split_blocks(text: str) -> Tuple[List[str], List[List[str]]]:
+    """
+    Separate a profile's lines into those outside managed blocks and the blocks themselves.
+    """
+    lines = text.lstrip("\ufeff").replace("\r\n", "\n").split("\n")
+    kept, blocks, open_name = [], [], None
+    for line in lines:
+        match = _MARKER_RE.match(line.strip())
+        if match and match.group(1) == ">>>" and open_name is None:
+            open_name = match.group(2)
+            blocks.append([line])
+        elif open_name is None:
+            kept.append(line)
+        else:
+            blocks[-1].append(line)
+            if match and match.group(1) == "<<<" and match.group(2) == open_name:
+                open_name = None
+    return kept, blocks
+
+
+def strip_blocks(text: str) -> str:
+    """
+    Returns a profile's text without its managed blocks, with LF line endings
+    and no byte order mark or trailing blank lines.
+    """
+    return "\n".join(_split_blocks(text)[0]).rstrip()
+
+
+def managed_blocks(text: str) -> List[str]:
+    """
+    Returns the managed blocks of a profile, markers included, with LF line endings.
+    """
+    return ["\n".join(block) for block in _split_blocks(text)[1]]
+
+
+def unmanaged_hash(data: bytes) -> str:
+    """
+    Hash of a profile ignoring its managed blocks, so a deployed profile with
+    the installer's blocks hashes the same as the upstream file it came from.
+    """
+    text = data.decode("utf-8", errors="surrogateescape")
+    return hashlib.sha256(strip_blocks(text).encode("utf-8", errors="surrogateescape")).hexdigest()
+
+
+def atomic_write(path: Path, data: bytes, attempts: int = 5) -> None:
+    """
+    Replace a file's contents so readers see either the old or the new file, never a partial one.
+
+    The data is written to a temporary file in the same directory, flushed to
+    disk and renamed over the target. On Windows the rename fails while another
+    process (e.g. a virus scanner) holds the target open, so it is retried briefly.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists():
+            os.chmod(tmp, path.stat().st_mode & 0o7777)
+        for attempt in range(attempts):
+            try:
+                os.replace(tmp, path)
+                return
+            except PermissionError:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+class ProfileWriter:
+    """
+    Owns marker-delimited blocks in a PowerShell profile and leaves the rest of it untouched.
+
+    A block is replaced in place when its content changes, so re-running the
+    setup never appends a second copy. The sidecar records the hash of every
+    block together with the size and modification time of the profile they
+    were written to; while those still match, is_current() answers without
+    reading the profile. Encoding, byte order mark and line endings of an
+    existing profile are preserved.
+    """
+    def __init__(self, path: Path, sidecar: Optional[Path] = None):
+        self.path = Path(path)
+        self.sidecar = Path(sidecar) if sidecar else self.path.with_name(self.path.name + ".blocks.json")
+
+    def stat(self) -> Optional[List[int]]:
+        """
+        Returns the profile's size and modification time, or None if it does not exist.
+        """
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def ensure_exists(self) -> bool:
+        """
+        Create an empty profile, and its directory, if missing.
+
+        Returns:
+            bool: True if the profile was created.
+        """
+        if self.path.exists():
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, b"")
+        return True
+
+    def is_current(self, name: str, content: str, replaces: Iterable[str] = ()) -> bool:
+        """
+        Whether the profile holds the block with this content, judged from the sidecar alone.
+
+        A block written with a different replaces list is not current, so lines
+        added to that list are removed from profiles configured before.
+        """
+        state = self._load_sidecar()
+        return (state.get("profile") == str(self.path) and state.get("stat") == self.stat()
+                and state.get("blocks", {}).get(name) == content_hash(content)
+                and state.get("replaces", {}).get(name, content_hash("")) == _replaces_hash(replaces))
+
+    def ensure_block(self, name: str, content: str, replaces: Iterable[str] = ()) -> str:
+        """
+        Add or update a managed block.
+
+        Args:
+            name (str): Identifies the block; one word, e.g. "init".
+            content (str): The lines between the markers.
+            replaces (Iterable[str]): Lines written by older versions outside any
+                block; they are removed so the block does not run them twice.
+
+        Returns:
+            str: "added", "updated" or "unchanged".
+        """
+        replaces = list(replaces)
+        digest = content_hash(content)
+        data = self.path.read_bytes() if self.path.exists() else b""
+        bom = codecs.BOM_UTF8 if data.startswith(codecs.BOM_UTF8) else b""
+        # surrogateescape round-trips profiles saved in a legacy code page byte for byte
+        text = data[len(bom):].decode("utf-8", errors="surrogateescape")
+        newline = "\r\n" if "\r\n" in text or (not text and os.name == "nt") else "\n"
+
+        lines = text.splitlines()
+        blocks = self._find_blocks(lines)
+        span = blocks.get(name)
+        legacy = {line.strip() for line in replaces if line.strip()}
+        block = [BLOCK_START.format(name=name), BLOCK_NOTE, *content.strip("\n").splitlines(),
+                 BLOCK_END.format(name=name)]
+
+        if span is not None and content_hash("\n".join(lines[span[0] + 2:span[1]])) == digest \
+                and not self._has_legacy(lines, blocks, legacy):
+            status = "unchanged"
+        else:
+            status = "updated" if span is not None else "added"
+            lines = self._without_legacy(lines, blocks, legacy)
+            blocks = self._find_blocks(lines)
+            span = blocks.get(name)
+            if span is not None:
+                lines[span[0]:span[1] + 1] = block
+            else:
+                if lines and lines[-1].strip():
+                    lines.append("")
+                lines += block
+            text = newline.join(lines) + newline
+            atomic_write(self.path, bom + text.encode("utf-8", errors="surrogateescape"))
+
+        state = self._load_sidecar()
+        if state.get("profile") != str(self.path):
+            state = {"profile": str(self.path), "blocks": {}}
+        state["blocks"][name] = digest
+        state.setdefault("replaces", {})[name] = _replaces_hash(replaces)
+        state["stat"] = self.stat()
+        self._save_sidecar(state)
+        return status
+
+    def remove_block(self, name: str) -> bool:
+        """
+        Remove a managed block.
+
+        Returns:
+            bool: True if the block was present.
+        """
+        if not self.path.exists():
+            return False
+        data = self.path.read_bytes()
+        bom = codecs.BOM_UTF8 if data.startswith(codecs.BOM_UTF8) else b""
+        text = data[len(bom):].decode("utf-8", errors="surrogateescape")
+        lines = text.splitlines()
+        span = self._find_blocks(lines).get(name)
+        if span is None:
+            return False
+        del lines[span[0]:span[1] + 1]
+        newline = "\r\n" if "\r\n" in text else "\n"
+        atomic_write(self.path, bom + (newline.join(lines) + newline if lines else "").encode(
+            "utf-8", errors="surrogateescape"))
+
+        state = self._load_sidecar()
+        state.get("blocks", {}).pop(name, None)
+        state.get("replaces", {}).pop(name, None)
+        state["stat"] = self.stat()
+        self._save_sidecar(state)
+        return True
+
+    def replace_unmanaged(self, text: str) -> bool:
+        """
+        Replace everything outside the managed blocks with text, e.g. a newer
+        upstream profile. The blocks are kept after it, in text's line endings.
+
+        Returns:
+            bool: True if the profile changed.
+        """
+        current = self.path.read_bytes() if self.path.exists() else b""
+        data = text.encode("utf-8", errors="surrogateescape")
+        if unmanaged_hash(current) == unmanaged_hash(data):
+            return False
+        text = text.lstrip("\ufeff")
+        newline = "\r\n" if "\r\n" in text else "\n"
+        blocks = [block.replace("\n", newline)
+                  for block in managed_blocks(current.decode("utf-8", errors="surrogateescape"))]
+        bom = codecs.BOM_UTF8 if current.startswith(codecs.BOM_UTF8) else b""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, bom + ((newline * 2).join([text.rstrip(), *blocks]) + newline).encode(
+            "utf-8", errors="surrogateescape"))
+
+        state = self._load_sidecar()
+        if state.get("profile") == str(self.path):
+            state["stat"] = self.stat()
+            self._save_sidecar(state)
+        return True
+
+    @staticmethod
+    def _find_blocks(lines: List[str]) -> dict:
+        """
+        Returns {name: (start line, end line)} of every complete block.
+        """
+        blocks, open_at = {}, {}
+        for i, line in enumerate(lines):
+            match = _MARKER_RE.match(line.strip())
+            if not match:
+                continue
+            if match.group(1) == ">>>":
+                open_at[match.group(2)] = i
+            elif match.group(2) in open_at:
+                blocks[match.group(2)] = (open_at.pop(match.group(2)), i)
+        return blocks
+
+    @staticmethod
+    def _outside(lines: List[str], blocks: dict) -> List[bool]:
+        inside = [False] * len(lines)
+        for start, end in blocks.values():
+            inside[start:end + 1] = [True] * (end + 1 - start)
+        return [not flag for flag in inside]
+
+    def _has_legacy(self, lines: List[str], blocks: dict, legacy: set) -> bool:
+        return any(outside and line.strip() in legacy
+                   for line, outside in zip(lines, self._outside(lines, blocks)))
+
+    def _without_legacy(self, lines: List[str], blocks: dict, legacy: set) -> List[str]:
+        return [line for line, outside in zip(lines, self._outside(lines, blocks))
+                if not (outside and line.strip() in legacy)]
+
+    def _load_sidecar(self) -> dict:
+        try:
+            state = json.loads(self.sidecar.read_text(encoding="utf-8"))
+            return state if isinstance(state, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_sidecar(self, state: dict) -> None:
+        self.sidecar.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.sidecar, json.dumps(state, indent=2).encode("utf-8"))
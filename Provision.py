@@ -0,0 +1,173 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+COMMANDS = ("plan", "apply", "verify", "bundle")
+# The per-profile steps; package, font and init-script steps are machine-wide
+PROFILE_STEPS = ["pwsh_profile", "configure_profile", "optimize_profile", "oh_my_posh_config"]
+
+
+def _installer(home: Path, args: argparse.Namespace):
+    from AppPaths import config_dir
+    from pwshConfig import Automatic_installation_And_Config
+    return Automatic_installation_And_Config(
+        force=args.force, home=home, interactive=False, manifest_path=args.manifest,
+        timeout=getattr(args, "timeout", None), mirror=args.mirror,
+        file_index=args.file_index or "file_index" in args.steps,
+        trace_dir=config_dir(home) / "traces" if getattr(args, "trace", False) else None,
+    )
+
+
+def plan_target(home: Path, args: argparse.Namespace) -> dict:
+    try:
+        installer = _installer(home, args)
+        pending = installer.pending_steps(installer.select_steps(args.steps))
+    except ValueError as e:
+        return {"home": str(home), "ok": False, "error": str(e)}
+    return {"home": str(home), "ok": True, "pending": pending}
+
+
+def apply_target(home: Path, args: argparse.Namespace) -> dict:
+    """
+    Run the selected steps for one home. Runs in a worker process; step output
+    is captured so it does not interleave with other targets.
+    """
+    started = time.perf_counter()
+    log = io.StringIO()
+    result = {"home": str(home)}
+    with contextlib.redirect_stdout(log):
+        try:
+            installer = _installer(home, args)
+            results = installer.run_steps(installer.select_steps(args.steps))
+            result["steps"] = {name: step.status for name, step in results.items()}
+            result["ok"] = all(step.ok for step in results.values())
+        except Exception as e:
+            result["ok"] = False
+            result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    result["log"] = log.getvalue().splitlines()[-args.log_lines:] if args.log_lines else []
+    return result
+
+
+def verify_target(home: Path, args: argparse.Namespace) -> dict:
+    """
+    Check that a home has a configured profile and zen.toml tuned from the reference theme.
+    """
+    from InitCache import default_tools
+    from ThemeAnalyzer import tune_file
+
+    profile = home / "Documents" / "PowerShell" / "Microsoft.PowerShell_profile.ps1"
+    zen_toml = home / ".config" / "ohmyposh" / "zen.toml"
+    checks = {"profile_exists": profile.exists()}
+    content = profile.read_text(encoding="utf-8", errors="replace") if checks["profile_exists"] else ""
+    checks["profile_configured"] = all(tool.fallback in content
+                                       for tool in default_tools(zen_toml.with_suffix(".json")))
+    try:
+        # TOMLDecodeError is a ValueError
+        toml_text, json_text, _ = tune_file(Path(args.source_dir) / "zen.toml")
+    except (OSError, ValueError) as e:
+        checks["oh_my_posh_config"] = False
+        return {"home": str(home), "ok": False, "checks": checks,
+                "error": f"Cannot read the reference theme: {e}"}
+    zen_json = zen_toml.with_suffix(".json")
+    checks["oh_my_posh_config"] = (
+        zen_toml.exists() and zen_toml.read_text(encoding="utf-8") == toml_text
+        and zen_json.exists() and zen_json.read_text(encoding="utf-8") == json_text
+    )
+    return {"home": str(home), "ok": all(checks.values()), "checks": checks}
+
+
+def bundle_mirror(args: argparse.Namespace) -> dict:
+    """
+    Download everything the manifest installs into a mirror directory.
+    """
+    from AppPaths import cache_dir
+    from JsonManager import JsonManager
+    from Mirror import Mirror
+
+    with contextlib.redirect_stdout(sys.stderr):
+        json_manager = JsonManager(args.manifest)
+        mirror = Mirror(args.mirror)
+        items = mirror.bundle(json_manager, max_workers=args.jobs, font_cache=cache_dir() / "fonts")
+    return {
+        "mirror": str(mirror.root),
+        "ok": all(item.ok for item in items),
+        "items": [{"name": item.name, "kind": item.kind, "status": item.status,
+                   **({"detail": item.detail} if item.detail else {})} for item in items],
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Provision PowerShell profiles without the interactive menu. "
+                    "Each command prints a JSON summary with one result per target home.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in (
+        ("plan", "show which steps would run for each target home"),
+        ("apply", "configure every target home in parallel"),
+        ("verify", "check every target home without changing anything"),
+    ):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("homes", nargs="*", type=Path,
+                         help="home directories to provision (default: the current user's)")
+        if command == "verify":
+            sub.add_argument("--source-dir", default=".", help="directory holding the reference zen.toml")
+            continue
+        sub.add_argument("--steps", nargs="+", default=PROFILE_STEPS, metavar="STEP",
+                         help=f"steps to run (default: {' '.join(PROFILE_STEPS)})")
+        sub.add_argument("--manifest", help="package manifest to use (default: the mirror's, else ./packages.json)")
+        sub.add_argument("--mirror", type=Path, metavar="DIR",
+                         help="install packages, wheels and fonts from a mirror made with 'bundle'")
+        sub.add_argument("--file-index", action="store_true",
+                         help="add the file_index step, which indexes the home directory for ff and grep")
+        sub.add_argument("--force", action="store_true", help="run steps even if their inputs are unchanged")
+        if command == "apply":
+            sub.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                             help="number of homes configured at the same time")
+            sub.add_argument("--log-lines", type=int, default=20,
+                             help="lines of step output kept per target in the summary")
+            sub.add_argument("--timeout", type=float, metavar="SECONDS",
+                             help="deadline for each target; unfinished steps are cancelled")
+            sub.add_argument("--trace", action="store_true",
+                             help="write a trace of each target's run to its .config/pwsh-config/traces")
+
+    bundle = subparsers.add_parser("bundle", help="download every package, wheel and font into a mirror directory")
+    bundle.add_argument("mirror", type=Path, help="mirror directory, e.g. on a LAN share; created if missing")
+    bundle.add_argument("--manifest", default="./packages.json", help="package manifest to mirror")
+    bundle.add_argument("-j", "--jobs", type=int, default=4, help="number of downloads run at the same time")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "bundle":
+        result = bundle_mirror(args)
+        print(json.dumps({"command": "bundle", **result}, indent=2))
+        return 0 if result["ok"] else 1
+    homes = args.homes or [Path.home()]
+
+    if args.command == "verify":
+        results = [verify_target(home, args) for home in homes]
+    elif args.command == "plan":
+        with contextlib.redirect_stdout(sys.stderr):
+            results = [plan_target(home, args) for home in homes]
+    else:
+        with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(homes)))) as pool:
+            results = list(pool.map(apply_target, homes, [args] * len(homes)))
+
+    print(json.dumps({"command": args.command, "ok": all(r["ok"] for r in results), "targets": results},
+                     indent=2))
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
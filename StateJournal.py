@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+def fingerprint(inputs) -> str:
+    """
+    Hash a JSON-serializable description of a step's inputs.
+    """
+    encoded = json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def file_digest(path: Path) -> Optional[str]:
+    """
+    Returns the SHA-256 of a file, or None if it does not exist.
+    """
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+class StateJournal:
+    """
+    Persistent record of the input fingerprint each setup step last succeeded with.
+
+    Stored as JSON: {"steps": {"<step>": {"fingerprint": "...", "completed_at": <epoch>}}}.
+    A step whose current fingerprint matches the recorded one can be skipped.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self._steps = json.loads(self.path.read_text(encoding="utf-8")).get("steps", {})
+        except (OSError, json.JSONDecodeError, AttributeError):
+            self._steps = {}
+
+    def is_fresh(self, step: str, current: str) -> bool:
+        with self._lock:
+            entry = self._steps.get(step)
+            return entry is not None and entry.get("fingerprint") == current
+
+    def record(self, step: str, current: str) -> None:
+        with self._lock:
+            self._steps[step] = {"fingerprint": current, "completed_at": time.time()}
+            self._save()
+
+    def invalidate(self, steps: Optional[Iterable[str]] = None) -> None:
+        """
+        Forget the given steps, or every step when steps is None.
+        """
+        with self._lock:
+            if steps is None:
+                self._steps.clear()
+            else:
+                for step in steps:
+                    self._steps.pop(step, None)
+            self._save()
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"steps": self._steps}, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,218 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from CommandRunner import progress
+from ExecutionPolicy import CancelScope, CommandCancelled, ExecutionPolicy, current_scope
+from Tracing import Span, tracer
+
+
+@dataclass
+class Step:
+    """
+    A unit of work in a dependency graph.
+
+    func returns True on success. requires names the steps that must have
+    succeeded before this one may start. inputs, if given, describes
+    everything the step's outcome depends on, as a JSON-serializable value.
+    policy, if given, bounds the step's run time and retries it when it
+    raises a transient error (see ExecutionPolicy.is_transient_error).
+    """
+    name: str
+    description: str
+    func: Callable[[], bool]
+    requires: List[str] = field(default_factory=list)
+    inputs: Optional[Callable[[], object]] = None
+    policy: Optional[ExecutionPolicy] = None
+
+
+@dataclass
+class StepResult:
+    """
+    Outcome of a step.
+
+    status is one of "succeeded", "failed" or "cancelled" (a prerequisite
+    failed, or the run was interrupted or out of time, so the step never ran).
+    """
+    name: str
+    status: str
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "succeeded"
+
+    @property
+    def duration(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+def validate_graph(steps: List[Step]) -> None:
+    """
+    Raise ValueError for duplicate names, unknown prerequisites or cycles.
+    """
+    names = [step.name for step in steps]
+    if len(names) != len(set(names)):
+        raise ValueError("Duplicate step names in graph")
+    known = set(names)
+    for step in steps:
+        for req in step.requires:
+            if req not in known:
+                raise ValueError(f"'{step.name}' requires unknown step '{req}'")
+
+    remaining = {step.name: set(step.requires) for step in steps}
+    while remaining:
+        ready = [name for name, reqs in remaining.items() if not reqs]
+        if not ready:
+            raise ValueError(f"Dependency cycle between: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for reqs in remaining.values():
+            reqs.difference_update(ready)
+
+
+class StepScheduler:
+    """
+    Runs a DAG of steps, starting every step whose prerequisites succeeded
+    on a bounded thread pool and cancelling the dependents of failed steps.
+
+    Each step runs in its own CancelScope under the run's scope, so a step
+    timeout, the run deadline or Ctrl+C kills the commands still running.
+    """
+    def __init__(self, max_workers: int = 4, verbose: bool = True):
+        self.max_workers = max(1, max_workers)
+        self.verbose = verbose
+
+    def _log(self, message: str) -> None:
+        if self.verbose:
+            progress.write(message)
+
+    def _run_step(self, step: Step, scope: CancelScope, parent: Optional[Span] = None) -> StepResult:
+        self._log(f"\nStarting: {step.description}...")
+        policy = step.policy or ExecutionPolicy()
+        result = StepResult(step.name, "failed", started=time.perf_counter())
+        with scope, tracer.span(step.name, "step", parent=parent, description=step.description) as span:
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    scope.check()
+                    if step.func():
+                        result.status = "succeeded"
+                    result.error = None
+                except CommandCancelled as e:
+                    result.error = e
+                except Exception as e:
+                    result.error = e
+                    if attempt <= policy.retries and policy.is_transient_error(e):
+                        delay = policy.delay(attempt)
+                        self._log(f"Retrying: {step.description} in {delay:.0f}s ({e})")
+                        if scope.sleep(delay):
+                            continue
+                break
+            if not result.ok and result.error is None and scope.cancelled:
+                result.error = CommandCancelled(scope.reason)
+            span.set(status=result.status, retries=attempt - 1, error=str(result.error) if result.error else None)
+        result.finished = time.perf_counter()
+
+        if result.ok:
+            self._log(f"Completed: {step.description}")
+        else:
+            self._log(f"Failed: {step.description}" + (f" ({result.error})" if result.error else ""))
+        return result
+
+    def run(self, steps: List[Step], timeout: Optional[float] = None) -> Dict[str, StepResult]:
+        """
+        Run all steps as soon as their prerequisites allow.
+
+        Args:
+            steps (List[Step]): The graph to run; order only affects tie-breaking.
+            timeout (Optional[float]): Deadline in seconds for the whole run. Steps
+                not started by then are cancelled and running commands are killed.
+
+        Returns:
+            Dict[str, StepResult]: Results keyed by step name, in declaration order.
+
+        Raises:
+            KeyboardInterrupt: After cancelling the run, if Ctrl+C was pressed.
+        """
+        validate_graph(steps)
+        results: Dict[str, StepResult] = {}
+        pending = {step.name: step for step in steps}
+
+        parent = tracer.current()
+        with CancelScope(timeout, parent=current_scope()) as run_scope, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = {}
+            try:
+                while pending or running:
+                    if not run_scope.cancelled and run_scope.expired:
+                        run_scope.cancel("deadline exceeded")
+                    for name, step in list(pending.items()):
+                        req_results = [results.get(req) for req in step.requires]
+                        if run_scope.cancelled:
+                            results[name] = StepResult(name, "cancelled")
+                            self._log(f"Cancelled: {step.description} ({run_scope.reason})")
+                            del pending[name]
+                        elif any(r is not None and not r.ok for r in req_results):
+                            results[name] = StepResult(name, "cancelled")
+                            self._log(f"Cancelled: {step.description} (a prerequisite failed)")
+                            del pending[name]
+                        elif all(r is not None for r in req_results):
+                            scope = CancelScope(step.policy.timeout if step.policy else None, parent=run_scope)
+                            running[pool.submit(self._run_step, step, scope, parent)] = (name, scope)
+                            del pending[name]
+
+                    if not running:
+                        continue
+                    # Wake up periodically to enforce deadlines and let Ctrl+C through
+                    done, _ = wait(running, timeout=0.25, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[running.pop(future)[0]] = future.result()
+                    for _, scope in running.values():
+                        if not scope.cancelled and scope.expired:
+                            scope.cancel("timed out")
+            except KeyboardInterrupt:
+                run_scope.cancel("interrupted")
+                raise
+
+        return {step.name: results[step.name] for step in steps}
+
+
+def critical_path(steps: List[Step], results: Dict[str, StepResult]) -> Tuple[List[str], float]:
+    """
+    Find the chain of prerequisites with the longest total run time.
+
+    Args:
+        steps (List[Step]): The graph that was run.
+        results (Dict[str, StepResult]): Results returned by StepScheduler.run.
+
+    Returns:
+        Tuple[List[str], float]: Step names along the path, in run order, and its length in seconds.
+    """
+    by_name = {step.name: step for step in steps}
+    longest: Dict[str, Tuple[float, Optional[str]]] = {}
+
+    def visit(name: str) -> float:
+        if name not in longest:
+            best, via = 0.0, None
+            for req in by_name[name].requires:
+                length = visit(req)
+                if length > best:
+                    best, via = length, req
+            longest[name] = (best + results[name].duration, via)
+        return longest[name][0]
+
+    if not steps:
+        return [], 0.0
+    end = max(by_name, key=visit)
+    path = []
+    node: Optional[str] = end
+    while node is not None:
+        path.append(node)
+        node = longest[node][1]
+    return list(reversed(path)), longest[end][0]
@@ -0,0 +1,53 @@
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+
+def background_python() -> str:
+    """
+    Returns pythonw.exe next to the running interpreter when there is one, so
+    scheduled and background runs do not open a console window.
+    """
+    pythonw = Path(sys.executable).with_name("pythonw.exe")
+    return str(pythonw if pythonw.exists() else sys.executable)
+
+
+def _schtasks(args: List[str]) -> Tuple[bool, str]:
+    if sys.platform != "win32":
+        return False, "scheduled tasks use the Windows Task Scheduler"
+    try:
+        result = subprocess.run([shutil.which("schtasks") or "schtasks", *args],
+                                capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return False, str(e)
+    return result.returncode == 0, (result.stdout or result.stderr).strip()
+
+
+def schedule_script(task: str, script: Path, args: List[str], interval_minutes: int) -> Tuple[bool, str]:
+    """
+    Register (or replace) a Task Scheduler task that runs a Python script every interval_minutes.
+
+    Args:
+        task (str): The task name.
+        script (Path): The script to run with background_python().
+        args (List[str]): Arguments passed to the script.
+        interval_minutes (int): Time between runs.
+
+    Returns:
+        Tuple[bool, str]: Whether the task was created, and schtasks' message.
+    """
+    command = subprocess.list2cmdline([background_python(), str(script), *args])
+    # schtasks caps /MO at 1439 for MINUTE and 23 for HOURLY schedules
+    if interval_minutes % (24 * 60) == 0:
+        schedule = ["/SC", "DAILY", "/MO", str(interval_minutes // (24 * 60))]
+    elif interval_minutes % 60 == 0:
+        schedule = ["/SC", "HOURLY", "/MO", str(interval_minutes // 60)]
+    else:
+        schedule = ["/SC", "MINUTE", "/MO", str(interval_minutes)]
+    return _schtasks(["/Create", "/F", "/TN", task, *schedule, "/TR", command])
+
+
+def unschedule(task: str) -> Tuple[bool, str]:
+    return _schtasks(["/Delete", "/F", "/TN", task])
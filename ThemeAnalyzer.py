@@ -0,0 +1,304 @@
+import argparse
+import copy
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import tomllib
+
+# Rough cost in milliseconds of rendering a segment type once, before options.
+# Segments that spawn a process or touch the network dominate prompt latency.
+SEGMENT_COSTS: Dict[str, float] = {
+    "git": 15, "svn": 30, "mercurial": 40, "sapling": 40,
+    "command": 50,
+    "python": 5, "node": 5, "go": 5, "rust": 5, "dotnet": 5, "java": 5, "php": 5, "ruby": 5,
+    "kubectl": 20, "az": 20, "aws": 5, "gcp": 5, "terraform": 5,
+    "battery": 5, "spotify": 20, "ipify": 300, "owm": 300, "nba": 300, "wakatime": 300,
+}
+DEFAULT_SEGMENT_COST = 0.5
+
+# Options with their extra cost, the template fields they populate and what they do.
+# An option whose fields no template of the segment uses is disabled by tune().
+OPTION_COSTS: Dict[Tuple[str, str], Tuple[float, Tuple[str, ...], str]] = {
+    ("git", "fetch_status"): (40, (".Working", ".Staging", ".Ahead", ".Behind", ".BranchStatus", ".UpstreamGone"),
+                              "runs git status over the whole working tree"),
+    ("git", "fetch_upstream_icon"): (5, (".UpstreamIcon", ".UpstreamURL"), "looks up the upstream remote URL"),
+    ("git", "fetch_push_status"): (10, (".PushAhead", ".PushBehind"), "compares with the push remote"),
+    ("git", "fetch_stash_count"): (5, (".StashCount",), "counts stash entries"),
+    ("git", "fetch_worktree_count"): (5, (".WorktreeCount",), "counts worktrees"),
+    ("git", "fetch_user"): (5, (".User",), "reads the git user config"),
+}
+# Language segments run the runtime to print its version unless fetch_version is false.
+LANGUAGE_SEGMENTS = ("python", "node", "go", "rust", "dotnet", "java", "php", "ruby")
+FETCH_VERSION_COST = 40
+
+# Keys that only take effect on the segment itself, not inside its properties table
+SEGMENT_ONLY_KEYS = ("template", "templates", "background_templates", "foreground_templates")
+TEMPLATE_KEYS = SEGMENT_ONLY_KEYS
+
+# A cache hit replaces the render with a read of the oh-my-posh cache file.
+CACHE_HIT_COST = 1.0
+# Segments at least this expensive are cached; the costlier, the longer the cached value is reused.
+CACHE_DURATIONS: List[Tuple[float, str]] = [(100, "5m"), (30, "30s"), (10, "10s")]
+
+
+@dataclass
+class SegmentReport:
+    """
+    Estimated render cost of one prompt segment, before and after tuning.
+    """
+    block: int
+    index: int
+    type: str
+    cost_ms: float
+    tuned_cost_ms: float
+    flags: List[str] = field(default_factory=list)
+    changes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ThemeReport:
+    """
+    Result of analyzing a theme: per-segment costs and configuration problems.
+    """
+    segments: List[SegmentReport] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    @property
+    def cost_ms(self) -> float:
+        return sum(segment.cost_ms for segment in self.segments)
+
+    @property
+    def tuned_cost_ms(self) -> float:
+        return sum(segment.tuned_cost_ms for segment in self.segments)
+
+    def summary(self) -> str:
+        lines = [f"Estimated prompt render cost: ~{self.cost_ms:.0f} ms, tuned ~{self.tuned_cost_ms:.0f} ms"]
+        for segment in self.segments:
+            if segment.flags or segment.changes:
+                lines.append(f"  {segment.type} (block {segment.block}, segment {segment.index}): "
+                             f"~{segment.cost_ms:.0f} ms -> ~{segment.tuned_cost_ms:.0f} ms")
+                lines += [f"    expensive: {flag}" for flag in segment.flags]
+                lines += [f"    tuned: {change}" for change in segment.changes]
+        lines += [f"  warning: {warning}" for warning in self.warnings]
+        return "\n".join(lines)
+
+
+def _templates(segment: dict) -> Optional[str]:
+    """
+    Returns every template the segment renders with, or None if it relies on
+    the segment type's built-in template (whose fields are unknown here).
+    """
+    parts = []
+    for key in TEMPLATE_KEYS:
+        value = segment.get(key)
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, list):
+            parts.extend(str(item) for item in value)
+    return "\n".join(parts) if "template" in segment or "templates" in segment else None
+
+
+def _uses_field(templates: Optional[str], fields: Tuple[str, ...]) -> bool:
+    if templates is None:
+        return True
+    return any(re.search(re.escape(name) + r"\b", templates) for name in fields)
+
+
+def _enabled_options(segment: dict) -> List[Tuple[str, float, Tuple[str, ...], str]]:
+    kind = segment.get("type", "")
+    properties = segment.get("properties", {})
+    options = [
+        (option, cost, fields, description)
+        for (segment_type, option), (cost, fields, description) in OPTION_COSTS.items()
+        if segment_type == kind and properties.get(option) is True
+    ]
+    if kind in LANGUAGE_SEGMENTS and properties.get("fetch_version", True):
+        options.append(("fetch_version", FETCH_VERSION_COST, (".Full", ".Major", ".Minor", ".Patch"),
+                        f"runs {kind} to read its version"))
+    return options
+
+
+def _cache_duration(cost_ms: float) -> Optional[str]:
+    for threshold, duration in CACHE_DURATIONS:
+        if cost_ms >= threshold:
+            return duration
+    return None
+
+
+def _tune_segment(segment: dict, block: int, index: int, warnings: List[str]) -> SegmentReport:
+    """
+    Estimate a segment's cost and tune it in place.
+    """
+    kind = segment.get("type", "")
+    base = SEGMENT_COSTS.get(kind, DEFAULT_SEGMENT_COST)
+    properties = segment.get("properties", {})
+    templates = _templates(segment)
+    report = SegmentReport(block, index, kind, base, base)
+
+    for key in SEGMENT_ONLY_KEYS:
+        if key in properties:
+            warnings.append(f"{kind} segment (block {block}, segment {index}): '{key}' is inside "
+                            f"[properties], where oh-my-posh ignores it; move it to the segment")
+
+    for option, cost, fields, description in _enabled_options(segment):
+        report.cost_ms += cost
+        report.flags.append(f"{option} (~{cost:.0f} ms, {description})")
+        if _uses_field(templates, fields):
+            report.tuned_cost_ms += cost
+        else:
+            properties[option] = False
+            report.changes.append(f"{option} disabled; no template uses {', '.join(fields)}")
+
+    duration = _cache_duration(report.tuned_cost_ms)
+    if duration and "cache" not in segment:
+        strategy = "folder" if kind in LANGUAGE_SEGMENTS or kind in ("git", "svn", "mercurial", "sapling") \
+            else "session"
+        segment["cache"] = {"duration": duration, "strategy": strategy}
+        report.changes.append(f"cached per {strategy} for {duration}")
+        report.tuned_cost_ms = CACHE_HIT_COST
+    return report
+
+
+def tune(theme: dict) -> Tuple[dict, ThemeReport]:
+    """
+    Analyze a theme and build its tuned variant.
+
+    Options whose results no template displays are disabled, and segments
+    that stay expensive are cached with a duration that grows with their cost,
+    so most prompts render from the cache instead of running git or a runtime.
+
+    Args:
+        theme (dict): A parsed oh-my-posh configuration.
+
+    Returns:
+        Tuple[dict, ThemeReport]: The tuned configuration (the input is not modified) and the analysis.
+    """
+    tuned = copy.deepcopy(theme)
+    report = ThemeReport()
+    for block_number, block in enumerate(tuned.get("blocks", []), 1):
+        for segment_number, segment in enumerate(block.get("segments", []), 1):
+            report.segments.append(_tune_segment(segment, block_number, segment_number, report.warnings))
+    return tuned, report
+
+
+def analyze(theme: dict) -> ThemeReport:
+    return tune(theme)[1]
+
+
+_BARE_KEY_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def _toml_key(key: str) -> str:
+    return key if _BARE_KEY_RE.match(key) else _toml_string(key)
+
+
+def _toml_string(value: str) -> str:
+    out = []
+    for char in value:
+        code = ord(char)
+        if char in '"\\':
+            out.append("\\" + char)
+        elif char == "\n":
+            out.append("\\n")
+        elif code < 0x20 or code == 0x7F:
+            out.append(f"\\u{code:04X}")
+        elif code > 0x7E:
+            # Keep the file ASCII, like the hand-written theme's  escapes
+            out.append(f"\\u{code:04X}" if code <= 0xFFFF else f"\\U{code:08X}")
+        else:
+            out.append(char)
+    return '"' + "".join(out) + '"'
+
+
+def _toml_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return _toml_string(value)
+    if isinstance(value, list):
+        items = [_toml_value(item) for item in value]
+        if sum(len(item) for item in items) > 60:
+            return "[\n" + "".join(f"    {item},\n" for item in items) + "]"
+        return "[" + ", ".join(items) + "]"
+    if isinstance(value, dict):
+        return "{ " + ", ".join(f"{_toml_key(k)} = {_toml_value(v)}" for k, v in value.items()) + " }"
+    raise TypeError(f"Cannot write {type(value).__name__} to TOML")
+
+
+def _is_table_array(value) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(item, dict) for item in value)
+
+
+def _dump_table(table: dict, path: List[str], lines: List[str]) -> None:
+    for key, value in table.items():
+        if not isinstance(value, dict) and not _is_table_array(value):
+            lines.append(f"{_toml_key(key)} = {_toml_value(value)}")
+    for key, value in table.items():
+        header = ".".join(_toml_key(part) for part in path + [key])
+        if isinstance(value, dict):
+            lines += ["", f"[{header}]"]
+            _dump_table(value, path + [key], lines)
+        elif _is_table_array(value):
+            for item in value:
+                lines += ["", f"[[{header}]]"]
+                _dump_table(item, path + [key], lines)
+
+
+def dump_toml(data: dict) -> str:
+    """
+    Serialize a configuration (tables, arrays of tables, strings, numbers,
+    booleans and arrays) to TOML.
+    """
+    lines: List[str] = []
+    _dump_table(data, [], lines)
+    return "\n".join(lines).lstrip("\n") + "\n"
+
+
+def load_theme(path: Path) -> dict:
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def tune_file(source: Path) -> Tuple[str, str, ThemeReport]:
+    """
+    Tune a TOML theme file.
+
+    Returns:
+        Tuple[str, str, ThemeReport]: The tuned theme as TOML and as JSON, and the analysis.
+    """
+    tuned, report = tune(load_theme(source))
+    return dump_toml(tuned), json.dumps(tuned, indent=2, ensure_ascii=False) + "\n", report
+
+
+def write_tuned(source: Path, toml_dest: Path, json_dest: Path) -> ThemeReport:
+    """
+    Write the tuned TOML theme and its JSON form, which oh-my-posh parses without a TOML decoder.
+    """
+    toml_text, json_text, report = tune_file(source)
+    for dest, text in ((toml_dest, toml_text), (json_dest, json_text)):
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_text(text, encoding="utf-8")
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Estimate the render cost of an oh-my-posh theme and tune it.")
+    parser.add_argument("theme", nargs="?", default="zen.toml", help="TOML theme to analyze (default: zen.toml)")
+    parser.add_argument("-o", "--output", help="write the tuned TOML theme here, and its JSON form next to it")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        output = Path(args.output)
+        report = write_tuned(Path(args.theme), output, output.with_suffix(".json"))
+    else:
+        report = analyze(load_theme(Path(args.theme)))
+    print(report.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
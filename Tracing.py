@@ -0,0 +1,320 @@
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import count
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class Span:
+    """
+    A timed region of work: a setup step, a spawned command or a pwsh script.
+
+    start and end are perf_counter() readings; attrs holds details such as
+    exit_code, output_bytes, retries and child_cpu (seconds of CPU used by
+    the spawned process tree).
+    """
+    name: str
+    category: str
+    span_id: int
+    parent_id: Optional[int]
+    start: float
+    thread_id: int
+    thread_name: str
+    end: Optional[float] = None
+    attrs: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return 0.0 if self.end is None else self.end - self.start
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    """
+    Stand-in returned while tracing is disabled; every operation is a no-op.
+    """
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects spans in memory and exports them as JSONL or Chrome trace events.
+
+    Disabled by default, in which case span() returns NULL_SPAN and costs a
+    single attribute check. Spans nest per thread; work handed to another
+    thread passes its parent span explicitly.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = count(1)
+        self._origin = time.perf_counter()
+        self._started_at = time.time()
+
+    def enable(self) -> None:
+        """
+        Start a fresh trace.
+        """
+        with self._lock:
+            self.spans = []
+            self._origin = time.perf_counter()
+            self._started_at = time.time()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self) -> Optional[Span]:
+        if not self.enabled:
+            return None
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def span(self, name: str, category: str, parent: Optional[Span] = None, **attrs):
+        """
+        Context manager timing a region of work.
+
+        Args:
+            name (str): What is being timed, e.g. a step name or command label.
+            category (str): "step", "command", "pwsh" or "download".
+            parent (Optional[Span]): Enclosing span when it lives on another thread;
+                defaults to the innermost span of the calling thread.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return self._span(name, category, parent, attrs)
+
+    @contextlib.contextmanager
+    def _span(self, name: str, category: str, parent: Optional[Span], attrs: dict) -> Iterator[Span]:
+        stack = self._stack()
+        if parent is None and stack:
+            parent = stack[-1]
+        thread = threading.current_thread()
+        span = Span(name, category, next(self._ids), parent.span_id if parent else None,
+                    time.perf_counter(), thread.ident or 0, thread.name, attrs=dict(attrs))
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs.setdefault("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.end = time.perf_counter()
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def annotate(self, **attrs) -> None:
+        """
+        Add attributes to the innermost span of the calling thread, if any.
+        """
+        span = self.current()
+        if span is not None:
+            span.set(**attrs)
+
+    def write_jsonl(self, path: Path) -> None:
+        """
+        One JSON object per span, with times in seconds since the trace started.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for span in sorted(self.spans, key=lambda s: s.start):
+                f.write(json.dumps({
+                    "id": span.span_id,
+                    "parent": span.parent_id,
+                    "name": span.name,
+                    "category": span.category,
+                    "start": round(span.start - self._origin, 6),
+                    "duration": round(span.duration, 6),
+                    "thread": span.thread_name,
+                    **span.attrs,
+                }, default=str) + "\n")
+
+    def write_chrome(self, path: Path) -> None:
+        """
+        Chrome trace-event JSON, viewable in chrome://tracing, Perfetto or speedscope.
+        """
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in {span.thread_id: span.thread_name for span in self.spans}.items()
+        ]
+        for span in self.spans:
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - self._origin) * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {key: value if isinstance(value, (int, float, bool)) else str(value)
+                         for key, value in span.attrs.items()},
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"started_at": self._started_at}}, f)
+
+    def write(self, directory: Path) -> Tuple[Path, Path]:
+        """
+        Write the trace as <stamp>.jsonl and <stamp>.trace.json in directory.
+
+        Returns:
+            Tuple[Path, Path]: The JSONL and Chrome trace paths.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._started_at))
+        jsonl, chrome = directory / f"{stamp}.jsonl", directory / f"{stamp}.trace.json"
+        self.write_jsonl(jsonl)
+        self.write_chrome(chrome)
+        return jsonl, chrome
+
+    def descendants(self, span: Span) -> List[Span]:
+        children: Dict[Optional[int], List[Span]] = {}
+        for other in self.spans:
+            children.setdefault(other.parent_id, []).append(other)
+        found, queue = [], [span.span_id]
+        while queue:
+            for child in children.get(queue.pop(), []):
+                found.append(child)
+                queue.append(child.span_id)
+        return found
+
+
+# Shared by every module; enabled by --trace.
+tracer = Tracer()
+
+
+class ChildCpu:
+    """
+    Measures the CPU time of a child process and the processes it starts.
+
+    On Windows the child is placed in a job object, whose accounting covers
+    the whole tree; elsewhere the child is reaped with wait4, whose usage
+    includes the descendants it waited for. Measurement is best effort and
+    reports None when unavailable.
+    """
+    def __init__(self, process: subprocess.Popen):
+        self.process = process
+        self._job = _create_job(process) if sys.platform == "win32" else None
+
+    def wait(self) -> Tuple[int, Optional[float]]:
+        """
+        Wait for the process to exit.
+
+        Returns:
+            Tuple[int, Optional[float]]: Its exit status and CPU seconds used.
+        """
+        if sys.platform == "win32":
+            returncode = self.process.wait()
+            return returncode, _job_cpu(self._job)
+        try:
+            _, status, usage = os.wait4(self.process.pid, 0)
+        except ChildProcessError:
+            # Already reaped, e.g. by a poll() from a timeout watchdog
+            return self.process.wait(), None
+        self.process.returncode = os.waitstatus_to_exitcode(status)
+        return self.process.returncode, usage.ru_utime + usage.ru_stime
+
+
+def _create_job(process: subprocess.Popen):
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.CreateJobObjectW.restype = ctypes.c_void_p
+        kernel32.AssignProcessToJobObject.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        job = kernel32.CreateJobObjectW(None, None)
+        if job and kernel32.AssignProcessToJobObject(job, int(process._handle)):
+            return job
+    except (OSError, AttributeError):
+        pass
+    return None
+
+
+def _job_cpu(job) -> Optional[float]:
+    if job is None:
+        return None
+    import ctypes
+
+    class BasicAccountingInformation(ctypes.Structure):
+        _fields_ = [
+            ("TotalUserTime", ctypes.c_int64),
+            ("TotalKernelTime", ctypes.c_int64),
+            ("ThisPeriodTotalUserTime", ctypes.c_int64),
+            ("ThisPeriodTotalKernelTime", ctypes.c_int64),
+            ("TotalPageFaultCount", ctypes.c_uint32),
+            ("TotalProcesses", ctypes.c_uint32),
+            ("ActiveProcesses", ctypes.c_uint32),
+            ("TotalTerminatedProcesses", ctypes.c_uint32),
+        ]
+
+    kernel32 = ctypes.windll.kernel32
+    kernel32.QueryInformationJobObject.argtypes = [
+        ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_uint32, ctypes.c_void_p,
+    ]
+    kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+    info = BasicAccountingInformation()
+    try:
+        # 1 = JobObjectBasicAccountingInformation; times are in 100 ns units
+        if not kernel32.QueryInformationJobObject(job, 1, ctypes.byref(info), ctypes.sizeof(info), None):
+            return None
+        return (info.TotalUserTime + info.TotalKernelTime) / 1e7
+    finally:
+        kernel32.CloseHandle(job)
+
+
+def summary_table(results: Dict[str, object], limit: int = 5) -> str:
+    """
+    Format the slowest steps of a run as a text table.
+
+    Args:
+        results (Dict[str, object]): StepResults keyed by step name.
+        limit (int): Number of steps to list.
+
+    Returns:
+        str: The table; when tracing is enabled it also counts each step's
+             commands and their CPU time.
+    """
+    step_spans = {span.name: span for span in tracer.spans if span.category == "step"} if tracer.enabled else {}
+    rows = []
+    for name, result in sorted(results.items(), key=lambda item: item[1].duration, reverse=True)[:limit]:
+        row = [name, result.status, f"{result.duration:.2f}s"]
+        if tracer.enabled:
+            commands = [span for span in tracer.descendants(step_spans[name]) if span.category == "command"] \
+                if name in step_spans else []
+            cpu = sum(span.attrs.get("child_cpu") or 0.0 for span in commands)
+            status = "skipped" if name in step_spans and step_spans[name].attrs.get("skipped") else result.status
+            row = [name, status, row[2], str(len(commands)), f"{cpu:.2f}s"]
+        rows.append(row)
+
+    header = ["Step", "Status", "Wall"] + (["Commands", "Child CPU"] if tracer.enabled else [])
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    lines = [header, ["-" * width for width in widths]] + rows
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip() for line in lines)
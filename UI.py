@@ -1,11 +1,22 @@
-import os
 import sys
-from pwshConfig import Automatic_installation_And_Config 
+from pathlib import Path
+from typing import List, Optional
 
 sys.stdout.reconfigure(encoding='utf-8')
 
+if sys.platform == "win32":
+    # Let the console interpret the ANSI sequences used by Handle_Input.cls
+    import ctypes
+    _kernel32 = ctypes.windll.kernel32
+    _stdout = _kernel32.GetStdHandle(-11)
+    _mode = ctypes.c_uint32()
+    if _kernel32.GetConsoleMode(_stdout, ctypes.byref(_mode)):
+        _kernel32.SetConsoleMode(_stdout, _mode.value | 0x0004)  # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+
 class Handle_Input:
-    def __init__(self) -> None:
+    def __init__(self, force: bool = False, invalidate: Optional[List[str]] = None,
+                 timeout: Optional[float] = None, trace_dir: Optional[Path] = None,
+                 mirror: Optional[Path] = None, file_index: bool = False) -> None:
         self.banner: str = """                   _       ___             __ _       
  _ ____      _____| |__   / __\\___  _ __  / _(_) __ _ 
 | '_ \\ \\ /\\ / / __| '_ \\ / /  / _ \\| '_ \\| |_| |/ _` |
@@ -31,10 +42,30 @@ class Handle_Input:
 \\__ \\ |_| | (_| (_|  __/\\__ \\__ \\
 |___/\\__,_|\\___\\___\\___||___/___/ 
 """
-        self.installer = Automatic_installation_And_Config()
+        self.force = force
+        self.invalidate = invalidate
+        self.timeout = timeout
+        self.trace_dir = trace_dir
+        self.mirror = mirror
+        self.file_index = file_index
+        self._installer = None
+
+    @property
+    def installer(self):
+        """
+        The installer, created on first use so the menu appears without loading the manifest.
+        """
+        if self._installer is None:
+            from pwshConfig import Automatic_installation_And_Config
+            self._installer = Automatic_installation_And_Config(
+                force=self.force, invalidate=self.invalidate, timeout=self.timeout, trace_dir=self.trace_dir,
+                mirror=self.mirror, file_index=self.file_index,
+            )
+        return self._installer
         
     def cls(self) -> None:
-        os.system("cls")
+        # ANSI clear screen + cursor home; avoids spawning a shell for "cls"
+        print("\033[2J\033[H", end="", flush=True)
     
     def Print_banner(self) -> None:
         print(self.banner)
@@ -45,17 +76,26 @@ class Handle_Input:
         
     def Handle(self, user_input: str) -> None:
         if user_input == "1":
-            os.system("cls")
+            self.cls()
             print("Automatic installation")
-            if self.installer.setup_environment() == True:
-                print(self.success)
+            # Imported here, like the installer, so the menu appears without loading the install modules
+            from Mirror import MirrorError
+            try:
+                if self.installer.setup_environment() == True:
+                    print(self.success)
+            except MirrorError as e:
+                # Raised while the installer is created on first use, e.g. a mirror without a usable lockfile
+                print(f"Error: {e}")
+            except KeyboardInterrupt:
+                # The scheduler has already killed the installers that were running
+                print("\nInstallation cancelled.")
             
         elif user_input == "2":
-            os.system("cls")
+            self.cls()
             print("Manual installation")
             
         elif user_input == "3":
-            os.system("cls")
+            self.cls()
             while True:
                 exit_user_input: str = input("Are you sure you want to exit? (y/n): ").strip().lower()
                 if exit_user_input == 'y':
@@ -63,9 +103,9 @@ class Handle_Input:
                 elif exit_user_input == 'n':
                     break
                 else:
-                    os.system("cls")
+                    self.cls()
                     print("Invalid input. Please enter 'y' or 'n'.")
             
         else:
-            os.system("cls")
+            self.cls()
             print("Invalid input. Please select 1, 2, or 3.")
\ No newline at end of file
@@ -0,0 +1,265 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from AppPaths import cache_dir, config_dir
+from ProfileOptimizer import optimize_installed, source_hash, state_path as optimizer_state_path
+from ProfileWriter import ProfileWriter, unmanaged_hash
+from TaskScheduler import schedule_script, unschedule
+
+PROFILE_URL = "https://raw.githubusercontent.com/PUXSY/pwsh-config/refs/heads/main/Microsoft.PowerShell_profile.ps1"
+RELEASES_URL = "https://api.github.com/repos/PowerShell/PowerShell/releases/latest"
+TASK_NAME = "pwsh-config update check"
+CHECK_INTERVAL_HOURS = 24
+# The updater runs from a copy under the config directory, so it keeps working without the repository
+UPDATER_FILES = ("Updater.py", "AppPaths.py", "TaskScheduler.py", "ProfileWriter.py", "ProfileOptimizer.py")
+
+
+class UpdateError(ValueError):
+    """
+    Raised when a downloaded update cannot be installed.
+    """
+
+
+def status_path(home: Optional[Path] = None) -> Path:
+    """
+    Returns the file the profile reads at startup instead of checking for updates itself.
+    """
+    return config_dir(home) / "update-status.json"
+
+
+def profile_path(home: Optional[Path] = None) -> Path:
+    return (home or Path.home()) / "Documents" / "PowerShell" / "Microsoft.PowerShell_profile.ps1"
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A scheduled check and one started by the profile may overlap
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class ConditionalFetcher:
+    """
+    HTTP GETs that remember each URL's response body and validators.
+
+    Later requests for the same URL send If-None-Match / If-Modified-Since, so
+    an unchanged resource costs a 304 with no body (and, for the GitHub API,
+    no rate limit).
+    """
+    def __init__(self, root: Path, timeout: float = 10):
+        self.root = Path(root)
+        self.timeout = timeout
+        self.index_path = self.root / "index.json"
+        try:
+            self._index: Dict[str, dict] = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            self._index = {}
+
+    def _body_path(self, url: str) -> Path:
+        return self.root / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]}.body"
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[bytes, bool]:
+        """
+        Fetch url, reusing the stored body when the server reports it unchanged.
+
+        Returns:
+            Tuple[bytes, bool]: The body and whether it changed since the last fetch.
+
+        Raises:
+            urllib.error.URLError: If the server cannot be reached or answers with an error.
+        """
+        entry = self._index.get(url, {})
+        body_path = self._body_path(url)
+        request = urllib.request.Request(url, headers={"User-Agent": "pwsh-config-updater", **(headers or {})})
+        if entry and body_path.exists():
+            if entry.get("etag"):
+                request.add_header("If-None-Match", entry["etag"])
+            if entry.get("last_modified"):
+                request.add_header("If-Modified-Since", entry["last_modified"])
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                validators = {"etag": response.headers.get("ETag"),
+                              "last_modified": response.headers.get("Last-Modified")}
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and body_path.exists():
+                return body_path.read_bytes(), False
+            raise
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        body_path.write_bytes(body)
+        self._index[url] = validators
+        _write_json(self.index_path, self._index)
+        return body, True
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def check(home: Optional[Path] = None, fetcher: Optional[ConditionalFetcher] = None,
+          profile_url: str = PROFILE_URL, releases_url: str = RELEASES_URL) -> dict:
+    """
+    Look up the latest PowerShell release and profile, and write the status file.
+
+    A check that fails keeps the previous result for that item and records the
+    error, so a machine that is offline keeps showing what it last knew.
+
+    Returns:
+        dict: The status written to status_path(home).
+    """
+    path = status_path(home)
+    try:
+        previous = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        previous = {}
+    fetcher = fetcher or ConditionalFetcher(cache_dir(home) / "updater")
+    status = {"checked_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "errors": {}}
+
+    try:
+        body, _ = fetcher.get(releases_url, {"Accept": "application/vnd.github+json"})
+        release = json.loads(body)
+        status["powershell"] = {"latest": str(release["tag_name"]).lstrip("v"), "url": release.get("html_url")}
+    except (OSError, ValueError, KeyError) as e:
+        status["powershell"] = previous.get("powershell")
+        status["errors"]["powershell"] = str(e)
+
+    try:
+        body, _ = fetcher.get(profile_url)
+        # Update-Profile installs this copy, so it does not download the profile again
+        latest = config_dir(home) / "updater" / "Microsoft.PowerShell_profile.ps1"
+        latest.parent.mkdir(parents=True, exist_ok=True)
+        if not latest.exists() or _sha256(latest.read_bytes()) != _sha256(body):
+            latest.write_bytes(body)
+        # The deployed profile carries the installer's managed blocks, which upstream does not have,
+        # and may have been optimized; compare the profile it was made from
+        installed = profile_path(home)
+        current = source_hash(installed.read_bytes(), home) if installed.exists() else None
+        status["profile"] = {"update_available": current != unmanaged_hash(body), "sha256": _sha256(body),
+                             "path": str(latest)}
+    except OSError as e:
+        status["profile"] = previous.get("profile")
+        status["errors"]["profile"] = str(e)
+
+    _write_json(path, status)
+    return status
+
+
+def install_profile(home: Optional[Path] = None) -> bool:
+    """
+    Install the profile downloaded by the last check, keeping the installer's managed blocks.
+    A profile the installer optimized is optimized again after the update.
+
+    Returns:
+        bool: True if the profile changed, False if it was already up to date.
+
+    Raises:
+        UpdateError: If no check downloaded a profile, or the download does not
+            match the hash the check recorded for it.
+    """
+    try:
+        status = json.loads(status_path(home).read_text(encoding="utf-8"))
+        if status["errors"].get("profile"):
+            raise UpdateError(f"The last check could not download the profile: {status['errors']['profile']}")
+        entry = status["profile"]
+        latest = Path(entry["path"])
+        body = latest.read_bytes()
+    except UpdateError:
+        raise
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise UpdateError(f"No downloaded profile to install; run a check first ({e})") from e
+    if _sha256(body) != entry.get("sha256"):
+        raise UpdateError(f"{latest} does not match the hash recorded when it was downloaded; run a check again")
+
+    profile = ProfileWriter(profile_path(home), config_dir(home) / "profile.json")
+    current = profile.path.read_bytes() if profile.path.exists() else b""
+    changed = source_hash(current, home) != unmanaged_hash(body)
+    if changed:
+        profile.replace_unmanaged(body.decode("utf-8", errors="surrogateescape"))
+        if optimizer_state_path(home).exists():
+            optimize_installed(profile, home)
+    if entry.get("update_available"):
+        # Stop the startup hint until the next check
+        entry["update_available"] = False
+        _write_json(status_path(home), status)
+    return changed
+
+
+def install(home: Optional[Path] = None) -> Path:
+    """
+    Copy the updater into the config directory.
+
+    Returns:
+        Path: The installed Updater.py.
+    """
+    target = config_dir(home) / "updater"
+    target.mkdir(parents=True, exist_ok=True)
+    source = Path(__file__).resolve().parent
+    for name in UPDATER_FILES:
+        shutil.copy2(source / name, target / name)
+    return target / "Updater.py"
+
+
+def schedule(script: Path, interval_hours: int = CHECK_INTERVAL_HOURS) -> Tuple[bool, str]:
+    """
+    Register a Task Scheduler task that runs "Updater.py check" every interval_hours.
+
+    Returns:
+        Tuple[bool, str]: Whether the task was created, and schtasks' message.
+    """
+    return schedule_script(TASK_NAME, script, ["check"], interval_hours * 60)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check for PowerShell and profile updates in the background.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check_parser = subparsers.add_parser("check", help="check now and write the status file")
+    check_parser.add_argument("--home", type=Path, help="home directory (default: the current user's)")
+    check_parser.add_argument("--profile-url", default=PROFILE_URL, help="where the latest profile is published")
+    check_parser.add_argument("--releases-url", default=RELEASES_URL, help="GitHub API URL of the latest release")
+    schedule_parser = subparsers.add_parser("schedule", help="install the updater and check on a schedule")
+    schedule_parser.add_argument("--interval-hours", type=int, default=CHECK_INTERVAL_HOURS)
+    subparsers.add_parser("unschedule", help="remove the scheduled check")
+    subparsers.add_parser("status", help="print the last check's results")
+    install_parser = subparsers.add_parser("install-profile", help="install the profile downloaded by the last check")
+    install_parser.add_argument("--home", type=Path, help="home directory (default: the current user's)")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        status = check(args.home, profile_url=args.profile_url, releases_url=args.releases_url)
+        print(json.dumps(status, indent=2))
+        return 0 if not status["errors"] else 1
+    if args.command == "install-profile":
+        try:
+            changed = install_profile(args.home)
+        except (UpdateError, OSError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        print("Profile has been updated. Please restart your shell to reflect changes" if changed
+              else "Profile is up to date.")
+        return 0
+    if args.command == "schedule":
+        ok, message = schedule(install(), args.interval_hours)
+    elif args.command == "unschedule":
+        ok, message = unschedule(TASK_NAME)
+    else:
+        try:
+            message, ok = status_path().read_text(encoding="utf-8"), True
+        except OSError:
+            message, ok = "No update check has run yet.", False
+    print(message)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
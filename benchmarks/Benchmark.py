@@ -0,0 +1,275 @@
+"""
+Installer benchmarks against simulated winget/pip/pwsh backends.
+
+Each scenario runs in a fresh worker process with its own home directory and
+fake tools first on PATH (see FakeBackend.py), so nothing on the machine is
+installed or changed. Results are compared with a stored baseline; the run
+fails when a scenario got slower, spawned more processes or used more memory.
+
+    py benchmarks/Benchmark.py                      # all scenarios, 10/100/1000 packages
+    py benchmarks/Benchmark.py --sizes 100 --scenarios setup necessary_packages
+    py benchmarks/Benchmark.py --update-baseline    # accept the current numbers
+
+The fake tools are shell wrappers on POSIX and .cmd files on Windows; since
+Windows only resolves .exe files for commands started without a shell, the
+installed-package listing falls back to "nothing installed" there.
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+TOOLS = ("winget", "pwsh", "zoxide", "oh-my-posh", "schtasks")
+# "setup" is setup_environment end to end; the rest are the steps of Automatic_installation_And_Config.build_steps
+# "mirror" installs the winget and Python packages from a mirror built beforehand (not timed)
+SCENARIOS = ("setup", "python_packages", "necessary_packages", "nerd_fonts", "pwsh_profile",
+             "configure_profile", "oh_my_posh_config", "init_scripts", "mirror")
+
+
+def synthetic_manifest(size: int) -> dict:
+    """
+    A manifest with size packages: nine in ten are winget packages (every tenth
+    depending on the one before it) and the rest are Python packages.
+    """
+    python_count = max(1, size // 10)
+    winget_packages = {}
+    for i in range(size - python_count):
+        command = f"winget install --id Bench.Package{i:04d} -e --source winget"
+        if i % 10 == 9:
+            winget_packages[f"package-{i:04d}"] = {"command": command, "depends_on": [f"package-{i - 1:04d}"]}
+        else:
+            winget_packages[f"package-{i:04d}"] = command
+    return {
+        "Necessary_packages": winget_packages,
+        "Nerd_fonts": [],
+        "Py_packages": {f"benchpkg{i:04d}": f"pip install benchpkg{i:04d}==1.0" for i in range(python_count)},
+    }
+
+
+def write_fakes(root: Path) -> Dict[str, str]:
+    """
+    Create the fake tool wrappers under root and return the environment that selects them.
+    """
+    bin_dir, pylib = root / "bin", root / "pylib" / "pip"
+    bin_dir.mkdir(parents=True)
+    pylib.mkdir(parents=True)
+    backend = BENCH_DIR / "FakeBackend.py"
+    for tool in TOOLS:
+        if sys.platform == "win32":
+            (bin_dir / f"{tool}.cmd").write_text(f'@"{sys.executable}" "{backend}" {tool} %*\r\n')
+        else:
+            wrapper = bin_dir / tool
+            wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{backend}" {tool} "$@"\n')
+            wrapper.chmod(0o755)
+    # "python -m pip" finds this package before the real pip, since PYTHONPATH precedes site-packages
+    (pylib / "__init__.py").write_text("")
+    (pylib / "__main__.py").write_text(
+        f"import sys\nsys.path.insert(0, {str(BENCH_DIR)!r})\n"
+        "import FakeBackend\nsys.exit(FakeBackend.main(['pip'] + sys.argv[1:]))\n"
+    )
+
+    home = root / "home"
+    home.mkdir()
+    return {
+        "PATH": str(bin_dir) + os.pathsep + os.environ.get("PATH", ""),
+        "PYTHONPATH": str(root / "pylib"),
+        "HOME": str(home),
+        "USERPROFILE": str(home),
+        "LOCALAPPDATA": str(home / "AppData" / "Local"),
+        "PWSH_BENCH_STATE": str(root),
+    }
+
+
+def peak_rss_mb() -> float:
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage",
+                )
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+        ctypes.windll.psapi.GetProcessMemoryInfo.argtypes = [ctypes.c_void_p, ctypes.c_void_p, wintypes.DWORD]
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+        )
+        return counters.PeakWorkingSetSize / 2 ** 20
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def run_worker(scenario: str, manifest: str) -> dict:
+    """
+    Run one scenario in this process (started by run_scenario) and measure it.
+    """
+    sys.path.insert(0, str(REPO_ROOT))
+    mirror = None
+    if scenario == "mirror":
+        from JsonManager import JsonManager
+        from Mirror import Mirror
+        mirror = Path(manifest).parent / "mirror"
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            Mirror(mirror).bundle(JsonManager(manifest, use_cache=False), max_workers=8)
+        # Only the installs count towards the scenario
+        (Path(os.environ["PWSH_BENCH_STATE"]) / "calls.log").unlink(missing_ok=True)
+
+    started = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        from pwshConfig import Automatic_installation_And_Config
+        installer = Automatic_installation_And_Config(force=True, interactive=False, manifest_path=manifest,
+                                                      mirror=mirror)
+        if scenario == "configure_profile":
+            # Normally created by the pwsh_profile step
+            installer.profile_path.parent.mkdir(parents=True, exist_ok=True)
+            installer.profile_path.touch()
+        if scenario == "setup":
+            ok = installer.setup_environment()
+        elif scenario == "mirror":
+            results = installer.run_steps(installer.select_steps(["necessary_packages", "python_packages"]))
+            ok = all(result.ok for result in results.values())
+        else:
+            results = installer.run_steps(installer.select_steps([scenario]))
+            ok = all(result.ok for result in results.values())
+    return {"ok": ok, "seconds": round(time.perf_counter() - started, 3), "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def run_scenario(scenario: str, size: int, args: argparse.Namespace) -> dict:
+    """
+    Run a scenario against a synthetic manifest in a fresh worker process.
+    """
+    with tempfile.TemporaryDirectory(prefix="pwsh-bench-") as tmp:
+        root = Path(tmp)
+        env = {**os.environ, **write_fakes(root),
+               "PWSH_BENCH_LATENCY": str(args.latency),
+               "PWSH_BENCH_OUTPUT_LINES": str(args.output_lines),
+               "PWSH_BENCH_FAILURE_RATE": str(args.failure_rate),
+               "PWSH_BENCH_SEED": str(args.seed)}
+        manifest = root / "packages.json"
+        manifest.write_text(json.dumps(synthetic_manifest(size)), encoding="utf-8")
+
+        worker = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--worker", scenario, str(manifest)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+        if worker.returncode != 0:
+            raise RuntimeError(f"{scenario}/{size} worker failed:\n{worker.stderr[-2000:]}")
+        result = json.loads(worker.stdout.strip().splitlines()[-1])
+        calls = (root / "calls.log").read_text(encoding="utf-8").splitlines() if (root / "calls.log").exists() else []
+        # Scripts sent to the pwsh session and packages of an import are logged too, but are not processes
+        result["subprocesses"] = sum(1 for call in calls if call != "pwsh script"
+                                     and not call.startswith("winget import "))
+        return result
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Returns a description of every metric that regressed against the baseline.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["subprocesses"] > base["subprocesses"]:
+            regressions.append(f"{key}: {result['subprocesses']} subprocesses (baseline {base['subprocesses']})")
+        # A small absolute allowance keeps scenarios that take milliseconds from flapping
+        if result["seconds"] > base["seconds"] * (1 + tolerance) + 0.1:
+            regressions.append(f"{key}: {result['seconds']:.2f}s (baseline {base['seconds']:.2f}s)")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance) + 2:
+            regressions.append(f"{key}: {result['peak_rss_mb']:.1f} MB peak RSS (baseline {base['peak_rss_mb']:.1f} MB)")
+    return regressions
+
+
+def print_table(results: Dict[str, dict], baseline: Dict[str, dict]) -> None:
+    rows = [["Scenario", "Time", "Subprocesses", "Peak RSS", "Baseline time"]]
+    for key, result in results.items():
+        base = baseline.get(key)
+        rows.append([
+            key + ("" if result["ok"] else " (failed)"),
+            f"{result['seconds']:.2f}s",
+            str(result["subprocesses"]),
+            f"{result['peak_rss_mb']:.1f} MB",
+            f"{base['seconds']:.2f}s" if base else "-",
+        ])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the installer against simulated backends.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1000], help="manifest sizes to run")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS), metavar="SCENARIO",
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds each fake install or script takes")
+    parser.add_argument("--output-lines", type=int, default=20, help="progress lines printed per fake install")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="probability that a fake install attempt fails with a transient error")
+    parser.add_argument("--seed", type=int, default=0, help="seed for reproducible failures")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline file to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown and memory growth (default: 0.25)")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    parser.add_argument("--worker", nargs=2, metavar=("SCENARIO", "MANIFEST"), help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.worker:
+        print(json.dumps(run_worker(*args.worker)))
+        return 0
+
+    config = {"latency": args.latency, "output_lines": args.output_lines,
+              "failure_rate": args.failure_rate, "seed": args.seed}
+    results = {}
+    for size in args.sizes:
+        for scenario in args.scenarios:
+            results[f"{scenario}/{size}"] = run_scenario(scenario, size, args)
+            print(f"{scenario}/{size}: {results[f'{scenario}/{size}']['seconds']:.2f}s", file=sys.stderr)
+
+    stored = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    baseline = stored.get("results", {}) if stored.get("config") == config else {}
+    if stored and not baseline:
+        print(f"Baseline {args.baseline} was recorded with different settings; not comparing.")
+    print_table(results, baseline)
+
+    if args.json:
+        args.json.write_text(json.dumps({"config": config, "results": results}, indent=2), encoding="utf-8")
+    if args.update_baseline:
+        merged = {**baseline, **results}
+        args.baseline.write_text(json.dumps({"config": config, "results": merged}, indent=2) + "\n",
+                                 encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    failed = [key for key, result in results.items() if not result["ok"]]
+    regressions = compare(results, baseline, args.tolerance)
+    for key in failed:
+        print(f"FAILED: {key} did not complete successfully")
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
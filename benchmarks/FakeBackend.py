@@ -0,0 +1,240 @@
+"""
+Stand-ins for winget, pip, pwsh, zoxide, oh-my-posh and schtasks used by the benchmarks.
+
+Benchmark.py puts small wrappers named after each tool on PATH (and a fake
+pip package on PYTHONPATH) that all run this file with the tool name as the
+first argument. Behaviour is controlled through environment variables:
+
+    PWSH_BENCH_STATE         directory for calls.log and installed.txt (required)
+    PWSH_BENCH_LATENCY       seconds each install or script takes (default 0.01)
+    PWSH_BENCH_OUTPUT_LINES  progress lines printed per install (default 20)
+    PWSH_BENCH_FAILURE_RATE  probability that an install attempt fails with a
+                             transient network error (default 0)
+    PWSH_BENCH_SEED          seed making failures reproducible (default 0)
+
+"winget download" and "pip download" write small placeholder files, and
+installs from a local manifest or with --no-index fail when those files are
+missing, so a mirror can be built and installed from without any network.
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+STATE = Path(os.environ.get("PWSH_BENCH_STATE", "."))
+LATENCY = float(os.environ.get("PWSH_BENCH_LATENCY", "0.01"))
+OUTPUT_LINES = int(os.environ.get("PWSH_BENCH_OUTPUT_LINES", "20"))
+FAILURE_RATE = float(os.environ.get("PWSH_BENCH_FAILURE_RATE", "0"))
+SEED = os.environ.get("PWSH_BENCH_SEED", "0")
+
+
+def record(entry: str) -> None:
+    # One short append per call; lines this small are written atomically
+    with open(STATE / "calls.log", "a", encoding="utf-8") as f:
+        f.write(entry + "\n")
+
+
+def installed() -> list:
+    try:
+        return (STATE / "installed.txt").read_text(encoding="utf-8").split()
+    except OSError:
+        return []
+
+
+def progress(label: str, seconds: float) -> None:
+    for i in range(1, OUTPUT_LINES + 1):
+        filled = 30 * i // OUTPUT_LINES
+        print(f"  {'█' * filled}{'▒' * (30 - filled)}  {i * 100 // OUTPUT_LINES}% {label}", flush=True)
+        time.sleep(seconds / OUTPUT_LINES)
+    if not OUTPUT_LINES:
+        time.sleep(seconds)
+
+
+def winget(args: list) -> int:
+    if args[:1] == ["list"]:
+        record("winget list")
+        ids = installed()
+        width = max([len(package_id) for package_id in ids] + [4]) + 2
+        print(f"{'Name'.ljust(width)}{'Id'.ljust(width)}{'Version'.ljust(10)}Source")
+        print("-" * (2 * width + 16))
+        for package_id in ids:
+            print(f"{package_id.ljust(width)}{package_id.ljust(width)}{'1.0.0'.ljust(10)}winget")
+        return 0
+
+    if args[:1] == ["download"]:
+        return winget_download(args)
+    if args[:1] == ["import"]:
+        return winget_import(args)
+    if args[:1] != ["install"]:
+        record(f"winget {' '.join(args[:1])}")
+        return 0
+    manifest = option(args, "--manifest", "-m")
+    if manifest:
+        # Like winget, fetch the installer from the manifest's InstallerUrl and check its hash;
+        # the benchmarks run offline, so anything but a local file fails
+        path = Path(manifest)
+        text = (path if path.is_file() else next(path.glob("*.yaml"))).read_text(encoding="utf-8")
+        package_id = re.search(r"^PackageIdentifier: (\S+)$", text, re.M).group(1)
+        url = re.search(r"InstallerUrl: (\S+)$", text, re.M).group(1)
+        sha256 = re.search(r"InstallerSha256: (\S+)$", text, re.M).group(1)
+        if not url.startswith("file:"):
+            record(f"network {url}")
+            print(f"Downloading {url}")
+            print("0x80072efd : InternetOpenUrl() failed.")
+            return 1
+        installer = Path(urllib.request.url2pathname(urllib.parse.urlparse(url).path))
+        if not installer.is_file() or hashlib.sha256(installer.read_bytes()).hexdigest() != sha256.lower():
+            print("Installer hash does not match; this cannot be overridden when running as admin")
+            return 1
+    else:
+        package_id = option(args, "--id", "-q")
+        package_id = package_id or next((arg for arg in args[1:] if not arg.startswith("-")), "unknown")
+    record(f"winget install {package_id}")
+
+    if package_id in installed():
+        print("Found an existing package already installed. Trying to upgrade the installed package...")
+        print("No available upgrade found.")
+        return 43
+    return install_package(package_id, f"winget install {package_id}")
+
+
+def install_package(package_id: str, call: str) -> int:
+    """
+    Simulate downloading and installing one package; call is its calls.log entry,
+    whose count numbers the attempts so retries can succeed.
+    """
+    attempt = sum(1 for line in (STATE / "calls.log").read_text(encoding="utf-8").splitlines() if line == call)
+    print(f"Found {package_id} [{package_id}] Version 1.0.0")
+    print("Downloading https://example.invalid/" + package_id)
+    if random.Random(f"{SEED}:{package_id}:{attempt}").random() < FAILURE_RATE:
+        progress(package_id, LATENCY / 2)
+        print("An unexpected error occurred while executing the command:")
+        print("0x80072efd : InternetOpenUrl() failed.")
+        return 1
+    progress(package_id, LATENCY)
+    print("Successfully verified installer hash")
+    print("Starting package install...")
+    print("Successfully installed")
+    with open(STATE / "installed.txt", "a", encoding="utf-8") as f:
+        f.write(package_id + "\n")
+    return 0
+
+
+def winget_import(args: list) -> int:
+    document = json.loads(Path(option(args, "--import-file", "-i")).read_text(encoding="utf-8"))
+    record("winget import")
+    failed = 0
+    for source in document["Sources"]:
+        for package in source["Packages"]:
+            package_id = package["PackageIdentifier"]
+            if package_id in installed():
+                print(f"Package is already installed: {package_id}")
+                continue
+            # Logged per package so a failed import attempt counts towards the package's retries
+            record(f"winget import {package_id}")
+            if install_package(package_id, f"winget import {package_id}") != 0:
+                print("Installer failed with exit code: 1603")
+                failed += 1
+    return 1 if failed else 0
+
+
+def option(args: list, *names: str):
+    """
+    Returns the value following the first of names in args, or None.
+    """
+    return next((args[i + 1] for i, arg in enumerate(args[:-1]) if arg in names), None)
+
+
+def winget_download(args: list) -> int:
+    package_id = option(args, "--id", "-q")
+    package_id = package_id or next((arg for arg in args[1:] if not arg.startswith("-")), "unknown")
+    record(f"winget download {package_id}")
+    directory = Path(option(args, "--download-directory", "-d") or ".")
+    directory.mkdir(parents=True, exist_ok=True)
+    print(f"Found {package_id} [{package_id}] Version 1.0.0")
+    progress(package_id, LATENCY)
+    installer = package_id.encode("utf-8") * 64
+    (directory / f"{package_id}.msi").write_bytes(installer)
+    # As with winget, the manifest keeps pointing at where the installer was downloaded from
+    (directory / f"{package_id}_1.0.0_Machine_X64_msi_en-US.yaml").write_text(
+        f"PackageIdentifier: {package_id}\nPackageVersion: 1.0.0\nInstallers:\n"
+        f"- Architecture: x64\n  InstallerType: msi\n  InstallerUrl: https://example.invalid/{package_id}.msi\n"
+        f"  InstallerSha256: {hashlib.sha256(installer).hexdigest().upper()}\nManifestType: singleton\n",
+        encoding="utf-8")
+    print(f"Installer downloaded: {directory / (package_id + '.msi')}")
+    return 0
+
+
+def wheel_name(requirement: str) -> str:
+    return re.split(r"[<>=!~;\[ ]", requirement, 1)[0].replace("-", "_") + "-1.0-py3-none-any.whl"
+
+
+def pip(args: list) -> int:
+    record(f"pip {' '.join(args[:1])}")
+    values = {option(args, name) for name in ("--dest", "-d", "--find-links", "-f")}
+    requirements = [arg for arg in args[1:] if not arg.startswith("-") and arg not in values]
+    if args[:1] == ["download"]:
+        dest = Path(option(args, "--dest", "-d") or ".")
+        dest.mkdir(parents=True, exist_ok=True)
+        for requirement in requirements:
+            (dest / wheel_name(requirement)).write_bytes(requirement.encode("utf-8"))
+    find_links = option(args, "--find-links", "-f")
+    if "--no-index" in args and find_links:
+        missing = [req for req in requirements if not (Path(find_links) / wheel_name(req)).exists()]
+        if missing:
+            print(f"ERROR: No matching distribution found for {missing[0]}")
+            return 1
+    for requirement in requirements:
+        print(f"Collecting {requirement}")
+        print(f"  Downloading {requirement}-py3-none-any.whl (10 kB)")
+    time.sleep(LATENCY + LATENCY / 10 * len(requirements))
+    verb = "downloaded" if args[:1] == ["download"] else "installed"
+    print(f"Successfully {verb} " + " ".join(requirements))
+    return 0
+
+
+def pwsh(args: list) -> int:
+    record("pwsh")
+    if "-EncodedCommand" not in args:
+        time.sleep(LATENCY)
+        return 0
+    # Session host loop: answer every framed request with success and no output
+    empty = base64.b64encode(b"").decode("ascii")
+    for line in sys.stdin:
+        request_id, payload = line.rstrip("\n").split("\t", 1)
+        record("pwsh script")
+        time.sleep(LATENCY)
+        print(f"{request_id}\t0\t{empty}\t{empty}", flush=True)
+    return 0
+
+
+def init_tool(name: str, args: list) -> int:
+    record(f"{name} {' '.join(args[:1])}")
+    if "--version" in args:
+        print("1.0.0")
+    else:
+        for i in range(OUTPUT_LINES):
+            print(f"# {name} init line {i}")
+    return 0
+
+
+def main(argv: list) -> int:
+    tool, args = argv[0], argv[1:]
+    if tool == "winget":
+        return winget(args)
+    if tool == "pip":
+        return pip(args)
+    if tool == "pwsh":
+        return pwsh(args)
+    return init_tool(tool, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
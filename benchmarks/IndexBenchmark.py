@@ -0,0 +1,186 @@
+"""
+FileIndex benchmarks on generated directory trees.
+
+For each tree size it measures building the index (names only, and names
+plus contents), a no-op update, an update after one directory in a hundred
+changed, the size of the index file, and the latency of ff- and grep-style
+queries through the index against the directory walk they replace.
+
+    py benchmarks/IndexBenchmark.py                   # 10000 and 100000 files
+    py benchmarks/IndexBenchmark.py --sizes 1000000 --queries 50
+    py benchmarks/IndexBenchmark.py --json index-results.json
+
+Everything is written to a temporary directory that is removed afterwards.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from FileIndex import FileIndex  # noqa: E402
+
+WORDS = ("alpha", "bravo", "config", "delta", "export", "fixture", "gateway", "helper", "index", "journal",
+         "kernel", "loader", "module", "network", "option", "parser", "query", "render", "schema", "token")
+EXTENSIONS = (".py", ".ps1", ".json", ".md", ".txt", ".toml")
+FILES_PER_DIR = 20
+
+
+def make_tree(root: Path, files: int, seed: int) -> List[Path]:
+    """
+    Create files small text files, FILES_PER_DIR per directory, nested a few levels deep.
+
+    Returns:
+        List[Path]: The leaf directories.
+    """
+    rng = random.Random(seed)
+    dirs = []
+    for n in range((files + FILES_PER_DIR - 1) // FILES_PER_DIR):
+        directory = root / f"{rng.choice(WORDS)}{n % 10}" / f"{rng.choice(WORDS)}{n % 97}" / f"d{n}"
+        directory.mkdir(parents=True, exist_ok=True)
+        dirs.append(directory)
+        for i in range(min(FILES_PER_DIR, files - n * FILES_PER_DIR)):
+            words = rng.sample(WORDS, 2)
+            body = "\n".join(" ".join(rng.choices(WORDS, k=8)) for _ in range(20))
+            (directory / f"{words[0]}_{words[1]}_{n}_{i}{rng.choice(EXTENSIONS)}").write_text(body)
+    return dirs
+
+
+def timed(action: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+
+def latencies(action: Callable[[str], object], queries: List[str]) -> Dict[str, float]:
+    samples = [timed(lambda: action(query)) * 1000 for query in queries]
+    return {"median_ms": round(statistics.median(samples), 2),
+            "p95_ms": round(sorted(samples)[max(0, int(len(samples) * 0.95) - 1)], 2)}
+
+
+def walk_find(root: Path, pattern: str) -> List[str]:
+    """
+    What ff does without an index: walk everything and match every name.
+    """
+    wildcard = f"*{pattern.lower()}*"
+    found = []
+    for directory, dirnames, filenames in os.walk(root):
+        found.extend(os.path.join(directory, name) for name in dirnames + filenames
+                     if fnmatch.fnmatchcase(name.lower(), wildcard))
+    return found
+
+
+def walk_grep(root: Path, pattern: str) -> List[str]:
+    """
+    What a recursive grep does without an index: read every file.
+    """
+    regex = re.compile(pattern, re.IGNORECASE)
+    found = []
+    for directory, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(directory, name)
+            with open(path, encoding="utf-8", errors="replace") as f:
+                found.extend(f"{path}:{n}:{line}" for n, line in enumerate(f, 1) if regex.search(line))
+    return found
+
+
+def db_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.parent.glob(path.name + "*"))
+
+
+def run_size(files: int, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix="pwsh-index-bench-") as tmp:
+        tree, db = Path(tmp) / "tree", Path(tmp) / "index.db"
+        dirs = make_tree(tree, files, args.seed)
+        result = {}
+
+        index = FileIndex(db)
+        index.add_root(tree)
+        result["build_s"] = round(timed(index.update), 3)
+        index.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        result["index_mb"] = round(db_size(db) / 2 ** 20, 2)
+        result["noop_update_s"] = round(timed(index.update), 3)
+
+        for directory in rng.sample(dirs, max(1, len(dirs) // 100)):
+            (directory / "added.txt").write_text("config")
+        result["update_1pct_s"] = round(timed(index.update), 3)
+
+        find_queries = [f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{rng.randrange(len(dirs))}_"
+                        for _ in range(args.queries)]
+        result["find"] = latencies(lambda q: list(index.find(q, tree)), find_queries)
+        result["find_walk"] = latencies(lambda q: walk_find(tree, q), find_queries[:max(1, args.queries // 10)])
+        cli = [sys.executable, str(REPO_ROOT / "FileIndex.py"), "--db", str(db), "find"]
+        result["find_cli"] = latencies(
+            lambda q: subprocess.run([*cli, q, "--under", str(tree)], capture_output=True, check=True),
+            find_queries[:max(1, args.queries // 10)])
+        index.close()
+
+        db_content = Path(tmp) / "content.db"
+        index = FileIndex(db_content)
+        index.add_root(tree, content=True)
+        result["build_content_s"] = round(timed(index.update), 3)
+        index.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        result["content_index_mb"] = round(db_size(db_content) / 2 ** 20, 2)
+        # Rare words are what grep is usually for; every generated line is made of common ones
+        sample = rng.sample(dirs, min(len(dirs), 5))
+        for n, directory in enumerate(sample):
+            (directory / f"needle{n}.txt").write_text(f"a line with marker{n} in it\n")
+        index.update()
+        grep_queries = [f"marker{rng.randrange(len(sample))}" for _ in range(args.queries)]
+        result["grep"] = latencies(lambda q: list(index.grep(q, tree, recursive=True)), grep_queries)
+        result["grep_walk"] = latencies(lambda q: walk_grep(tree, q), grep_queries[:max(1, args.queries // 10)])
+        index.close()
+        return result
+
+
+def print_table(results: Dict[int, dict]) -> None:
+    rows = [["Files", "Build", "+content", "Index", "+content", "No-op update", "1% update",
+             "find", "find (CLI)", "walk", "grep -r", "read all"]]
+    for files, r in results.items():
+        rows.append([
+            str(files), f"{r['build_s']:.2f}s", f"{r['build_content_s']:.2f}s",
+            f"{r['index_mb']:.1f} MB", f"{r['content_index_mb']:.1f} MB",
+            f"{r['noop_update_s']:.2f}s", f"{r['update_1pct_s']:.2f}s",
+            f"{r['find']['median_ms']:.1f} ms", f"{r['find_cli']['median_ms']:.0f} ms",
+            f"{r['find_walk']['median_ms']:.0f} ms",
+            f"{r['grep']['median_ms']:.1f} ms", f"{r['grep_walk']['median_ms']:.0f} ms",
+        ])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark building and querying the file index.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000], help="number of files per tree")
+    parser.add_argument("--queries", type=int, default=100, help="queries timed per measurement")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the generated trees and queries")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for files in args.sizes:
+        results[files] = run_size(files, args)
+        print(f"{files} files: built in {results[files]['build_s']:.2f}s", file=sys.stderr)
+    print_table(results)
+    if args.json:
+        config = {"sizes": args.sizes, "queries": args.queries, "seed": args.seed}
+        args.json.write_text(json.dumps({"config": config, "results": results}, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
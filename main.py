@@ -1,16 +1,60 @@
-from UI import Handle_Input  
+import sys
+
+# Checked before importing the installer, which needs tomllib and dataclass slots
+MIN_PYTHON = (3, 11)
+if sys.version_info < MIN_PYTHON:
+    sys.exit(f"pwsh-config needs Python {MIN_PYTHON[0]}.{MIN_PYTHON[1]} or newer; "
+             f"this is Python {sys.version.split()[0]} ({sys.executable}).")
+
+import argparse
+from pathlib import Path
+import Provision
+from AppPaths import config_dir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Install and configure the PowerShell environment.")
+    parser.add_argument("--force", action="store_true",
+                        help="run every setup step, even those unchanged since the last run")
+    parser.add_argument("--invalidate", action="append", default=[], metavar="STEP",
+                        help="re-run the named setup step (repeatable), e.g. --invalidate nerd_fonts")
+    parser.add_argument("--timeout", type=float, metavar="SECONDS",
+                        help="give up on a setup run after this many seconds, stopping running installers")
+    parser.add_argument("--trace", nargs="?", const=config_dir() / "traces", type=Path, metavar="DIR",
+                        help="record a JSONL and Chrome trace of each run (default DIR: %(const)s)")
+    parser.add_argument("--mirror", type=Path, metavar="DIR",
+                        help="install packages, wheels and fonts from a mirror made with 'main.py bundle DIR'")
+    parser.add_argument("--file-index", action="store_true",
+                        help="also index the home directory for ff and grep, updated every 30 minutes")
+    return parser.parse_args()
 
 
 def main():
     """
     Main function to run the automatic installation and configuration process.
+    Subcommands (plan, apply, verify, bundle) run headless; without one the interactive menu starts.
     """
-    ui = Handle_Input()  
+    if len(sys.argv) > 1 and sys.argv[1] in Provision.COMMANDS:
+        sys.exit(Provision.main(sys.argv[1:]))
+
+    from UI import Handle_Input
+    args = parse_args()
+    if args.mirror is not None:
+        from Mirror import Mirror, MirrorError
+        try:
+            Mirror(args.mirror).load_lock()
+        except MirrorError as e:
+            sys.exit(str(e))
+    ui = Handle_Input(force=args.force, invalidate=args.invalidate, timeout=args.timeout,
+                      trace_dir=args.trace, mirror=args.mirror, file_index=args.file_index)
     ui.cls()
-    while True:
-        ui.Print_banner()  
-        user_input = ui.Print_options() 
-        ui.Handle(user_input)  
+    try:
+        while True:
+            ui.Print_banner()
+            user_input = ui.Print_options()
+            ui.Handle(user_input)
+    except KeyboardInterrupt:
+        print()
 
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
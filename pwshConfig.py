@@ -1,28 +1,77 @@
+import os
+import sqlite3
 import subprocess
 import sys
-from typing import List
+import threading
+from dataclasses import replace
+from typing import Dict, List, Optional
 from pathlib import Path
 from JsonManager import JsonManager
+from ExecutionPolicy import ExecutionPolicy
+from InstallEngine import INSTALL_POLICY, BatchInstaller, PackageSpec, ParallelInstaller
+from StepScheduler import Step, StepResult, StepScheduler, critical_path
+from CommandRunner import CommandRunner
+from PipInstaller import install_requirements, missing_requirements
+from Inventory import PackageInventory, winget_package_id
+from PowerShellSession import PowerShellSession
+from FontInstaller import NERD_FONTS_URL, NerdFontInstaller
+from AppPaths import cache_dir, config_dir, user_fonts_dir
+from InitCache import InitScriptCache, default_tools, profile_loader
+from StateJournal import StateJournal, file_digest, fingerprint
+from Tracing import summary_table, tracer
+from ThemeAnalyzer import write_tuned
+from ProfileWriter import ProfileWriter
+from ProfileOptimizer import optimize_installed
+from Mirror import Mirror
+import Updater
+import FileIndex
 import shutil
 
+# Header of the lines older versions appended to the profile, before it had managed blocks
+LEGACY_PROFILE_HEADER = "# Added by PowerShell Configuration Script"
+# What the first versions appended under that header: the tools' init, run on every start
+# (the oh-my-posh line was also the cached loaders' fallback before it named the installed config)
+LEGACY_INIT_COMMANDS = [
+    "Invoke-Expression (& { (zoxide init --cmd cd powershell | Out-String) })",
+    "oh-my-posh init pwsh --config '~\\.config\\ohmyposh\\zen.toml' | Invoke-Expression",
+]
+
+# z and zi as the shipped profile used to define them, only once zoxide has initialised
+ZOXIDE_ALIASES = (
+    "if (Get-Command __zoxide_z -ErrorAction SilentlyContinue) { "
+    "Set-Alias -Name z -Value __zoxide_z -Option AllScope -Scope Global -Force; "
+    "Set-Alias -Name zi -Value __zoxide_zi -Option AllScope -Scope Global -Force }"
+)
+
+
 class PowerShellManager:
     @staticmethod
-    def check_powershell_core():
+    def check_powershell_core(inventory: PackageInventory = None):
         """Check if PowerShell Core (pwsh) is available and install if needed."""
         try:
             # First check if pwsh is available in PATH
             if shutil.which('pwsh') is not None:
                 return True
+
+            if inventory is not None and inventory.is_installed("Microsoft.PowerShell"):
+                print("PowerShell Core is installed but not in PATH. Please restart your terminal.")
+                return False
                 
             print("PowerShell Core (pwsh) not found. Checking if it needs to be installed...")
             
             # Try to install PowerShell Core using winget
             install_command = "winget install --id Microsoft.PowerShell --source winget"
             print("Installing PowerShell Core...")
-            result = subprocess.run(install_command, shell=True, capture_output=True, text=True)
+            already_installed = False
+
+            def watch(line: str) -> None:
+                nonlocal already_installed
+                already_installed = already_installed or "already installed" in line
+
+            result = CommandRunner(policy=INSTALL_POLICY).run(install_command, label="PowerShell Core", on_line=watch)
             
             if result.returncode != 0:
-                if "already installed" in result.stdout:
+                if already_installed:
                     print("PowerShell Core is installed but not in PATH. Please restart your terminal.")
                     return False
                 print("Failed to install PowerShell Core. Please install it manually from:")
@@ -40,143 +89,206 @@ class Automatic_installation_And_Config:
     """
     Handles automatic installation and configuration of PowerShell environment.
     """
-    def __init__(self):
+    def __init__(self, max_workers: int = 4, force: bool = False, invalidate: Optional[List[str]] = None,
+                 home: Optional[Path] = None, interactive: bool = True, manifest_path: Optional[str] = None,
+                 timeout: Optional[float] = None, trace_dir: Optional[Path] = None, mirror: Optional[Path] = None,
+                 file_index: bool = False):
         """
         Initialize the installation manager with package commands from JsonManager.
+
+        Args:
+            max_workers (int): Maximum number of package installs run at the same time.
+            force (bool): Run every step even if its inputs are unchanged since the last run.
+            invalidate (Optional[List[str]]): Step names to re-run regardless of their recorded state.
+            home (Optional[Path]): Home directory to configure. Defaults to the current user's.
+            interactive (bool): Wait for a key press after errors so they can be read.
+            manifest_path (Optional[str]): The package manifest to install from. Defaults to
+                the mirror's copy when installing from a mirror, else ./packages.json.
+            timeout (Optional[float]): Deadline in seconds for a whole setup run.
+            trace_dir (Optional[Path]): Write a JSONL and a Chrome trace of each run here.
+            mirror (Optional[Path]): Install packages, wheels and fonts from this mirror
+                (see "main.py bundle") instead of downloading them.
+            file_index (bool): Also index the home directory for ff and grep and schedule
+                updates of the index. Off by default; ff and grep search the disk without it.
+
+        Raises:
+            MirrorError: If mirror has no usable lockfile.
         """
-        self.json_manager = JsonManager()
+        self.home = Path(home) if home else Path.home()
+        self.interactive = interactive
+        self.file_index = file_index
+        self.mirror = Mirror(mirror, cache_dir(self.home) / "mirror") if mirror else None
+        if self.mirror is not None:
+            self.mirror.load_lock()
+        if manifest_path is None:
+            manifest_path = self.mirror.manifest_path if self.mirror else './packages.json'
+        self.json_manager = JsonManager(manifest_path)
+        self.font_source = str(self.mirror.fonts_dir) if self.mirror else NERD_FONTS_URL
+        self.max_workers = max_workers
+        self.necessary_packages = self.json_manager.get_necessary_packages()
         self.necessary_package_commands = self.json_manager.get_necessary_package_commands()
+        # Installed winget packages, listed once on first use and shared by every step
+        self.inventory = PackageInventory()
+        # One pwsh process shared by every step; started on first use
+        self.pwsh = PowerShellSession()
         self.python_package_commands = self.json_manager.get_python_package_commands()
         
         # Set up correct PowerShell Core profile path
-        self.powershell_dir = Path.home() / "Documents" / "PowerShell"
+        self.powershell_dir = self.home / "Documents" / "PowerShell"
         self.profile_path = self.powershell_dir / "Microsoft.PowerShell_profile.ps1"
+        self.profile = ProfileWriter(self.profile_path, config_dir(self.home) / "profile.json")
+        self.oh_my_posh_config_file = self.home / ".config" / "ohmyposh" / "zen.toml"
+        # Same theme as JSON, which oh-my-posh loads on every prompt without a TOML decoder
+        self.oh_my_posh_json_file = self.oh_my_posh_config_file.with_suffix(".json")
+        # %LOCALAPPDATA% only describes the current user's home
+        self.fonts_dir = user_fonts_dir(None if home is None else self.home)
+        self.init_cache = InitScriptCache(cache_dir(self.home) / "init")
+
+        # Input fingerprints of the steps that succeeded on previous runs
+        self.journal = StateJournal(config_dir(self.home) / "state.json")
+        self.force = force
+        self.invalidate = invalidate or []
+        self.timeout = timeout
+        self.trace_dir = trace_dir
+        # Set when a step failed on a worker thread and wanted to wait for a key press
+        self._pause_pending = False
+
+    def pause(self, prompt: str) -> None:
+        """
+        Wait for a key press after an error, unless running non-interactively.
+
+        Steps run on worker threads, where a prompt would block the worker and
+        interleave with other steps' output; there the pause is deferred until
+        run_steps has finished, which then waits once.
+        """
+        if not self.interactive:
+            return
+        if threading.current_thread() is threading.main_thread():
+            input(prompt)
+        else:
+            self._pause_pending = True
+
+    def _check_mirror(self, section: str) -> bool:
+        """
+        Verify the mirrored files of one section against the lockfile before installing them.
+        """
+        if self.mirror is None:
+            return True
+        problems = self.mirror.verify([section])
+        for problem in problems:
+            print(f"Mirror {self.mirror.root}: {problem}")
+        if problems:
+            self.pause("Press any key to continue...")
+        return not problems
 
     def install_nerd_fonts(self) -> bool:
         """
-        Install Nerd Fonts using PowerShell commands.
+        Install Nerd Fonts for the current user.
+
+        Archives are fetched concurrently through a local download cache, and
+        only their font files are extracted; fonts that are already up to date
+        are left alone.
         
         Returns:
             bool: True if installation was successful, False otherwise.
         """
-        try:
-            # Create a PowerShell script to download and install Nerd Fonts
-            install_fonts_command = """
-            $webClient = New-Object System.Net.WebClient
-            $fontsUrl = "https://github.com/ryanoasis/nerd-fonts/releases/download/v3.1.1"
-            $fonts = @("Hack", "HeavyData")
-            
-            foreach ($font in $fonts) {
-                try {
-                    Write-Host "Downloading $font Nerd Font..."
-                    $zipFile = "$env:TEMP\\$font.zip"
-                    $fontUrl = "$fontsUrl/$font.zip"
-                    $webClient.DownloadFile($fontUrl, $zipFile)
-                    
-                    Write-Host "Installing $font Nerd Font..."
-                    Expand-Archive -Path $zipFile -DestinationPath "$env:TEMP\\$font" -Force
-                    
-                    $fontFiles = Get-ChildItem -Path "$env:TEMP\\$font" -Include '*.ttf','*.otf' -Recurse
-                    foreach ($fontFile in $fontFiles) {
-                        $destination = Join-Path $env:LOCALAPPDATA 'Microsoft\\Windows\\Fonts' $fontFile.Name
-                        Copy-Item -Path $fontFile.FullName -Destination $destination -Force
-                        
-                        # Add font to registry
-                        $regValue = Join-Path $env:LOCALAPPDATA "Microsoft\\Windows\\Fonts\\$($fontFile.Name)"
-                        New-ItemProperty -Path "HKCU:\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\Fonts" -Name $fontFile.Name -Value $regValue -Force
-                    }
-                    
-                    Remove-Item -Path $zipFile -Force
-                    Remove-Item -Path "$env:TEMP\\$font" -Recurse -Force
-                    Write-Host "$font Nerd Font installed successfully."
-                }
-                catch {
-                    Write-Error "Failed to install $font Nerd Font: $_"
-                    exit 1
-                }
-            }
-            """
-            
-            # Execute the PowerShell script
-            result = subprocess.run(
-                ['pwsh', '-Command', install_fonts_command],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            print("Nerd Fonts installed successfully.")
-            return True
-            
-        except subprocess.CalledProcessError as e:
-            print(f"Error installing Nerd Fonts: {e}")
-            print(f"Command output: {e.stdout}")
-            print(f"Error output: {e.stderr}")
-            input("Press any key to continue...")
+        if not self._check_mirror("fonts"):
+            return False
+        installer = NerdFontInstaller(
+            self.json_manager.get_nerd_fonts(),
+            cache_dir(self.home) / "fonts",
+            self.fonts_dir,
+            max_workers=self.max_workers,
+            source_dir=self.mirror.fonts_dir if self.mirror else None,
+            policy=ExecutionPolicy(retries=3),
+        )
+        failed = False
+        for result in installer.run():
+            if not result.ok:
+                print(f"Error installing {result.name} Nerd Font: {result.error}")
+                failed = True
+            else:
+                source = "mirror" if self.mirror else "cache" if result.from_cache else "download"
+                print(f"{result.name} Nerd Font: {result.installed} installed, "
+                      f"{result.unchanged} up to date (from {source}).")
+
+        if failed:
+            self.pause("Press any key to continue...")
             return False
+        print("Nerd Fonts installed successfully.")
+        return True
 
     def install_necessary_packages(self) -> bool:
         """
         Install necessary packages using winget commands.
+
+        Plain winget packages are installed by a single "winget import"; the
+        other entries, and packages the import could not install, run their
+        own command, independent ones concurrently on a pool of at most
+        max_workers installs. Installs from a mirror always run per package.
         
         Returns:
             bool: True if installation was successful, False otherwise.
         """
+        if not self._check_mirror("winget"):
+            return False
+        specs = [
+            PackageSpec(name, (self.mirror and self.mirror.winget_command(name)) or command, depends_on,
+                        package_id=winget_package_id(command))
+            for name, command, depends_on in self.necessary_packages
+        ]
+
+        # Local manifests cannot be imported, so a mirror keeps the per-package installs
+        installer_type = ParallelInstaller if self.mirror else BatchInstaller
         try:
-            for command in self.necessary_package_commands:
-                # Skip the Nerd Fonts installation command from winget
-                if "Install-NerdFont.ps1" in command:
-                    continue
-                    
-                result = subprocess.run(command, shell=True, capture_output=True, text=True)
-                print(f"Executed: {command}")
-                print(result.stdout)
-                # Continue even if package is already installed
-                if result.returncode != 0 and ("No available upgrade found" in result.stdout or 
-                                            "already installed" in result.stdout):
-                    continue
-                elif result.returncode != 0:
-                    raise subprocess.CalledProcessError(result.returncode, command)
-            
-            # Install Nerd Fonts separately
-            if not self.install_nerd_fonts():
-                return False
-                
-            print("Necessary packages installed successfully.")
-            return True
-            
-        except subprocess.CalledProcessError as e:
-            print(f"Error installing necessary packages: {e}")
-            print(f"Command output: {e.output}")
-            input("Press any to continue...")
+            results = installer_type(self.max_workers, self.inventory).run(specs)
+        except ValueError as e:
+            print(f"Error in package manifest: {e}")
+            self.pause("Press any to continue...")
+            return False
+
+        failed = [result for result in results.values() if not result.ok]
+        if failed:
+            for result in failed:
+                if result.status == "skipped":
+                    print(f"Skipped {result.name}: a dependency failed to install.")
+                else:
+                    print(f"Error installing {result.name}: exit status {result.returncode} from '{result.command}'")
+                    print(f"Command output: {result.output}")
+            self.pause("Press any to continue...")
             return False
 
+        print("Necessary packages installed successfully.")
+        return True
+
     def install_python_packages(self) -> bool:
         """
-        Install Python packages using pip commands.
+        Install missing Python packages with a single pip invocation.
+
+        Installed distributions are checked in-process first, so packages that
+        already satisfy their requirement are not passed to pip at all.
         
         Returns:
             bool: True if installation was successful, False otherwise.
         """
-        try:
-            for command in self.python_package_commands:
-                result = subprocess.run(command, shell=True, check=True, 
-                                     capture_output=True, text=True)
-                print(f"Executed: {command}")
-                print(result.stdout)
-            print("Python packages installed successfully.")
+        requirements = self.json_manager.get_python_package_requirements()
+        missing = missing_requirements(requirements)
+        if not missing:
+            print("Python packages already installed.")
             return True
-        except ImportError:
-            
-            try:
-                for package_name in self.json_manager.get_python_package_names():
-                    subprocess.check_call([sys.executable, "-m", "pip", "install", package_name])
-                return True
-            
-            except subprocess.CalledProcessError as e:
-                print(f"Error installing Python packages: {e}")
-                print(f"Command output: {e.output}")
-                input("Press any to continue...")
-                return False
+
+        if not self._check_mirror("pip"):
+            return False
+        result = install_requirements(missing, find_links=self.mirror.pip_dir if self.mirror else None)
+        print(f"Executed: pip install {' '.join(missing)}")
+        if result.returncode != 0:
+            print(f"Error installing Python packages: exit status {result.returncode}")
+            print(f"Command output (last {len(result.tail)} of {result.line_count} lines):\n{result.output}")
+            self.pause("Press any to continue...")
+            return False
+
+        print("Python packages installed successfully.")
+        return True
 
     def install_pwsh_profile(self) -> bool:
         """
@@ -186,29 +298,32 @@ class Automatic_installation_And_Config:
             bool: True if profile was created successfully, False otherwise.
         """
         try:
-            # Create PowerShell directory if it doesn't exist
-            self.powershell_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Create profile using PowerShell Core specific path
-            create_profile_command = f"""
-$ProfileDir = Split-Path -Parent $PROFILE
-if (!(Test-Path -Path $ProfileDir)) {{
-    New-Item -ItemType Directory -Path $ProfileDir -Force
-}}
-if (!(Test-Path -Path $PROFILE)) {{
-    New-Item -ItemType File -Path $PROFILE -Force
-}}
-"""
-            result = subprocess.run(['pwsh', '-Command', create_profile_command],
-                                 check=True, capture_output=True, text=True)
-            print("PowerShell profile created successfully.")
+            if self.profile.ensure_exists():
+                print("PowerShell profile created successfully.")
+            else:
+                print("PowerShell profile already exists.")
             return True
-        except subprocess.CalledProcessError as e:
+        except OSError as e:
             print(f"Error creating PowerShell profile: {e}")
-            print(f"Command output: {e.output}")
-            input("Press any to continue...")
+            self.pause("Press any to continue...")
             return False
 
+    def _legacy_init_lines(self) -> List[str]:
+        """
+        Returns every line older versions appended to the profile outside a managed
+        block: the header, the live init commands, and the loaders of the cached
+        init scripts, for the zen.toml and zen.json configs alike.
+        """
+        lines = [LEGACY_PROFILE_HEADER, *LEGACY_INIT_COMMANDS]
+        for config in (self.oh_my_posh_config_file, self.oh_my_posh_json_file):
+            for tool in default_tools(config):
+                script = self.init_cache.script_path(tool)
+                for fallback in (tool.fallback, *LEGACY_INIT_COMMANDS):
+                    if fallback.split()[0] == tool.executable:
+                        lines.append(profile_loader(script, replace(tool, fallback=fallback)))
+                lines.append(tool.fallback)
+        return list(dict.fromkeys(lines))
+
     def configure_pwsh_profile(self) -> bool:
         """
         Configure PowerShell profile with required commands.
@@ -220,43 +335,132 @@ if (!(Test-Path -Path $PROFILE)) {{
             print(f"Error: Profile file not found at {self.profile_path}")
             return False
 
+        # Load the init scripts cached at install time; run the tools only if no cache exists.
+        # The shipped profile leaves both tools to this block, so each initialises once.
+        commands = [
+            profile_loader(self.init_cache.script_path(tool), tool)
+            for tool in default_tools(self.oh_my_posh_json_file)
+        ]
+        commands.append(ZOXIDE_ALIASES)
+        content = "\n".join(commands)
+        replaces = self._legacy_init_lines()
+        if self.profile.is_current("init", content, replaces):
+            print("PowerShell profile already configured.")
+            return True
+
         try:
-            # Read existing profile content
-            existing_content = self.profile_path.read_text()
-            
-            commands = [
-                "Invoke-Expression (& { (zoxide init --cmd cd powershell | Out-String) })",
-                "oh-my-posh init pwsh --config '~\.config\ohmyposh\zen.toml' | Invoke-Expression"
-            ]
-            
-            # Check if all commands are already in the profile
-            all_commands_present = all(command in existing_content for command in commands)
-            
-            if all_commands_present:
-                print("PowerShell profile already configured.")
-                return True
-            
-            # Join commands with newlines
-            commands_text = "\n".join(commands)
-            
-            add_content_command = f'''
-Add-Content -Path $PROFILE -Value @"
+            status = self.profile.ensure_block("init", content, replaces=replaces)
+        except OSError as e:
+            print(f"Error configuring PowerShell profile: {e}")
+            self.pause("Press any to continue...")
+            return False
+        if status == "unchanged":
+            print("PowerShell profile already configured.")
+        else:
+            print(f"PowerShell profile configured successfully ({status} managed block).")
+        return True
 
-# Added by PowerShell Configuration Script
-{commands_text}
-"@
-'''
-            
-            result = subprocess.run(['pwsh', '-Command', add_content_command],
-                                 check=True, capture_output=True, text=True)
-            print("PowerShell profile configured successfully.")
+    def optimize_pwsh_profile(self) -> bool:
+        """
+        Rewrite the installed profile into its lazy-loading form: functions not
+        used at startup move to an autoloaded module and blocking statements run
+        once the shell is idle. Managed blocks are left as they are.
+
+        Returns:
+            bool: True unless the profile or the module could not be written.
+        """
+        try:
+            result = optimize_installed(self.profile, self.home)
+        except OSError as e:
+            print(f"Error optimizing PowerShell profile: {e}")
+            self.pause("Press any key to continue...")
+            return False
+        if result is None:
+            print("PowerShell profile has nothing left to optimize.")
             return True
-        except subprocess.CalledProcessError as e:
-            print(f"Error configuring PowerShell profile: {e}")
-            print(f"Command output: {e.output}")
-            input("Press any to continue...")
+        report = result.report()
+        print(f"PowerShell profile optimized: {len(report['module_functions'])} functions autoloaded, "
+              f"{len(report['deferred'])} statements deferred, ~{result.estimated_savings_ms} ms saved.")
+        return True
+
+    def cache_init_scripts(self) -> bool:
+        """
+        Generate the zoxide and oh-my-posh init scripts the profile dot-sources,
+        so shell startup does not spawn either tool. Scripts are only regenerated
+        when the tool binary, its version or the oh-my-posh config changed.
+
+        Returns:
+            bool: True unless generating a script failed.
+        """
+        try:
+            status = self.init_cache.update(default_tools(self.oh_my_posh_json_file))
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"Error generating init scripts: {e}")
+            self.pause("Press any key to continue...")
             return False
 
+        for tool, state in status.items():
+            if state == "missing":
+                print(f"{tool} not found on PATH; the profile will run '{tool} init' at startup until this step is re-run.")
+            else:
+                print(f"{tool} init script {state}.")
+        return True
+
+    def install_updater(self) -> bool:
+        """
+        Install the background update checker and schedule it, so the profile
+        reads update-status.json at startup instead of querying GitHub.
+
+        Returns:
+            bool: True unless the updater could not be installed.
+        """
+        try:
+            script = Updater.install(self.home)
+        except OSError as e:
+            print(f"Error installing the updater: {e}")
+            self.pause("Press any key to continue...")
+            return False
+
+        scheduled, message = Updater.schedule(script)
+        if scheduled:
+            print(f"Update checks scheduled every {Updater.CHECK_INTERVAL_HOURS} hours.")
+        else:
+            # The profile still starts a check in the background when the status file is missing or stale
+            print(f"Update checks not scheduled: {message}")
+        return True
+
+    def install_file_index(self) -> bool:
+        """
+        Install the file indexer that ff and grep query, index the home
+        directory's file names and schedule updates of the index.
+
+        The index is built by the first scheduled update; until then ff and
+        grep search the disk as before.
+
+        Returns:
+            bool: True unless the indexer could not be installed.
+        """
+        try:
+            script = FileIndex.install(self.home)
+            index = FileIndex.FileIndex(FileIndex.index_path(self.home))
+            try:
+                if index.root_of(self.home) is None:
+                    index.add_root(self.home)
+            finally:
+                index.close()
+        except (OSError, sqlite3.Error, FileIndex.FileIndexError) as e:
+            print(f"Error installing the file index: {e}")
+            self.pause("Press any key to continue...")
+            return False
+
+        scheduled, message = FileIndex.schedule(script)
+        if scheduled:
+            print(f"File index updates scheduled every {FileIndex.UPDATE_INTERVAL_MINUTES} minutes.")
+        else:
+            print(f"File index updates not scheduled: {message}")
+            print(f"Run '{Path(sys.executable).name} {script} update' to build or refresh the index.")
+        return True
+
     def install_oh_my_posh_config(self) -> bool:
         """
         Install Oh My Posh configuration.
@@ -266,9 +470,9 @@ Add-Content -Path $PROFILE -Value @"
         """
         try:
             # Define paths
-            oh_my_posh_config_path = Path.home() / ".config" / "ohmyposh"
+            oh_my_posh_config_path = self.oh_my_posh_config_file.parent
             zen_toml_source = Path.cwd() / "zen.toml"
-            zen_toml_dest = oh_my_posh_config_path / "zen.toml"
+            zen_toml_dest = self.oh_my_posh_config_file
 
             # Create config directory if it doesn't exist
             print(f"Creating Oh-My-Posh configuration directory at: {oh_my_posh_config_path}")
@@ -280,36 +484,36 @@ Add-Content -Path $PROFILE -Value @"
                 print("Please ensure zen.toml is in the same directory as the script.")
                 return False
 
+            # Tune a staged copy: expensive options nothing displays are disabled and slow segments cached
+            staging = cache_dir(self.home) / "theme"
+            staged_toml, staged_json = staging / "zen.toml", staging / "zen.json"
+            report = write_tuned(zen_toml_source, staged_toml, staged_json)
+            print(report.summary())
+
             # Try to copy using Python's Path
             try:
-                print(f"Copying {zen_toml_source} to {zen_toml_dest}")
-                import shutil
-                shutil.copy2(zen_toml_source, zen_toml_dest)
+                print(f"Copying tuned {zen_toml_source.name} to {oh_my_posh_config_path}")
+                shutil.copy2(staged_toml, zen_toml_dest)
+                shutil.copy2(staged_json, self.oh_my_posh_json_file)
             except PermissionError:
                 print("Permission denied. Attempting to copy using PowerShell with elevated privileges...")
                 # Fallback to PowerShell with explicit error handling
                 copy_command = f"""
-                $source = '{zen_toml_source}'
-                $destination = '{zen_toml_dest}'
+                $destination = '{oh_my_posh_config_path}'
                 try {{
-                    Copy-Item -Path $source -Destination $destination -Force -ErrorAction Stop
+                    Copy-Item -Path '{staged_toml}', '{staged_json}' -Destination $destination -Force -ErrorAction Stop
                     Write-Output "File copied successfully using PowerShell"
                 }} catch {{
-                    Write-Error "PowerShell copy failed: $_"
-                    exit 1
+                    throw "PowerShell copy failed: $_"
                 }}
                 """
-                result = subprocess.run(
-                    ['pwsh', '-Command', copy_command],
-                    capture_output=True,
-                    text=True
-                )
+                result = self.pwsh.run(copy_command, label="copy zen.toml")
                 if result.returncode != 0:
                     print(f"PowerShell copy failed with error: {result.stderr}")
                     return False
 
             # Verify the file was copied successfully
-            if zen_toml_dest.exists():
+            if zen_toml_dest.exists() and self.oh_my_posh_json_file.exists():
                 print("Oh My Posh configuration installed successfully.")
                 print(f"Configuration file location: {zen_toml_dest}")
                 return True
@@ -322,36 +526,190 @@ Add-Content -Path $PROFILE -Value @"
             print("Stack trace:")
             import traceback
             print(traceback.format_exc())
-            input("Press any key to continue...")
+            self.pause("Press any key to continue...")
             return False
     
     def setup_environment(self) -> bool:
         """
         Complete setup of the environment by running all installation and configuration steps.
+        Steps whose prerequisites are met run concurrently; if a step fails its dependents
+        are cancelled and the remaining independent steps still run. Steps whose inputs
+        are unchanged since they last succeeded are skipped unless force is set.
         
         Returns:
             bool: True if all steps completed successfully, False otherwise.
         """
-        if not PowerShellManager.check_powershell_core():
+        if not PowerShellManager.check_powershell_core(self.inventory):
             print("\nPlease restart your terminal after PowerShell Core installation and run this script again.")
-            input("Press any key to continue...")
+            self.pause("Press any key to continue...")
             return False
         
+        steps = self.build_steps()
+        try:
+            results = self.run_steps(steps)
+        except ValueError as e:
+            print(e)
+            return False
+
+        path, length = critical_path(steps, results)
+        print(f"\nCritical path ({length:.1f}s): {' -> '.join(path)}")
+        print(f"\nSlowest steps:\n{summary_table(results)}")
+        return all(result.ok for result in results.values())
+
+    def select_steps(self, names: Optional[List[str]] = None) -> List[Step]:
+        """
+        Returns the named steps (all steps when names is None), dropping
+        prerequisites that are not part of the selection.
+
+        Raises:
+            ValueError: If a name is not a known step.
+        """
+        steps = self.build_steps()
+        known = [step.name for step in steps]
+        unknown = set(names or []) - set(known)
+        if unknown:
+            raise ValueError(f"Unknown step(s): {', '.join(sorted(unknown))}. Known steps: {', '.join(known)}")
+        if names is None:
+            return steps
+        selected = [step for step in steps if step.name in names]
+        for step in selected:
+            step.requires = [req for req in step.requires if req in names]
+        return selected
+
+    def run_steps(self, steps: Optional[List[Step]] = None) -> Dict[str, StepResult]:
+        """
+        Run steps through the journal and the scheduler, then end the pwsh session.
+        With a trace_dir, the run is traced and the trace written there.
+
+        Args:
+            steps (Optional[List[Step]]): Steps to run. Defaults to every step.
+
+        Returns:
+            Dict[str, StepResult]: Results keyed by step name.
+
+        Raises:
+            ValueError: If a step to invalidate is unknown.
+        """
+        steps = self.build_steps() if steps is None else steps
+        unknown = set(self.invalidate) - {step.name for step in self.build_steps()}
+        if unknown:
+            raise ValueError(f"Unknown step(s) to invalidate: {', '.join(sorted(unknown))}")
+        if self.invalidate:
+            self.journal.invalidate(self.invalidate)
+
+        if self.trace_dir is not None:
+            tracer.enable()
+        else:
+            tracer.disable()
+        self._pause_pending = False
+        try:
+            with tracer.span("setup", "run"):
+                results = StepScheduler(self.max_workers).run([self._journaled(step) for step in steps],
+                                                              self.timeout)
+        finally:
+            self.pwsh.close()
+            if self.trace_dir is not None:
+                jsonl, chrome = tracer.write(self.trace_dir)
+                print(f"\nTrace written to {jsonl} (open {chrome.name} in https://ui.perfetto.dev)")
+        if self._pause_pending:
+            self._pause_pending = False
+            self.pause("Some steps failed, see above. Press any key to continue...")
+        return results
+
+    def pending_steps(self, steps: Optional[List[Step]] = None) -> List[str]:
+        """
+        Returns the names of steps that would run, i.e. whose inputs changed since they last succeeded.
+        """
+        steps = self.build_steps() if steps is None else steps
+        return [
+            step.name for step in steps
+            if self.force or step.name in self.invalidate or step.inputs is None
+            or not self.journal.is_fresh(step.name, fingerprint(step.inputs()))
+        ]
+
+    def _journaled(self, step: Step) -> Step:
+        """
+        Wrap a step so it is skipped when its inputs match the journal, and its
+        inputs are recorded after it succeeds.
+        """
+        if step.inputs is None:
+            return step
+
+        def run() -> bool:
+            if not self.force and self.journal.is_fresh(step.name, fingerprint(step.inputs())):
+                print(f"Unchanged since last run: {step.description}")
+                tracer.annotate(skipped=True)
+                return True
+            if not step.func():
+                return False
+            # Recorded after the step, since steps such as profile configuration change their own inputs
+            self.journal.record(step.name, fingerprint(step.inputs()))
+            return True
+
+        return Step(step.name, step.description, run, step.requires, step.inputs, step.policy)
+
+    @staticmethod
+    def _tool_state(names: List[str]) -> dict:
+        """
+        Describe where each tool resolves on PATH and when that binary last changed.
+        """
+        state = {}
+        for name in names:
+            path = shutil.which(name)
+            state[name] = (path, os.stat(path).st_mtime_ns) if path else None
+        return state
+
+    def build_steps(self) -> List[Step]:
+        """
+        Declare the setup steps, the prerequisites between them and the inputs
+        that decide whether a step needs to run again.
+
+        Returns:
+            List[Step]: The step graph run by setup_environment.
+        """
+        zen_toml_source = Path.cwd() / "zen.toml"
+        tools = [name for name, _, _ in self.necessary_packages]
+        # Bounds for steps that are not made of retried commands; package installs time out per command
+        quick = ExecutionPolicy(timeout=2 * 60)
         steps = [
-            (self.install_python_packages, "Installing Python packages"),
-            (self.install_necessary_packages, "Installing necessary packages"),
-            (self.install_pwsh_profile, "Creating PowerShell profile"),
-            (self.configure_pwsh_profile, "Configuring PowerShell profile"),
-            (self.install_oh_my_posh_config, "Installing Oh My Posh configuration")
+            Step("python_packages", "Installing Python packages", self.install_python_packages,
+                 inputs=lambda: [sys.executable, self.json_manager.get_python_package_requirements()]),
+            Step("necessary_packages", "Installing necessary packages", self.install_necessary_packages,
+                 inputs=lambda: [self.necessary_packages, self._tool_state(tools)]),
+            Step("nerd_fonts", "Installing Nerd Fonts", self.install_nerd_fonts,
+                 inputs=lambda: [self.font_source, self.json_manager.get_nerd_fonts(),
+                                 sorted(p.name for p in self.fonts_dir.glob("*"))],
+                 policy=ExecutionPolicy(timeout=20 * 60)),
+            Step("pwsh_profile", "Creating PowerShell profile", self.install_pwsh_profile,
+                 inputs=lambda: [str(self.profile_path), self.profile_path.exists()], policy=quick),
+            Step("configure_profile", "Configuring PowerShell profile", self.configure_pwsh_profile,
+                 requires=["pwsh_profile"],
+                 inputs=lambda: [self.profile.stat(), str(self.init_cache.root)], policy=quick),
+            Step("optimize_profile", "Optimizing PowerShell profile startup", self.optimize_pwsh_profile,
+                 requires=["configure_profile"],
+                 inputs=lambda: [self.profile.stat(), file_digest(Path(__file__).with_name("ProfileOptimizer.py"))],
+                 policy=quick),
+            Step("oh_my_posh_config", "Installing Oh My Posh configuration", self.install_oh_my_posh_config,
+                 inputs=lambda: [file_digest(zen_toml_source), file_digest(self.oh_my_posh_config_file),
+                                 file_digest(self.oh_my_posh_json_file)],
+                 policy=quick),
+            Step("init_scripts", "Caching zoxide and Oh My Posh init scripts", self.cache_init_scripts,
+                 requires=["necessary_packages", "oh_my_posh_config"],
+                 inputs=lambda: [self._tool_state(["zoxide", "oh-my-posh"]),
+                                 file_digest(self.oh_my_posh_json_file),
+                                 file_digest(self.init_cache.fingerprint_path)],
+                 policy=quick),
+            Step("updater", "Scheduling background update checks", self.install_updater,
+                 inputs=lambda: [sys.executable, file_digest(config_dir(self.home) / "updater" / "Updater.py"),
+                                 *(file_digest(Path(__file__).with_name(name)) for name in Updater.UPDATER_FILES)],
+                 policy=quick),
         ]
-        
-        success = True
-        for step_func, step_name in steps:
-            print(f"\nStarting: {step_name}...")
-            if not step_func():
-                print(f"Failed: {step_name}")
-                success = False
-                break
-            print(f"Completed: {step_name}")
-            
-        return success
\ No newline at end of file
+        if self.file_index:
+            # Opt-in: it indexes the whole home directory and runs every 30 minutes
+            steps.append(Step("file_index", "Scheduling file index updates for ff and grep", self.install_file_index,
+                              inputs=lambda: [sys.executable,
+                                              file_digest(config_dir(self.home) / "file-index" / "FileIndex.py"),
+                                              *(file_digest(Path(__file__).with_name(name))
+                                                for name in FileIndex.FILE_INDEX_FILES)],
+                              policy=quick))
+        return steps
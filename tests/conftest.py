@@ -0,0 +1,92 @@
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch) -> Path:
+    """
+    A fresh home directory, so caches and state files stay out of the real one.
+    """
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("USERPROFILE", str(home))
+    return home
+
+
+class StubServer:
+    """
+    A local HTTP server for download tests.
+
+    files maps a path to its body and validators; requests to other paths get
+    a 404, and errors maps a path to the status it fails with. Conditional
+    requests are answered with 304 when a validator matches. requests records
+    the path and headers of every request.
+    """
+    def __init__(self):
+        self.files: Dict[str, Tuple[bytes, Optional[str], Optional[str]]] = {}
+        self.errors: Dict[str, int] = {}
+        self.requests: List[Tuple[str, dict]] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                if self.path in server.errors:
+                    self.send_error(server.errors[self.path])
+                    return
+                if self.path not in server.files:
+                    self.send_error(404)
+                    return
+                body, etag, last_modified = server.files[self.path]
+                if (etag and self.headers.get("If-None-Match") == etag) or \
+                        (last_modified and self.headers.get("If-Modified-Since") == last_modified):
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                if last_modified:
+                    self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def serve(self, path: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None) -> str:
+        self.files[path] = (body, etag, last_modified)
+        return self.base_url + path
+
+    def stop(self) -> None:
+        """
+        Shut the server down, so further requests fail as they would offline.
+        """
+        if self._thread.is_alive():
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+
+
+@pytest.fixture
+def http_server(monkeypatch):
+    for name in ("HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "http_proxy", "https_proxy", "all_proxy"):
+        monkeypatch.delenv(name, raising=False)
+    server = StubServer()
+    yield server
+    server.stop()
@@ -0,0 +1,53 @@
+"""
+Stands in for pwsh running PowerShellSession's host loop.
+
+Speaks the same framed protocol on stdin and stdout, but the "scripts" are
+lines of a tiny command language:
+
+    echo <text>     write text to stdout
+    error <text>    write text to stderr and fail with exit status 1
+    status <n>      set the exit status, like $LASTEXITCODE
+    pid             write this process's ID to stdout
+    noise           print a stray line that is not a response
+    sleep <s>       wait s seconds
+    crash <n>       write to stderr and exit the process with status n
+"""
+import base64
+import os
+import sys
+import time
+
+
+def run(script: str):
+    out, err, status = [], [], 0
+    for line in script.splitlines():
+        command, _, arg = line.partition(" ")
+        if command == "echo":
+            out.append(arg)
+        elif command == "error":
+            err.append(arg)
+            status = 1
+        elif command == "status":
+            status = int(arg)
+        elif command == "pid":
+            out.append(str(os.getpid()))
+        elif command == "noise":
+            print("WARNING: stray\toutput", flush=True)
+        elif command == "sleep":
+            time.sleep(float(arg))
+        elif command == "crash":
+            print("fatal: host crashed", file=sys.stderr, flush=True)
+            sys.exit(int(arg))
+    return status, "\n".join(out), "\n".join(err)
+
+
+def main() -> None:
+    for line in sys.stdin:
+        request_id, payload = line.rstrip("\n").split("\t", 1)
+        status, out, err = run(base64.b64decode(payload).decode("utf-8"))
+        encoded = [base64.b64encode(text.encode("utf-8")).decode("ascii") for text in (out, err)]
+        print(f"{request_id}\t{status}\t{encoded[0]}\t{encoded[1]}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
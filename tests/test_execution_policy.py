@@ -0,0 +1,145 @@
+import os
+import sys
+import textwrap
+import threading
+import time
+import urllib.error
+
+import pytest
+
+from CommandRunner import CommandRunner
+from ExecutionPolicy import CancelScope, CommandCancelled, ExecutionPolicy
+
+
+def python(source: str) -> list:
+    return [sys.executable, "-c", textwrap.dedent(source)]
+
+
+def is_running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Killed orphans may linger as zombies until something reaps them
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def exits_soon(pid: int, seconds: float = 5) -> bool:
+    # A killed process closes its files a moment before it is marked as exited
+    deadline = time.monotonic() + seconds
+    while is_running(pid):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_backoff_doubles_up_to_the_limit():
+    policy = ExecutionPolicy(backoff=2, max_backoff=5)
+
+    assert [policy.delay(attempt) for attempt in (1, 2, 3, 4)] == [2, 4, 5, 5]
+
+
+def test_transient_errors():
+    policy = ExecutionPolicy()
+
+    assert policy.is_transient_line("Error 0x80072EE2: The operation timed out")
+    assert not policy.is_transient_line("Installer failed with exit code: 1603")
+    assert policy.is_transient_error(ConnectionResetError())
+    assert policy.is_transient_error(urllib.error.HTTPError("https://example.invalid", 503, "", {}, None))
+    assert not policy.is_transient_error(urllib.error.HTTPError("https://example.invalid", 404, "", {}, None))
+
+
+def test_child_deadline_never_outlives_its_parent():
+    with CancelScope(0.2) as parent:
+        child = CancelScope(60, parent=parent)
+        assert child.remaining() <= 0.2
+        time.sleep(0.3)
+        with pytest.raises(CommandCancelled, match="deadline exceeded"):
+            child.check()
+
+
+def test_cancelling_a_scope_cancels_its_children_and_wakes_sleepers():
+    parent = CancelScope()
+    child = CancelScope(parent=parent)
+    threading.Timer(0.1, parent.cancel, args=("interrupted",)).start()
+
+    started = time.monotonic()
+    assert not child.sleep(30)
+    assert time.monotonic() - started < 5
+    assert child.reason == "interrupted"
+
+
+def test_a_command_that_hangs_is_timed_out():
+    runner = CommandRunner(policy=ExecutionPolicy(timeout=0.5))
+
+    result = runner.run(python("import time; time.sleep(30)"), label="hang")
+
+    assert result.timed_out
+    assert not result.ok
+    assert result.duration < 10
+    assert result.tail[-1].startswith("Timed out after")
+
+
+def test_a_timeout_kills_the_whole_process_tree(tmp_path):
+    pid_file = tmp_path / "grandchild.pid"
+    command = python(f"""
+        import subprocess, sys, time
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        open({str(pid_file)!r}, "w").write(str(child.pid))
+        time.sleep(30)
+    """)
+
+    result = CommandRunner(policy=ExecutionPolicy(timeout=1)).run(command, label="tree")
+
+    assert result.timed_out
+    # The grandchild holds the output pipe open, so the run only ends this soon if it was killed too
+    assert result.duration < 10
+    if os.path.isdir("/proc"):
+        assert exits_soon(int(pid_file.read_text()))
+
+
+def test_transient_failures_are_retried(tmp_path):
+    counter = tmp_path / "attempts"
+    command = python(f"""
+        import pathlib, sys
+        counter = pathlib.Path({str(counter)!r})
+        attempt = int(counter.read_text()) + 1 if counter.exists() else 1
+        counter.write_text(str(attempt))
+        if attempt < 3:
+            print("Error: connection reset by peer")
+            sys.exit(1)
+        print("done")
+    """)
+
+    result = CommandRunner(policy=ExecutionPolicy(retries=2, backoff=0.01)).run(command, label="flaky")
+
+    assert result.ok
+    assert result.attempts == 3
+    assert result.tail == ["done"]
+
+
+def test_other_failures_are_not_retried():
+    result = CommandRunner(policy=ExecutionPolicy(retries=2, backoff=0.01)).run(
+        python("import sys; print('Installer failed'); sys.exit(2)"), label="broken")
+
+    assert (result.returncode, result.attempts) == (2, 1)
+
+
+def test_timeouts_are_retried_only_when_asked():
+    policy = ExecutionPolicy(timeout=0.3, retries=1, backoff=0.01)
+    command = python("import time; time.sleep(30)")
+
+    assert CommandRunner(policy=policy).run(command).attempts == 1
+    policy.retry_timeouts = True
+    assert CommandRunner(policy=policy).run(command).attempts == 2
+
+
+def test_cancelling_the_scope_stops_the_command():
+    with CancelScope() as scope:
+        threading.Timer(0.3, scope.cancel).start()
+        started = time.monotonic()
+        with pytest.raises(CommandCancelled):
+            CommandRunner().run(python("import time; time.sleep(30)"), label="cancelled")
+
+    assert time.monotonic() - started < 10
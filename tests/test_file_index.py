@@ -0,0 +1,23 @@
+from FileIndex import NOT_INDEXED, FileIndex, main
+
+
+def test_find_sees_files_created_after_the_last_update(tmp_path, capsys):
+    tree, db = tmp_path / "tree", tmp_path / "index.db"
+    (tree / "sub").mkdir(parents=True)
+    (tree / "sub" / "old_notes.txt").write_text("")
+    index = FileIndex(db)
+    index.add_root(tree)
+    index.update()
+    index.close()
+
+    (tree / "new_notes.txt").write_text("")
+    assert main(["--db", str(db), "find", "notes", "--under", str(tree)]) == 0
+
+    assert capsys.readouterr().out.split() == [str(tree / "new_notes.txt"), str(tree / "sub" / "old_notes.txt")]
+
+
+def test_find_outside_the_index_is_left_to_the_caller(tmp_path):
+    db = tmp_path / "index.db"
+    FileIndex(db).close()
+
+    assert main(["--db", str(db), "find", "notes", "--under", str(tmp_path)]) == NOT_INDEXED
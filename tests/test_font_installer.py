@@ -0,0 +1,109 @@
+import io
+import urllib.error
+import zipfile
+
+import pytest
+
+from FontInstaller import DownloadCache, NerdFontInstaller, extract_fonts
+
+LAST_MODIFIED = "Wed, 06 Dec 2023 10:00:00 GMT"
+
+
+def font_zip(**members: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name.replace("__", "/"), data)
+    return buffer.getvalue()
+
+
+HACK = font_zip(**{"HackNerdFont-Regular.ttf": b"regular" * 100, "HackNerdFont-Bold.ttf": b"bold" * 100,
+                   "README.md": b"# Hack", "LICENSE.md": b"MIT", "extras__HackNerdFontMono-Regular.otf": b"mono"})
+
+
+def test_a_304_reuses_the_cached_blob(tmp_path, http_server):
+    url = http_server.serve("/Hack.zip", HACK, etag='"v1"')
+    cache = DownloadCache(tmp_path / "cache")
+
+    blob, from_cache = cache.fetch(url)
+    again, from_cache_again = DownloadCache(tmp_path / "cache").fetch(url)
+
+    assert (from_cache, from_cache_again) == (False, True)
+    assert again == blob
+    assert blob.read_bytes() == HACK
+    assert len(list((tmp_path / "cache" / "blobs").iterdir())) == 1
+
+
+def test_validators_are_sent_back(tmp_path, http_server):
+    url = http_server.serve("/Hack.zip", HACK, etag='"v1"', last_modified=LAST_MODIFIED)
+    cache = DownloadCache(tmp_path / "cache")
+
+    cache.fetch(url)
+    cache.fetch(url)
+
+    first, second = (headers for _, headers in http_server.requests)
+    assert "If-None-Match" not in first
+    assert second["If-None-Match"] == '"v1"'
+    assert second["If-Modified-Since"] == LAST_MODIFIED
+
+
+def test_a_changed_archive_is_downloaded_again(tmp_path, http_server):
+    url = http_server.serve("/Hack.zip", HACK, etag='"v1"')
+    cache = DownloadCache(tmp_path / "cache")
+    cache.fetch(url)
+
+    http_server.serve("/Hack.zip", HACK + b"\0", etag='"v2"')
+    blob, from_cache = cache.fetch(url)
+
+    assert not from_cache
+    assert blob.read_bytes() == HACK + b"\0"
+
+
+def test_the_cache_is_used_when_offline(tmp_path, http_server):
+    url = http_server.serve("/Hack.zip", HACK, etag='"v1"')
+    cache = DownloadCache(tmp_path / "cache", timeout=5)
+    blob, _ = cache.fetch(url)
+
+    http_server.stop()
+
+    assert cache.fetch(url) == (blob, True)
+    with pytest.raises(urllib.error.URLError):
+        cache.fetch(url.replace("Hack", "Meslo"))
+
+
+def test_only_font_members_are_extracted(tmp_path):
+    archive = tmp_path / "Hack.zip"
+    archive.write_bytes(HACK)
+
+    assert extract_fonts(archive, tmp_path / "fonts") == (3, 0)
+    assert sorted(path.name for path in (tmp_path / "fonts").iterdir()) == \
+        ["HackNerdFont-Bold.ttf", "HackNerdFont-Regular.ttf", "HackNerdFontMono-Regular.otf"]
+
+
+def test_installed_fonts_that_are_unchanged_are_skipped(tmp_path, http_server):
+    http_server.serve("/Hack.zip", HACK, etag='"v1"')
+    fonts = tmp_path / "fonts"
+
+    def install():
+        installer = NerdFontInstaller(["Hack"], tmp_path / "cache", fonts, base_url=http_server.base_url)
+        return installer.run()[0]
+
+    first = install()
+    (fonts / "HackNerdFont-Bold.ttf").write_bytes(b"damaged")
+    second = install()
+
+    assert (first.ok, first.installed, first.unchanged, first.from_cache) == (True, 3, 0, False)
+    assert (second.ok, second.installed, second.unchanged, second.from_cache) == (True, 1, 2, True)
+    assert (fonts / "HackNerdFont-Bold.ttf").read_bytes() == b"bold" * 100
+
+
+def test_fonts_from_a_mirror_are_not_downloaded(tmp_path, http_server):
+    (tmp_path / "mirror").mkdir()
+    (tmp_path / "mirror" / "Hack.zip").write_bytes(HACK)
+
+    results = NerdFontInstaller(["Hack", "Meslo"], tmp_path / "cache", tmp_path / "fonts",
+                                base_url=http_server.base_url, source_dir=tmp_path / "mirror").run()
+
+    assert [(result.name, result.installed, result.ok) for result in results] == \
+        [("Hack", 3, True), ("Meslo", 0, False)]
+    assert http_server.requests == []
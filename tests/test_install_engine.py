@@ -0,0 +1,122 @@
+import json
+from typing import Callable, Dict, List, Optional
+
+from CommandRunner import CommandResult, ProgressDisplay
+from InstallEngine import BatchInstaller, PackageSpec
+from Inventory import InstalledPackage, PackageInventory
+
+
+class ScriptedRunner:
+    """
+    Stands in for CommandRunner: "winget import" prints winget's report for
+    each package in the document, other commands exit with a fixed status.
+    """
+    def __init__(self, import_outcomes: Dict[str, str], exit_codes: Dict[str, int]):
+        self.display = ProgressDisplay()
+        self.import_outcomes = import_outcomes
+        self.exit_codes = exit_codes
+        self.imports: List[List[str]] = []
+        self.commands: List[str] = []
+
+    def run(self, command, label: Optional[str] = None, on_line: Optional[Callable[[str], None]] = None,
+            policy=None) -> CommandResult:
+        if isinstance(command, list):
+            with open(command[command.index("--import-file") + 1], encoding="utf-8") as f:
+                document = json.load(f)
+            ids = [p["PackageIdentifier"] for source in document["Sources"] for p in source["Packages"]]
+            self.imports.append(ids)
+            for package_id in ids:
+                on_line(f"Found {package_id} [{package_id}] Version 1.0")
+                on_line("Successfully installed" if self.import_outcomes.get(package_id) != "failed"
+                        else "Installer failed with exit code: 1603")
+            return CommandResult(command, 0, [], 0, 0.0)
+        self.commands.append(command)
+        return CommandResult(command, self.exit_codes.get(command, 0), [], 0, 0.0)
+
+
+def spec(name: str, *depends_on: str) -> PackageSpec:
+    return PackageSpec(name, f"winget install --id Test.{name} -e", list(depends_on))
+
+
+def test_dependents_are_imported_after_their_dependencies():
+    runner = ScriptedRunner({}, {})
+    results = BatchInstaller(runner=runner).run([spec("app", "runtime"), spec("runtime"), spec("tool")])
+
+    assert runner.imports == [["Test.runtime", "Test.tool"], ["Test.app"]]
+    assert runner.commands == []
+    assert all(result.status == "installed" for result in results.values())
+
+
+def test_dependents_of_a_failed_import_are_not_imported():
+    runner = ScriptedRunner({"Test.runtime": "failed"}, {"winget install --id Test.runtime -e": 1})
+    results = BatchInstaller(runner=runner).run([spec("runtime"), spec("app", "runtime"), spec("tool")])
+
+    assert runner.imports == [["Test.runtime", "Test.tool"]]
+    # The fallback retries the dependency on its own and never reaches the dependent
+    assert runner.commands == ["winget install --id Test.runtime -e"]
+    assert {name: result.status for name, result in results.items()} == \
+        {"runtime": "failed", "app": "skipped", "tool": "installed"}
+
+
+def test_dependents_follow_a_dependency_that_succeeds_on_its_own():
+    runner = ScriptedRunner({"Test.runtime": "failed"}, {})
+    results = BatchInstaller(runner=runner).run([spec("runtime"), spec("app", "runtime")])
+
+    assert runner.commands == ["winget install --id Test.runtime -e", "winget install --id Test.app -e"]
+    assert results["app"].status == "installed"
+
+
+class ListedInventory(PackageInventory):
+    """
+    A PackageInventory whose "winget list" shows the given IDs at the time it is loaded.
+    """
+    def __init__(self, installed: List[str]):
+        super().__init__()
+        self.installed = installed
+        self.loads = 0
+
+    def _load(self) -> None:
+        self.loads += 1
+        self._index([InstalledPackage(package_id, package_id) for package_id in self.installed])
+
+
+class LocalizedRunner(ScriptedRunner):
+    """
+    Prints the import report in German, which ImportOutputParser cannot follow.
+    """
+    def __init__(self, installed: List[str], failing: List[str]):
+        super().__init__({}, {})
+        self.installed = installed
+        self.failing = failing
+
+    def run(self, command, label=None, on_line=None, policy=None) -> CommandResult:
+        if not isinstance(command, list):
+            return super().run(command, label, on_line, policy)
+        with open(command[command.index("--import-file") + 1], encoding="utf-8") as f:
+            document = json.load(f)
+        ids = [p["PackageIdentifier"] for source in document["Sources"] for p in source["Packages"]]
+        self.imports.append(ids)
+        for package_id in ids:
+            on_line(f"{package_id} [{package_id}] Version 1.0 gefunden")
+            if package_id in self.failing:
+                on_line("Installationsprogramm ist mit Exitcode 1603 fehlgeschlagen")
+            else:
+                on_line("Erfolgreich installiert")
+                self.installed.append(package_id)
+        return CommandResult(command, 0, [], 0, 0.0)
+
+
+def test_unparsed_import_output_is_confirmed_by_the_inventory():
+    installed: List[str] = []
+    inventory = ListedInventory(installed)
+    runner = LocalizedRunner(installed, failing=["Test.broken"])
+
+    results = BatchInstaller(inventory=inventory, runner=runner).run([spec("tool"), spec("broken")])
+
+    assert runner.imports == [["Test.tool", "Test.broken"]]
+    # Listed once before the import and once after it
+    assert inventory.loads == 2
+    assert results["tool"].status == "installed"
+    # Not listed after the import, so it is installed on its own
+    assert runner.commands == ["winget install --id Test.broken -e"]
+    assert results["broken"].status == "installed"
@@ -0,0 +1,140 @@
+import json
+import os
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from CommandRunner import CommandRunner
+from ExecutionPolicy import CancelScope, CommandCancelled, ExecutionPolicy
+from Inventory import InstalledPackage, PackageInventory, parse_winget_export, parse_winget_list, winget_package_id
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def winget_list() -> list:
+    return parse_winget_list((FIXTURES / "winget-list.txt").read_text(encoding="utf-8").splitlines())
+
+
+def test_list_rows_are_cut_at_the_header_columns():
+    packages = {package.package_id: package for package in winget_list()}
+
+    assert len(packages) == 9
+    assert packages["Microsoft.PowerShell"] == \
+        InstalledPackage("PowerShell 7.4.2.0-x64", "Microsoft.PowerShell", "7.4.2.0", "winget")
+    # Rows of packages installed outside winget have no Source column
+    assert packages["Microsoft.Edge"] == InstalledPackage("Microsoft Edge", "Microsoft.Edge", "125.0.2535.85", "")
+
+
+def test_wide_characters_do_not_shift_the_columns():
+    packages = {package.package_id: package for package in winget_list()}
+
+    assert packages["Tencent.WeChat"] == InstalledPackage("微信", "Tencent.WeChat", "3.9.10.27", "winget")
+
+
+def test_truncated_cells_keep_their_ellipsis():
+    packages = {package.version: package for package in winget_list()}
+
+    assert packages["17.10.1"].package_id == "Microsoft.VisualStudio.2022.BuildToo…"
+    assert packages["14.38.33135.0"].name == "Microsoft Visual C++ 2015-202…"
+
+
+def test_truncated_ids_match_by_prefix():
+    inventory = PackageInventory(winget_list())
+
+    assert inventory.find("microsoft.visualstudio.2022.buildtools").version == "17.10.1"
+    assert inventory.is_installed("{0E6F3F86-0D27-4C6A-9A2B-7F6C2B5AFD3C}")
+    assert not inventory.is_installed("Microsoft.VisualStudio.2022.Community")
+
+
+def test_lookup_by_id_or_display_name():
+    inventory = PackageInventory(winget_list())
+
+    assert inventory.find("git.git").name == "Git"
+    assert inventory.find("Windows Terminal").package_id == "Microsoft.WindowsTerminal"
+    assert inventory.find("Git") is not None
+    assert inventory.find("Mercurial.Mercurial") is None
+
+
+def test_export_lists_every_source():
+    data = json.loads((FIXTURES / "winget-export.json").read_text(encoding="utf-8"))
+
+    assert parse_winget_export(data) == [
+        InstalledPackage("Git.Git", "Git.Git", "2.45.1", "winget"),
+        InstalledPackage("Microsoft.PowerShell", "Microsoft.PowerShell", "7.4.2.0", "winget"),
+        InstalledPackage("Microsoft.VisualStudio.2022.BuildTools", "Microsoft.VisualStudio.2022.BuildTools", "",
+                         "winget"),
+        InstalledPackage("9NBLGGH4NNS1", "9NBLGGH4NNS1", "", "msstore"),
+    ]
+
+
+def test_package_id_skips_option_values():
+    assert winget_package_id("winget install --id JanDeDobbeleer.OhMyPosh -s winget") == "JanDeDobbeleer.OhMyPosh"
+    assert winget_package_id("winget install -s winget fzf") == "fzf"
+    assert winget_package_id("pip install requests") is None
+
+
+@pytest.fixture
+def fake_winget(tmp_path, monkeypatch):
+    """
+    Puts a "winget" on PATH that runs the given Python source with the arguments it was called with.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    def install(source: str) -> Path:
+        script = bin_dir / "winget"
+        script.write_text(f"#!{sys.executable}\n{textwrap.dedent(source)}", encoding="utf-8")
+        script.chmod(0o755)
+        return script
+    return install
+
+
+posix_only = pytest.mark.skipif(sys.platform == "win32", reason="runs a script named winget from PATH")
+
+
+@posix_only
+def test_the_listing_is_retried_after_a_transient_failure(tmp_path, fake_winget):
+    fake_winget(f"""
+        import pathlib, sys
+        marker = pathlib.Path({str(tmp_path / "attempted")!r})
+        if not marker.exists():
+            marker.touch()
+            print("Name  Id")
+            print("Failed when searching source: winget")
+            sys.exit(1)
+        sys.stdout.write(pathlib.Path({str(FIXTURES / "winget-list.txt")!r}).read_text(encoding="utf-8"))
+    """)
+    inventory = PackageInventory(runner=CommandRunner(policy=ExecutionPolicy(timeout=30, retries=1, backoff=0)))
+
+    assert len(inventory.packages()) == 9
+    assert inventory.is_installed("Microsoft.PowerShell")
+
+
+@posix_only
+def test_a_hung_listing_times_out_as_not_installed(fake_winget):
+    fake_winget("""
+        import time
+        time.sleep(30)
+    """)
+    started = time.monotonic()
+
+    assert not PackageInventory(timeout=0.5).is_installed("Microsoft.PowerShell")
+    assert time.monotonic() - started < 10
+
+
+@posix_only
+def test_the_listing_is_cancelled_with_its_scope(fake_winget):
+    fake_winget("""
+        import time
+        time.sleep(30)
+    """)
+    scope = CancelScope()
+    threading.Timer(0.2, scope.cancel).start()
+
+    with scope, pytest.raises(CommandCancelled):
+        PackageInventory().packages()
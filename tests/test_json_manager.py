@@ -0,0 +1,90 @@
+import json
+import runpy
+import sys
+from pathlib import Path
+
+import pytest
+
+from JsonManager import JsonManager, ManifestError
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def write_manifest(tmp_path, data: dict):
+    path = tmp_path / "packages.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return path
+
+
+def test_cp1252_manifests_are_read(tmp_path):
+    path = tmp_path / "packages.json"
+    path.write_bytes('{"Necessary_packages": {"caf\xe9": "winget install Caf\xe9.App"}}'.encode("cp1252"))
+
+    assert JsonManager._read_json(path) == {"Necessary_packages": {"café": "winget install Café.App"}}
+
+
+def test_undecodable_manifests_raise_manifest_error(tmp_path):
+    path = tmp_path / "packages.json"
+    # 0x81 is neither UTF-8 here nor defined in cp1252
+    path.write_bytes(b'{"Nerd_fonts": ["\x81"]}')
+
+    with pytest.raises(ManifestError, match=str(path).replace("\\", "\\\\")):
+        JsonManager._read_json(path)
+
+
+def test_undecodable_manifests_leave_an_empty_manifest(tmp_path, capsys):
+    path = tmp_path / "packages.json"
+    path.write_bytes(b'{"Nerd_fonts": ["\x9d"]}')
+
+    manager = JsonManager(str(path), use_cache=False)
+
+    assert manager.applications_data == {}
+    assert "not valid UTF-8 or cp1252" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("command, requirements", [
+    ("pip install requests>=2.31 rich", ["requests>=2.31", "rich"]),
+    ("pip install --upgrade requests", ["requests"]),
+    ("pip install --index-url https://pypi.example/simple requests", ["requests"]),
+    ("pip install --index-url=https://pypi.example/simple requests", ["requests"]),
+    ("python -m pip install -c constraints.txt -r extra.txt rich", ["rich"]),
+    ("pip install -t vendor --no-binary :all: six", ["six"]),
+    ("pip uninstall requests", []),
+])
+def test_requirements_skip_option_values(command, requirements):
+    assert JsonManager._requirements_from_command(command) == requirements
+
+
+def test_requirements_of_py_packages(tmp_path):
+    path = write_manifest(tmp_path, {"Py_packages": {
+        "requests": "pip install --extra-index-url https://mirror.example/simple requests==2.31.0",
+        "rich": {"requirement": "rich>=13"},
+    }})
+
+    assert JsonManager(str(path), use_cache=False).get_python_package_requirements() == \
+        ["requests==2.31.0", "rich>=13"]
+
+
+@pytest.mark.parametrize("cache", [
+    b"not a pickle",
+    # A class this module no longer has, as after renaming PackageRecord
+    b"cJsonManager\nPackageRecordV0\n.",
+    # A module that is not installed
+    b"cmissing_module\nRecord\n.",
+    # A protocol newer than this Python supports
+    b"\x80\x63",
+])
+def test_unreadable_caches_are_rebuilt(tmp_path, home, cache):
+    path = write_manifest(tmp_path, {"Nerd_fonts": ["Hack"]})
+    cache_path = JsonManager(str(path))._cache_path()
+    cache_path.write_bytes(cache)
+
+    assert JsonManager(str(path)).get_nerd_fonts() == ["Hack"]
+    assert cache_path.read_bytes() != cache
+
+
+def test_old_pythons_exit_with_a_message(monkeypatch):
+    monkeypatch.setattr(sys, "version_info", (3, 10, 13, "final", 0))
+
+    with pytest.raises(SystemExit, match="needs Python 3.11 or newer"):
+        runpy.run_path(str(REPO_ROOT / "main.py"))
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from CommandRunner import CommandResult, ProgressDisplay
+from JsonManager import JsonManager
+from Mirror import LOCK_NAME, Mirror, MirrorError, localize_manifest
+
+FAKE_BACKEND = Path(__file__).resolve().parent.parent / "benchmarks" / "FakeBackend.py"
+
+
+class DownloadRunner:
+    """
+    Stands in for CommandRunner: "winget download" writes an installer and a manifest.
+    """
+    def __init__(self):
+        self.display = ProgressDisplay()
+        self.downloaded = []
+
+    def run(self, command, label=None, on_line=None, policy=None) -> CommandResult:
+        name = label.split(" ", 1)[1]
+        directory = Path(command[command.index("--download-directory") + 1])
+        installer = f"installer of {name}".encode()
+        (directory / f"{name}.exe").write_bytes(installer)
+        # Like winget's, the manifest still names the upstream installer
+        (directory / f"{name}.installer.yaml").write_text(
+            f"PackageIdentifier: {command[2]}\nPackageVersion: 1.0\nInstallers:\n- Architecture: x64\n"
+            f"  InstallerType: exe\n  InstallerUrl: https://example.invalid/{name}.exe\n"
+            f"  InstallerSha256: {hashlib.sha256(installer).hexdigest().upper()}\nManifestType: singleton\n")
+        self.downloaded.append(name)
+        return CommandResult(command, 0, [], 0, 0.0)
+
+
+@pytest.fixture
+def manifest(tmp_path) -> JsonManager:
+    path = tmp_path / "packages.json"
+    path.write_text(json.dumps({
+        "Necessary_packages": {"zoxide": "winget install ajeetdsouza.zoxide", "fzf": "winget install junegunn.fzf",
+                               "profile": "pwsh -File setup.ps1"},
+        "Nerd_fonts": [],
+        "Py_packages": {"pathlib": "pip install pathlib"},
+    }), encoding="utf-8")
+    return JsonManager(str(path), use_cache=False)
+
+
+@pytest.fixture
+def mirror(tmp_path, manifest) -> Mirror:
+    mirror = Mirror(tmp_path / "mirror", tmp_path / "staging")
+    mirror.bundle(manifest, DownloadRunner())
+    return Mirror(mirror.root, mirror.staging)
+
+
+def test_bundle_records_every_file(mirror):
+    lock = mirror.load_lock()
+
+    assert sorted(lock["winget"]) == ["fzf", "zoxide"]
+    assert sorted(lock["winget"]["fzf"]["files"]) == ["winget/fzf/fzf.exe", "winget/fzf/fzf.installer.yaml"]
+    assert mirror.verify() == []
+
+
+def test_a_corrupted_file_is_reported(mirror):
+    (mirror.winget_dir("fzf") / "fzf.exe").write_bytes(b"tampered")
+
+    assert mirror.verify() == [f"winget/fzf/fzf.exe does not match its hash in {LOCK_NAME}"]
+    assert mirror.verify(["pip", "fonts"]) == []
+
+
+def test_a_missing_file_is_reported(mirror):
+    (mirror.winget_dir("zoxide") / "zoxide.installer.yaml").unlink()
+
+    assert mirror.verify(["winget"]) == ["winget/zoxide/zoxide.installer.yaml is missing"]
+
+
+def test_bundling_again_only_downloads_what_changed(mirror, manifest):
+    (mirror.winget_dir("fzf") / "fzf.exe").write_bytes(b"tampered")
+    runner = DownloadRunner()
+
+    items = {item.name: item.status for item in mirror.bundle(manifest, runner)}
+
+    assert runner.downloaded == ["fzf"]
+    assert items == {"zoxide": "unchanged", "fzf": "bundled", "profile": "skipped",
+                     "python packages": "skipped"}
+    assert mirror.verify() == []
+
+
+def test_installs_use_the_mirrored_installer(mirror):
+    command = shlex.split(mirror.winget_command("zoxide"))
+    text = Path(command[command.index("--manifest") + 1]).read_text(encoding="utf-8")
+    installer = mirror.winget_dir("zoxide") / "zoxide.exe"
+
+    assert f"  InstallerUrl: {installer.as_uri()}\n" in text
+    assert f"  InstallerSha256: {hashlib.sha256(installer.read_bytes()).hexdigest().upper()}\n" in text
+    assert "https://" not in text
+    assert mirror.winget_command("profile") is None
+
+
+def test_installs_from_the_mirror_never_reach_the_network(mirror, tmp_path):
+    # The benchmarks' stand-in for winget fetches InstallerUrl and fails on anything but a local file
+    state = tmp_path / "state"
+    state.mkdir()
+    command = shlex.split(mirror.winget_command("fzf"))
+
+    result = subprocess.run([sys.executable, str(FAKE_BACKEND), *command], capture_output=True, text=True,
+                            env={**os.environ, "PWSH_BENCH_STATE": str(state), "PWSH_BENCH_OUTPUT_LINES": "0"})
+
+    assert result.returncode == 0, result.stdout
+    assert (state / "calls.log").read_text(encoding="utf-8").splitlines() == ["winget install junegunn.fzf"]
+
+
+def test_manifests_with_several_installers_are_not_localized(tmp_path):
+    text = "Installers:\n- InstallerUrl: https://a.invalid/x.exe\n- InstallerUrl: https://b.invalid/x.exe\n"
+
+    assert localize_manifest(text, tmp_path / "x.exe", "00") is None
+
+
+@pytest.mark.parametrize("lock, message", [
+    (None, "is not a mirror"),
+    ("{not json", "Cannot read"),
+    (json.dumps({"format": 0}), "incompatible version"),
+])
+def test_unusable_lockfiles_are_rejected(tmp_path, lock, message):
+    if lock is not None:
+        (tmp_path / LOCK_NAME).write_text(lock, encoding="utf-8")
+
+    with pytest.raises(MirrorError, match=message):
+        Mirror(tmp_path).load_lock()
@@ -0,0 +1,97 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from ExecutionPolicy import CancelScope, CommandCancelled
+from PowerShellSession import PowerShellSession
+
+FAKE_PWSH = [sys.executable, str(Path(__file__).resolve().parent / "fixtures" / "fake_pwsh.py")]
+
+
+@pytest.fixture
+def session():
+    with PowerShellSession(FAKE_PWSH) as session:
+        yield session
+
+
+def test_scripts_share_one_process(session):
+    first = session.run("pid")
+    second = session.run("echo hello\necho world")
+
+    assert first.returncode == 0
+    assert second.stdout == "hello\nworld"
+    assert session.run("pid").stdout == first.stdout
+    assert session.restarts == 0
+
+
+def test_failures_are_reported_like_subprocess_run(session):
+    result = session.run("error not found")
+
+    assert (result.returncode, result.stdout, result.stderr) == (1, "", "not found")
+    assert session.run("status 3").returncode == 3
+    with pytest.raises(subprocess.CalledProcessError):
+        session.run("error not found", check=True)
+
+
+def test_stray_output_is_skipped(session):
+    assert session.run("noise\necho answer").stdout == "answer"
+
+
+def test_a_dead_process_fails_the_request_and_is_restarted(session):
+    pid = session.run("pid").stdout
+
+    result = session.run("crash 7")
+
+    assert result.returncode == 7
+    assert "host crashed" in result.stderr
+    assert session.run("pid").stdout != pid
+    assert session.restarts == 1
+
+
+def test_a_timeout_kills_the_session(session):
+    pid = session.run("pid").stdout
+
+    result = session.run("sleep 30", timeout=0.5)
+
+    assert result.returncode != 0
+    assert result.stderr == "PowerShell script timed out"
+    assert session.run("pid").stdout != pid
+
+
+def test_cancelling_the_scope_stops_the_script(session):
+    with CancelScope() as scope:
+        threading.Timer(0.5, scope.cancel).start()
+        with pytest.raises(CommandCancelled):
+            session.run("sleep 30")
+
+    assert session.run("echo still usable").stdout == "still usable"
+
+
+def test_concurrent_requests_get_their_own_responses(session):
+    results = {}
+
+    def run(n: int) -> None:
+        results[n] = session.run(f"sleep 0.01\necho {n}").stdout
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {n: str(n) for n in range(8)}
+    assert session.restarts == 0
+
+
+def test_close_ends_the_process():
+    session = PowerShellSession(FAKE_PWSH)
+    session.run("echo hi")
+    process = session._process
+
+    session.close()
+
+    assert process.poll() == 0
+    assert not session.alive
@@ -0,0 +1,85 @@
+import json
+import re
+from pathlib import Path
+
+import ProfileOptimizer
+import Updater
+from ProfileWriter import ProfileWriter
+
+REPO_PROFILE = Path(__file__).resolve().parent.parent / "Microsoft.PowerShell_profile.ps1"
+
+
+def defined_functions(text: str) -> list:
+    return [block.name for block in ProfileOptimizer.parse_profile(text) if block.kind == "function"]
+
+
+def test_every_function_of_the_repo_profile_stays_reachable():
+    source = REPO_PROFILE.read_text(encoding="utf-8")
+    result = ProfileOptimizer.optimize(source)
+
+    in_profile = defined_functions(result.profile)
+    in_module = defined_functions(result.module)
+    exported = re.search(r"FunctionsToExport = @\((.*)\)", result.manifest).group(1)
+    assert sorted(in_profile + in_module) == sorted(defined_functions(source))
+    assert not set(in_profile) & set(in_module)
+    assert [name.strip("'") for name in exported.split(", ")] == in_module
+    assert f"Export-ModuleMember -Function {exported}" in result.module
+    assert "prompt" not in in_module
+
+
+def test_calls_to_functions_making_network_requests_are_deferred():
+    source = REPO_PROFILE.read_text(encoding="utf-8") + "\n".join([
+        "",
+        "if (-not (Test-Path $HOME\\theme.json)) {",
+        "    Get-Theme",
+        "}",
+        "function Find-Git {",
+        "    Get-Command git -ErrorAction SilentlyContinue",
+        "}",
+        "Find-Git",
+        "",
+    ])
+    result = ProfileOptimizer.optimize(source)
+    eager, _, deferred = result.profile.partition("Register-EngineEvent -SourceIdentifier PowerShell.OnIdle")
+
+    assert "Get-Theme" in defined_functions(result.module)
+    assert "Get-Theme" not in eager and "Get-Theme" in deferred
+    assert "raw.githubusercontent.com" not in eager
+    assert any(entry["reason"] == "calls Get-Theme: remote theme download" for entry in result.report()["deferred"])
+    # Only network work is deferred through a call
+    assert "\nFind-Git" in eager
+
+
+def test_optimize_installed_keeps_managed_blocks(home):
+    path = home / "Documents" / "PowerShell" / "Microsoft.PowerShell_profile.ps1"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(REPO_PROFILE.read_bytes())
+    profile = ProfileWriter(path)
+    profile.ensure_block("init", "Import-Module zoxide")
+    upstream_hash = Updater.unmanaged_hash(REPO_PROFILE.read_bytes())
+
+    assert ProfileOptimizer.optimize_installed(profile, home) is not None
+
+    text = path.read_text(encoding="utf-8")
+    assert text.startswith(ProfileOptimizer.OPTIMIZED_HEADER)
+    assert text.rstrip().endswith("# <<< pwsh-config: init <<<")
+    assert (home / "Documents" / "PowerShell" / "Modules" / "PwshConfigProfile" / "PwshConfigProfile.psd1").exists()
+    assert ProfileOptimizer.source_hash(path.read_bytes(), home) == upstream_hash
+    assert ProfileOptimizer.optimize_installed(profile, home) is None
+
+
+def test_update_profile_optimizes_the_new_profile(home, http_server):
+    path = Updater.profile_path(home)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"")
+    ProfileOptimizer.optimize_installed(ProfileWriter(path), home)
+    http_server.serve("/release", json.dumps({"tag_name": "v7.4.5"}).encode())
+    http_server.serve("/profile", REPO_PROFILE.read_bytes())
+    urls = dict(profile_url=http_server.base_url + "/profile", releases_url=http_server.base_url + "/release")
+
+    assert Updater.check(home, **urls)["profile"]["update_available"] is True
+    assert Updater.install_profile(home) is True
+
+    assert path.read_text(encoding="utf-8").startswith(ProfileOptimizer.OPTIMIZED_HEADER)
+    assert Updater.check(home, **urls)["profile"]["update_available"] is False
+    assert Updater.install_profile(home) is False
@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import Provision
+from UI import Handle_Input
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.mark.parametrize("theme", [None, "[blocks\nbroken = ", "version = 3\nversion = 3\n"])
+def test_verify_fails_cleanly_without_a_readable_reference_theme(tmp_path, capsys, theme):
+    source = tmp_path / "source"
+    source.mkdir()
+    if theme is not None:
+        (source / "zen.toml").write_text(theme, encoding="utf-8")
+
+    code = Provision.main(["verify", str(tmp_path / "home"), "--source-dir", str(source)])
+
+    target = json.loads(capsys.readouterr().out)["targets"][0]
+    assert code == 1
+    assert target["ok"] is False and target["checks"]["oh_my_posh_config"] is False
+    assert target["error"].startswith("Cannot read the reference theme")
+
+
+def test_verify_reads_the_repo_theme(tmp_path, capsys):
+    Provision.main(["verify", str(tmp_path), "--source-dir", str(REPO_ROOT)])
+
+    target = json.loads(capsys.readouterr().out)["targets"][0]
+    # An unconfigured home fails the checks, but the reference theme itself is fine
+    assert "error" not in target and set(target["checks"]) == {
+        "profile_exists", "profile_configured", "oh_my_posh_config"}
+
+
+def test_mirror_errors_from_the_lazy_installer_are_reported(tmp_path, capsys):
+    ui = Handle_Input(mirror=tmp_path / "no-mirror")
+
+    ui.Handle("1")
+
+    out = capsys.readouterr().out
+    assert "Error: " in out and "no-mirror" in out
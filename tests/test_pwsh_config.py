@@ -0,0 +1,80 @@
+import threading
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from InitCache import default_tools, profile_loader
+from StepScheduler import Step
+from pwshConfig import LEGACY_INIT_COMMANDS, Automatic_installation_And_Config
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def make_installer(tmp_path: Path, interactive: bool = True) -> Automatic_installation_And_Config:
+    return Automatic_installation_And_Config(home=tmp_path, interactive=interactive,
+                                             manifest_path=str(REPO_ROOT / "packages.json"))
+
+
+def test_failed_steps_pause_once_on_the_main_thread(tmp_path, monkeypatch):
+    installer = make_installer(tmp_path)
+    prompts = []
+    monkeypatch.setattr("builtins.input",
+                        lambda prompt: prompts.append(threading.current_thread() is threading.main_thread()))
+
+    def fail() -> bool:
+        installer.pause("Press any key to continue...")
+        return False
+
+    results = installer.run_steps([Step("a", "A", fail), Step("b", "B", fail)])
+
+    assert [result.status for result in results.values()] == ["failed", "failed"]
+    assert prompts == [True]
+
+
+def test_non_interactive_runs_never_pause(tmp_path, monkeypatch):
+    installer = make_installer(tmp_path, interactive=False)
+    monkeypatch.setattr("builtins.input", lambda prompt: pytest.fail("input() called in a non-interactive run"))
+
+    def fail() -> bool:
+        installer.pause("Press any key to continue...")
+        return False
+
+    installer.run_steps([Step("a", "A", fail)])
+
+
+
+def test_the_file_index_is_opt_in(tmp_path):
+    assert "file_index" not in [step.name for step in make_installer(tmp_path).build_steps()]
+    with pytest.raises(ValueError, match="Unknown step"):
+        make_installer(tmp_path).select_steps(["file_index"])
+
+    installer = Automatic_installation_And_Config(home=tmp_path, manifest_path=str(REPO_ROOT / "packages.json"),
+                                                  file_index=True)
+    assert [step.name for step in installer.select_steps(["file_index"])] == ["file_index"]
+
+
+def test_the_init_block_falls_back_to_the_installed_theme(tmp_path):
+    installer = make_installer(tmp_path)
+    installer.profile.ensure_exists()
+    _, oh_my_posh = default_tools(installer.oh_my_posh_json_file)
+    old_loader = profile_loader(installer.init_cache.script_path(oh_my_posh),
+                                replace(oh_my_posh, fallback=LEGACY_INIT_COMMANDS[1]))
+    installer.profile_path.write_text(f"Set-Alias ll Get-ChildItem\n{old_loader}\n", encoding="utf-8")
+
+    assert installer.configure_pwsh_profile()
+
+    text = installer.profile_path.read_text(encoding="utf-8")
+    assert old_loader not in text and "Set-Alias ll Get-ChildItem" in text
+    assert f"oh-my-posh init pwsh --config '{tmp_path / '.config' / 'ohmyposh' / 'zen.json'}'" in text
+    assert "the-unnamed" not in text
+    # z and zi only point at zoxide's functions once it has initialised
+    assert "if (Get-Command __zoxide_z -ErrorAction SilentlyContinue) { Set-Alias -Name z" in text
+
+
+def test_the_shipped_profile_leaves_init_to_the_managed_block():
+    text = (REPO_ROOT / "Microsoft.PowerShell_profile.ps1").read_text(encoding="utf-8")
+
+    assert "zoxide init" not in text and "cache\\init" not in text
+    assert "oh-my-posh init pwsh --config './" not in text
+    assert "Set-Alias -Name z " not in text
